@@ -1,101 +1,67 @@
-import sqlite3
-import json
 from datetime import datetime
 from typing import Dict, List
 import logging
+from database import get_db, in_db_thread
+from game_data import game_data
+from leaderboard import leaderboard
 
 logger = logging.getLogger(__name__)
 
 class AchievementsSystem:
     def __init__(self, db_path='dota2.db'):
         self.db_path = db_path
-        self.init_achievements_db()
-    
-    def init_achievements_db(self):
-        """Инициализация таблиц достижений"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS user_achievements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                achievement_id TEXT,
-                progress INTEGER DEFAULT 0,
-                unlocked BOOLEAN DEFAULT 0,
-                unlocked_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(telegram_id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        self.db = get_db(db_path)
     
+    @in_db_thread
     def unlock_achievement(self, user_id: int, achievement_id: str) -> bool:
         """Разблокировать достижение"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        # Проверяем, не разблокировано ли уже
-        c.execute('''
-            SELECT unlocked FROM user_achievements 
-            WHERE user_id = ? AND achievement_id = ?
-        ''', (user_id, achievement_id))
-        
-        existing = c.fetchone()
-        
-        if existing and existing[0]:
-            conn.close()
-            return False
-        
-        # Разблокируем достижение
-        if existing:
+        with self.db.transaction() as c:
+            # Проверяем, не разблокировано ли уже
             c.execute('''
-                UPDATE user_achievements 
-                SET unlocked = 1, unlocked_at = ?
+                SELECT unlocked FROM user_achievements 
                 WHERE user_id = ? AND achievement_id = ?
-            ''', (datetime.now(), user_id, achievement_id))
-        else:
-            c.execute('''
-                INSERT INTO user_achievements 
-                (user_id, achievement_id, unlocked, unlocked_at)
-                VALUES (?, ?, 1, ?)
-            ''', (user_id, achievement_id, datetime.now()))
-        
-        # Загружаем данные достижения для награды
-        with open('achievements.json', 'r', encoding='utf-8') as f:
-            achievements_data = json.load(f)
-        
-        achievement = next(
-            (a for a in achievements_data['achievements'] if a['id'] == achievement_id), 
-            None
-        )
-        
-        if achievement:
-            # Начисляем награду
-            reward = achievement.get('reward', 0)
-            c.execute('''
-                UPDATE users 
-                SET score = score + ? 
-                WHERE telegram_id = ?
-            ''', (reward, user_id))
-        
-        conn.commit()
-        conn.close()
-        return True
+            ''', (user_id, achievement_id))
+            
+            existing = c.fetchone()
+            
+            if existing and existing[0]:
+                return False
+            
+            # Разблокируем достижение
+            if existing:
+                c.execute('''
+                    UPDATE user_achievements 
+                    SET unlocked = 1, unlocked_at = ?
+                    WHERE user_id = ? AND achievement_id = ?
+                ''', (datetime.now(), user_id, achievement_id))
+            else:
+                c.execute('''
+                    INSERT INTO user_achievements 
+                    (user_id, achievement_id, unlocked, unlocked_at)
+                    VALUES (?, ?, 1, ?)
+                ''', (user_id, achievement_id, datetime.now()))
+            
+            # Данные достижения для награды
+            achievement = game_data.achievements_by_id.get(achievement_id)
+            
+            if achievement:
+                # Начисляем награду
+                reward = achievement.get('reward', 0)
+                c.execute('''
+                    UPDATE users 
+                    SET score = score + ? 
+                    WHERE telegram_id = ?
+                ''', (reward, user_id))
+                leaderboard.track(self.db, c, user_id)
+            
+            return True
     
+    @in_db_thread
     def update_achievement_progress(self, user_id: int, achievement_type: str, value: int = 1):
         """Обновить прогресс достижений"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        # Загружаем достижения
-        with open('achievements.json', 'r', encoding='utf-8') as f:
-            achievements_data = json.load(f)
-        
-        # Находим достижения данного типа
-        for achievement in achievements_data['achievements']:
-            if achievement.get('type') == achievement_type:
+        with self.db.transaction() as c:
+            # Достижения данного типа
+            for achievement in game_data.achievements_by_type.get(achievement_type, ()):
                 achievement_id = achievement['id']
                 target = achievement.get('target', 1)
                 
@@ -119,7 +85,7 @@ class AchievementsSystem:
                     
                     # Проверяем, достигнута ли цель
                     if new_progress >= target and current_progress < target:
-                        self.unlock_achievement(user_id, achievement_id)
+                        self.unlock_achievement.sync(self, user_id, achievement_id)
                 else:
                     # Создаем новую запись
                     new_progress = min(value, target)
@@ -127,63 +93,55 @@ class AchievementsSystem:
                     c.execute('''
                         INSERT INTO user_achievements 
                         (user_id, achievement_id, progress, unlocked)
-                        VALUES (?, ?, ?, ?)
-                    ''', (user_id, achievement_id, new_progress, 1 if new_progress >= target else 0))
+                        VALUES (?, ?, ?, 0)
+                    ''', (user_id, achievement_id, new_progress))
                     
                     if new_progress >= target:
-                        self.unlock_achievement(user_id, achievement_id)
-        
-        conn.commit()
-        conn.close()
+                        self.unlock_achievement.sync(self, user_id, achievement_id)
     
+    @in_db_thread
     def get_user_achievements(self, user_id: int) -> Dict:
         """Получить достижения пользователя"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        c.execute('''
-            SELECT ua.achievement_id, ua.progress, ua.unlocked, 
-                   a.title, a.description, a.reward, a.target, a.icon
-            FROM user_achievements ua
-            LEFT JOIN achievements_json a ON ua.achievement_id = a.id
-            WHERE ua.user_id = ?
-        ''', (user_id,))
-        
-        achievements = []
-        total_unlocked = 0
-        total_score = 0
-        
-        for row in c.fetchall():
-            achievement = {
-                'id': row[0],
-                'progress': row[1],
-                'unlocked': bool(row[2]),
-                'title': row[3],
-                'description': row[4],
-                'reward': row[5],
-                'target': row[6],
-                'icon': row[7],
-                'progress_percent': (row[1] / row[6] * 100) if row[6] else 100
-            }
+        with self.db.transaction() as c:
+            c.execute('''
+                SELECT achievement_id, progress, unlocked
+                FROM user_achievements
+                WHERE user_id = ?
+            ''', (user_id,))
+            
+            achievements = []
+            total_unlocked = 0
+            total_score = 0
             
-            achievements.append(achievement)
+            for achievement_id, progress, unlocked in c.fetchall():
+                # Описание достижения из справочника
+                info = game_data.achievements_by_id.get(achievement_id, {})
+                target = info.get('target', 0)
+                
+                achievement = {
+                    'id': achievement_id,
+                    'progress': progress,
+                    'unlocked': bool(unlocked),
+                    'title': info.get('title'),
+                    'description': info.get('description'),
+                    'reward': info.get('reward', 0),
+                    'target': target,
+                    'icon': info.get('icon'),
+                    'progress_percent': (progress / target * 100) if target else 100
+                }
+                
+                achievements.append(achievement)
+                
+                if achievement['unlocked']:
+                    total_unlocked += 1
+                    total_score += achievement['reward']
             
-            if achievement['unlocked']:
-                total_unlocked += 1
-                total_score += achievement['reward']
-        
-        # Получаем все доступные достижения для подсчета общего количества
-        with open('achievements.json', 'r', encoding='utf-8') as f:
-            all_achievements = json.load(f)
-        
-        total_achievements = len(all_achievements['achievements'])
-        
-        conn.close()
-        
-        return {
-            'achievements': achievements,
-            'total_unlocked': total_unlocked,
-            'total_achievements': total_achievements,
-            'completion_percent': (total_unlocked / total_achievements * 100) if total_achievements > 0 else 0,
-            'total_score': total_score
-        }
+            total_achievements = len(game_data.achievements)
+            
+            return {
+                'achievements': achievements,
+                'total_unlocked': total_unlocked,
+                'total_achievements': total_achievements,
+                'completion_percent': (total_unlocked / total_achievements * 100) if total_achievements > 0 else 0,
+                'total_score': total_score
+            }
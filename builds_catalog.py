@@ -0,0 +1,197 @@
+import os
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+import logging
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from game_data import game_data, GameDataRegistry
+
+logger = logging.getLogger(__name__)
+
+# (id роли в callback, название роли в hero_builds.json, текст кнопки)
+ROLES = (
+    ('carry', 'Керри', '⚔️ Керри'),
+    ('mid', 'Мидер', '🎯 Мидер'),
+    ('offlane', 'Оффлейнер', '🛡️ Оффлейнер'),
+    ('support', 'Саппорт', '💫 Саппорт'),
+    ('hard_support', 'Хард саппорт', '🔮 Хард саппорт'),
+)
+
+# Сколько готовых карточек сборок держать в памяти
+BUILD_CARD_CACHE_SIZE = int(os.getenv("BUILD_CARD_CACHE_SIZE", "256"))
+
+
+class BuildCardError(Exception):
+    """Карточку построить нельзя (нет героя, ролей или сборки); текст - для пользователя"""
+
+
+class BuildsCatalog:
+    """Индекс роль -> герои и готовые клавиатуры меню сборок.
+
+    Все собирается заранее из hero_builds.json и пересобирается только
+    при перезагрузке файла; обработчики берут готовую разметку из памяти.
+    """
+
+    def __init__(self, registry: GameDataRegistry = game_data):
+        self.registry = registry
+        self.menu_markup = self._build_menu_markup()
+        self.role_callbacks = frozenset(f"builds_{role_id}" for role_id, _, _ in ROLES)
+
+        self.heroes_by_role: Mapping[str, Tuple[Tuple[int, str], ...]] = MappingProxyType({})
+        self._role_menus: Mapping[str, Tuple[str, InlineKeyboardMarkup]] = MappingProxyType({})
+
+        # LRU готовых карточек: (hero_id, роль) -> (текст, клавиатура)
+        self._cards: OrderedDict = OrderedDict()
+        self.card_hits = 0
+        self.card_misses = 0
+
+        self.rebuild()
+        registry.add_reload_listener(self._on_reload)
+
+    def _on_reload(self, name: str):
+        if name == 'hero_builds':
+            self.rebuild()
+            self._cards.clear()
+
+    @staticmethod
+    def _build_menu_markup() -> InlineKeyboardMarkup:
+        keyboard = InlineKeyboardBuilder()
+        for role_id, _, button_text in ROLES:
+            keyboard.button(text=button_text, callback_data=f"builds_{role_id}")
+        keyboard.button(text="🔍 Поиск героя", callback_data="builds_search")
+        keyboard.adjust(2)
+        return keyboard.as_markup()
+
+    def rebuild(self):
+        """Пересобрать индекс ролей и меню из текущих сборок"""
+        primary: Dict[str, List[Tuple[int, str]]] = {}
+        secondary: Dict[str, List[Tuple[int, str]]] = {}
+
+        for hero_id, hero_data in self.registry.hero_builds.items():
+            hero = (int(hero_id), hero_data.get('name', f"Герой {hero_id}"))
+            for role in hero_data.get('primary_roles', ()):
+                primary.setdefault(role, []).append(hero)
+            for role in hero_data.get('secondary_roles', ()):
+                if role not in hero_data.get('primary_roles', ()):
+                    secondary.setdefault(role, []).append(hero)
+
+        def by_name(hero):
+            return hero[1]
+
+        heroes_by_role = {}
+        role_menus = {}
+        for role_id, role_name, _ in ROLES:
+            # Сначала герои, для которых роль основная, затем второстепенная
+            heroes = tuple(sorted(primary.get(role_name, []), key=by_name) +
+                           sorted(secondary.get(role_name, []), key=by_name))
+            heroes_by_role[role_name] = heroes
+            if heroes:
+                role_menus[role_id] = self._build_role_menu(role_name, heroes)
+
+        self.heroes_by_role = MappingProxyType(heroes_by_role)
+        self._role_menus = MappingProxyType(role_menus)
+        logger.info(f"✅ Меню сборок: {len(role_menus)} ролей")
+
+    @staticmethod
+    def _build_role_menu(role_name: str, heroes) -> Tuple[str, InlineKeyboardMarkup]:
+        keyboard = InlineKeyboardBuilder()
+        for hero_id, hero_name in heroes:
+            keyboard.button(text=hero_name, callback_data=f"hero_build_{hero_id}")
+        keyboard.button(text="⬅️ Назад", callback_data="builds_back")
+        keyboard.adjust(1)
+
+        text = (
+            f"🛠 <b>Герои ({role_name}):</b>\n\n"
+            f"Выберите героя для просмотра сборки:"
+        )
+        return text, keyboard.as_markup()
+
+    def role_menu(self, role_id: str) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+        """Готовые текст и клавиатура для роли (None - героев нет)"""
+        return self._role_menus.get(role_id)
+
+    def build_card(self, hero_id: str, role: Optional[str] = None) -> Tuple[str, InlineKeyboardMarkup]:
+        """Карточка сборки героя.
+
+        role=None - карточка из меню (основная роль героя, «Назад» в меню
+        сборок); иначе карточка выбранной роли («Назад» к основной).
+        Бросает BuildCardError, если показывать нечего.
+        """
+        key = (hero_id, role)
+        card = self._cards.get(key)
+        if card is not None:
+            self._cards.move_to_end(key)
+            self.card_hits += 1
+            return card
+
+        self.card_misses += 1
+        card = self._render_card(hero_id, role)
+        self._cards[key] = card
+        while len(self._cards) > BUILD_CARD_CACHE_SIZE:
+            self._cards.popitem(last=False)
+        return card
+
+    def _render_card(self, hero_id: str, role: Optional[str]) -> Tuple[str, InlineKeyboardMarkup]:
+        if not self.registry.hero_builds:
+            raise BuildCardError("❌ Файл сборок не найден.")
+
+        hero_data = self.registry.hero_builds.get(hero_id)
+        if not hero_data:
+            if role is None:
+                raise BuildCardError(f"❌ Сборки для героя с ID {hero_id} не найдены.")
+            raise BuildCardError("❌ Герой не найден.")
+
+        hero_name = hero_data.get('name', f"Герой {hero_id}")
+        builds = hero_data.get('builds', {})
+
+        if role is None:
+            # Первая роль из списка, иначе любая роль со сборкой
+            roles = hero_data.get('primary_roles') or hero_data.get('secondary_roles')
+            if not roles:
+                raise BuildCardError(f"❌ Для героя {hero_name} не указаны роли.")
+            shown_role = roles[0]
+            if shown_role not in builds:
+                if not builds:
+                    raise BuildCardError(f"❌ Для героя {hero_name} нет сборок.")
+                shown_role = next(iter(builds))
+            back_callback = "builds_back"
+        else:
+            if role not in builds:
+                raise BuildCardError(f"❌ Для героя {hero_name} нет сборки для роли {role}.")
+            shown_role = role
+            back_callback = f"hero_build_{hero_id}"
+
+        build = builds[shown_role]
+        items = "".join(f"• {item}\n" for item in build.get('items', ()))
+        text = (
+            f"\n🛠 <b>{hero_name} ({shown_role})</b>\n\n"
+            f"🎒 <b>Предметы:</b>\n{items}\n"
+            f"⚡ <b>Способности:</b>\n{build.get('skills', 'Не указано')}\n\n"
+            f"📈 <b>Прокачка:</b>\n{build.get('skill_build', 'Не указано')}\n\n"
+            f"🌟 <b>Таланты:</b>\n{build.get('talents', 'Не указано')}\n\n"
+            f"🎮 <b>Стиль игры:</b>\n{build.get('playstyle', 'Не указано')}\n\n"
+            f"<i>Сборка основана на текущей мете</i>\n"
+        )
+
+        # Кнопки для других ролей, если есть
+        keyboard = InlineKeyboardBuilder()
+        for other_role in builds:
+            if other_role != shown_role:
+                keyboard.button(text=f"🎯 {other_role}", callback_data=f"hero_role_{hero_id}_{other_role}")
+        keyboard.button(text="⬅️ Назад", callback_data=back_callback)
+        keyboard.adjust(2)
+
+        return text, keyboard.as_markup()
+
+    def stats(self) -> Dict:
+        """Счетчики кэша карточек"""
+        return {
+            'cards': len(self._cards),
+            'hits': self.card_hits,
+            'misses': self.card_misses
+        }
+
+
+# Общий каталог сборок
+builds_catalog = BuildsCatalog()
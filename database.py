@@ -0,0 +1,160 @@
+import os
+import time
+import asyncio
+import sqlite3
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict
+import logging
+import migrations
+from metrics import db_queue_seconds, db_seconds
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("DB_PATH", "dota2.db")
+
+# Размер страничного кэша SQLite в КиБ (отрицательное значение для PRAGMA)
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+
+class Database:
+    """Одно соединение SQLite на процесс (WAL, synchronous=NORMAL)"""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._after_commit = []
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._configure()
+        self.schema_version = migrations.migrate(self.conn)
+
+    def _configure(self):
+        c = self.conn.cursor()
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        c.execute("PRAGMA temp_store=MEMORY")
+        c.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        c.close()
+        logger.info(f"✅ SQLite {self.path}: WAL, synchronous=NORMAL, cache {DB_CACHE_SIZE_KB} КиБ")
+
+    @contextmanager
+    def transaction(self):
+        """Курсор внутри транзакции: commit при успехе, rollback при ошибке.
+
+        Вложенные вызовы (в том же потоке) работают в транзакции внешнего.
+        """
+        with self._lock:
+            self._depth += 1
+            c = self.conn.cursor()
+            try:
+                yield c
+            except BaseException:
+                if self._depth == 1:
+                    self.conn.rollback()
+                    self._after_commit.clear()
+                raise
+            else:
+                if self._depth == 1:
+                    self.conn.commit()
+                    callbacks, self._after_commit = self._after_commit, []
+                    for callback in callbacks:
+                        try:
+                            callback()
+                        except Exception as e:
+                            logger.error(f"Ошибка обработчика после commit: {e}")
+            finally:
+                c.close()
+                self._depth -= 1
+
+    def after_commit(self, callback):
+        """Вызвать callback после commit внешней транзакции (при rollback - не вызывать)"""
+        with self._lock:
+            if self._depth:
+                self._after_commit.append(callback)
+                return
+        callback()
+
+    def close(self):
+        """Закрыть соединение (при остановке бота)"""
+        with self._lock:
+            self.conn.close()
+
+
+# Вся работа с SQLite идет в одном выделенном потоке, чтобы не блокировать event loop
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+
+
+def _operation_name(func) -> str:
+    func = getattr(func, 'func', func)  # functools.partial
+    return getattr(func, '__qualname__', None) or repr(func)
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Выполнить синхронную функцию работы с БД в потоке базы.
+
+    Ожидание очереди и время самой функции попадают в метрики и в спан
+    трассировки обновления.
+    """
+    loop = asyncio.get_running_loop()
+    operation = _operation_name(func)
+    submitted = time.perf_counter()
+    queued = 0.0
+
+    def call():
+        nonlocal queued
+        started = time.perf_counter()
+        queued = started - submitted
+        db_queue_seconds.observe(queued)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            db_seconds.observe(time.perf_counter() - started, operation=operation)
+
+    with span(f"db:{operation}") as s:
+        try:
+            return await loop.run_in_executor(_executor, call)
+        finally:
+            s.set(queue_ms=round(queued * 1000, 1))
+
+
+def in_db_thread(func):
+    """Декоратор: синхронная функция работы с БД становится корутиной.
+
+    Исходная функция доступна как .sync для кода, который уже
+    выполняется в потоке базы (вызовы из других таких функций).
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_in_db_thread(func, *args, **kwargs)
+
+    wrapper.sync = func
+    return wrapper
+
+
+_databases: Dict[str, Database] = {}
+_databases_lock = threading.Lock()
+
+
+def get_db(path: str = DB_PATH) -> Database:
+    """Общий экземпляр Database для файла (создается при первом обращении)"""
+    with _databases_lock:
+        db = _databases.get(path)
+        if db is None:
+            db = Database(path)
+            _databases[path] = db
+        return db
+
+
+def close_all():
+    """Дождаться текущих операций и закрыть все открытые базы"""
+    _executor.shutdown(wait=True)
+    with _databases_lock:
+        for db in _databases.values():
+            db.close()
+        _databases.clear()
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+from typing import Any, Dict, Optional
+import logging
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from database import Database, get_db, run_in_db_thread
+
+logger = logging.getLogger(__name__)
+
+# memory | sqlite | redis (по умолчанию redis, если задан REDIS_URL, иначе sqlite)
+REDIS_URL = os.getenv("REDIS_URL")
+FSM_STORAGE = os.getenv("FSM_STORAGE", "redis" if REDIS_URL else "sqlite")
+# Через сколько секунд без изменений состояние считается брошенным
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", "86400"))
+# Как часто удалять просроченные записи из SQLite
+FSM_PURGE_INTERVAL = 600
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в таблице fsm_state общей базы.
+
+    Запросы идут через поток базы; просроченные записи не читаются и
+    периодически удаляются при записи.
+    """
+
+    def __init__(self, db: Database, ttl: int = FSM_STATE_TTL,
+                 key_builder: Optional[KeyBuilder] = None):
+        self.db = db
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._purged_at = 0.0
+
+    def _get(self, key: str, column: str):
+        with self.db.transaction() as c:
+            c.execute(
+                f"SELECT {column} FROM fsm_state WHERE key = ? AND expires_at > ?",
+                (key, int(time.time()))
+            )
+            row = c.fetchone()
+            return row[0] if row else None
+
+    def _set(self, key: str, column: str, value: Optional[str]):
+        now = int(time.time())
+        with self.db.transaction() as c:
+            c.execute(f'''
+                INSERT INTO fsm_state (key, {column}, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, expires_at = excluded.expires_at
+            ''', (key, value, now + self.ttl))
+            # Пустая запись (нет ни состояния, ни данных) не нужна
+            c.execute("DELETE FROM fsm_state WHERE key = ? AND state IS NULL AND data IS NULL", (key,))
+
+            if now - self._purged_at >= FSM_PURGE_INTERVAL:
+                self._purged_at = now
+                c.execute("DELETE FROM fsm_state WHERE expires_at <= ?", (now,))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await run_in_db_thread(self._set, self.key_builder.build(key), 'state', _state_name(state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await run_in_db_thread(self._get, self.key_builder.build(key), 'state')
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        value = json.dumps(data, ensure_ascii=False) if data else None
+        await run_in_db_thread(self._set, self.key_builder.build(key), 'data', value)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await run_in_db_thread(self._get, self.key_builder.build(key), 'data')
+        return json.loads(value) if value else {}
+
+    async def close(self) -> None:
+        # Соединение общее, его закрывает close_databases()
+        pass
+
+
+def create_storage(kind: str = FSM_STORAGE) -> BaseStorage:
+    """FSM-хранилище по настройке FSM_STORAGE"""
+    if kind == 'memory':
+        storage: BaseStorage = MemoryStorage()
+    elif kind == 'sqlite':
+        storage = SQLiteStorage(get_db())
+    elif kind == 'redis':
+        if not REDIS_URL:
+            raise ValueError("FSM_STORAGE=redis требует REDIS_URL")
+        # Пакет redis нужен только в этом режиме
+        from aiogram.fsm.storage.redis import RedisStorage
+        storage = RedisStorage.from_url(REDIS_URL, state_ttl=FSM_STATE_TTL, data_ttl=FSM_STATE_TTL)
+    else:
+        raise ValueError(f"Неизвестное FSM-хранилище: {kind}")
+
+    logger.info(f"✅ FSM-хранилище: {kind}")
+    return storage
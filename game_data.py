@@ -0,0 +1,212 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+GAME_DATA_DIR = os.getenv("GAME_DATA_DIR", ".")
+# Как часто проверять mtime файлов для горячей перезагрузки (0 - не проверять)
+GAME_DATA_RELOAD_INTERVAL = float(os.getenv("GAME_DATA_RELOAD_INTERVAL", "30"))
+
+EMPTY = MappingProxyType({})
+
+
+def freeze(value):
+    """Рекурсивно сделать JSON-данные неизменяемыми (dict -> mappingproxy, list -> tuple)"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def _index_by(items, field: str) -> Mapping:
+    return MappingProxyType({item[field]: item for item in items if field in item})
+
+
+def _group_by(items, field: str) -> Mapping:
+    groups: Dict[str, list] = {}
+    for item in items:
+        if field in item:
+            groups.setdefault(item[field], []).append(item)
+    return MappingProxyType({k: tuple(v) for k, v in groups.items()})
+
+
+class GameDataRegistry:
+    """Справочные данные игры из JSON: загружаются один раз и держатся в памяти.
+
+    Все структуры неизменяемые, поэтому их можно читать из любого потока
+    без блокировок. При изменении файла (mtime) набор пересобирается и
+    подменяется целиком; слушатели перезагрузки получают имя набора.
+    """
+
+    SOURCES = {
+        'hero_names': 'hero_names.json',
+        'hero_aliases': 'hero_aliases.json',
+        'hero_builds': 'hero_builds.json',
+        'hero_counters': 'hero_counters.json',
+        'item_ids': 'item_ids.json',
+        'achievements': 'achievements.json',
+        'daily_quests': 'daily_quests.json',
+        'themes': 'themes.json',
+        'quiz_questions': 'quiz_questions.json',
+    }
+
+    def __init__(self, base_dir: str = GAME_DATA_DIR):
+        self.base_dir = base_dir
+        self._mtimes: Dict[str, Optional[float]] = {}
+        # Хэш содержимого загруженных файлов (одинаков во всех процессах)
+        self._digests: Dict[str, str] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+
+        # Индексы (заполняются в _build_*)
+        self.hero_names: Mapping[str, str] = EMPTY
+        self.hero_list: Tuple[Tuple[int, str], ...] = ()
+        self.hero_aliases: Mapping[str, Tuple[str, ...]] = EMPTY
+        self.hero_builds: Mapping[str, Mapping] = EMPTY
+        self.hero_counters: Mapping = EMPTY
+        self.item_ids: Mapping[str, str] = EMPTY
+        self.achievements: Tuple[Mapping, ...] = ()
+        self.achievements_by_id: Mapping[str, Mapping] = EMPTY
+        self.achievements_by_type: Mapping[str, Tuple[Mapping, ...]] = EMPTY
+        self.quests: Tuple[Mapping, ...] = ()
+        self.quests_by_id: Mapping[int, Mapping] = EMPTY
+        self.quests_by_type: Mapping[str, Tuple[Mapping, ...]] = EMPTY
+        self.themes: Mapping[str, Mapping] = EMPTY
+        self.quiz_questions: Tuple[Mapping, ...] = ()
+
+        self.load_all()
+
+    # ---------- загрузка ----------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.base_dir, self.SOURCES[name])
+
+    def _mtime(self, name: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(self._path(name))
+        except OSError:
+            return None
+
+    def load_all(self):
+        """Загрузить все наборы данных"""
+        for name in self.SOURCES:
+            self.load(name)
+
+    def load(self, name: str) -> bool:
+        """Загрузить (перезагрузить) один набор.
+
+        При ошибке чтения или разбора остаются прежние данные.
+        """
+        with self._lock:
+            mtime = self._mtime(name)
+            self._mtimes[name] = mtime
+            try:
+                with open(self._path(name), 'rb') as f:
+                    content = f.read()
+                raw = json.loads(content.decode('utf-8'))
+                getattr(self, f'_build_{name}')(freeze(raw))
+                self._digests[name] = hashlib.sha1(content).hexdigest()
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.error(f"❌ Справочник {self.SOURCES[name]} не загружен: {e}")
+                return False
+
+        logger.info(f"✅ Справочник {self.SOURCES[name]} загружен")
+        return True
+
+    def _build_hero_names(self, raw):
+        self.hero_names = raw
+        self.hero_list = tuple(sorted(((int(k), v) for k, v in raw.items()), key=lambda h: h[1]))
+
+    def _build_hero_aliases(self, raw):
+        self.hero_aliases = raw
+
+    def _build_hero_builds(self, raw):
+        self.hero_builds = raw
+
+    def _build_hero_counters(self, raw):
+        self.hero_counters = raw
+
+    def _build_item_ids(self, raw):
+        self.item_ids = raw
+
+    def _build_achievements(self, raw):
+        items = raw['achievements']
+        self.achievements_by_id = _index_by(items, 'id')
+        self.achievements_by_type = _group_by(items, 'type')
+        self.achievements = items
+
+    def _build_daily_quests(self, raw):
+        items = raw['quests']
+        self.quests_by_id = _index_by(items, 'id')
+        self.quests_by_type = _group_by(items, 'type')
+        self.quests = items
+
+    def _build_themes(self, raw):
+        self.themes = raw.get('themes', EMPTY)
+
+    def _build_quiz_questions(self, raw):
+        self.quiz_questions = raw['questions']
+
+    # ---------- доступ ----------
+
+    def hero_name(self, hero_id, default: Optional[str] = None) -> str:
+        """Имя героя по id (int или str)"""
+        return self.hero_names.get(str(hero_id), default or f"Герой {hero_id}")
+
+    def item_name(self, item_id, default: Optional[str] = None) -> str:
+        """Название предмета по id (int или str)"""
+        return self.item_ids.get(str(item_id), default or f"Предмет {item_id}")
+
+    def version(self, names) -> int:
+        """Версия содержимого наборов names: меняется только вместе с данными"""
+        key = '|'.join(f"{name}:{self._digests.get(name, '')}" for name in names)
+        return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], 'big')
+
+    # ---------- горячая перезагрузка ----------
+
+    def add_reload_listener(self, callback: Callable[[str], None]):
+        """Вызывать callback(name) после перезагрузки набора (для сброса производных кэшей)"""
+        self._listeners.append(callback)
+
+    def check_reload(self) -> List[str]:
+        """Перезагрузить наборы, у которых изменился mtime; вернуть их имена"""
+        reloaded = []
+        for name in self.SOURCES:
+            if self._mtime(name) != self._mtimes.get(name) and self.load(name):
+                reloaded.append(name)
+                for callback in self._listeners:
+                    try:
+                        callback(name)
+                    except Exception as e:
+                        logger.error(f"Ошибка слушателя перезагрузки {name}: {e}")
+        return reloaded
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.check_reload()
+            except Exception as e:
+                logger.error(f"Ошибка проверки справочников: {e}")
+
+    def start_watching(self, interval: float = GAME_DATA_RELOAD_INTERVAL):
+        """Запустить фоновую проверку mtime (в запущенном event loop)"""
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+
+# Общий реестр справочников
+game_data = GameDataRegistry()
@@ -0,0 +1,158 @@
+import re
+from bisect import bisect_left
+from typing import Dict, List, Set, Tuple
+import logging
+from game_data import game_data, GameDataRegistry
+
+logger = logging.getLogger(__name__)
+
+SEARCH_LIMIT = 10
+# Сколько кандидатов по n-граммам проверять расстоянием Левенштейна
+FUZZY_CANDIDATES = 40
+
+_NON_WORD_RE = re.compile(r"[^\w ]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр, ё -> е, без пунктуации, одиночные пробелы"""
+    text = text.lower().replace('ё', 'е').replace('-', ' ')
+    text = _NON_WORD_RE.sub('', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+def trigrams(term: str) -> Set[str]:
+    """Триграммы с отступами по краям (короткие слова тоже дают n-граммы)"""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Дамерау-Левенштейна (с перестановкой соседних букв), с отсечкой по limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class HeroSearchIndex:
+    """Поиск героев по имени, русским названиям и сокращениям.
+
+    Строится один раз из реестра справочников: отсортированный список
+    терминов для поиска по префиксу (bisect) и триграммный индекс для
+    подстрок и опечаток. Результаты ранжируются: точное совпадение,
+    префикс, подстрока, затем по расстоянию редактирования.
+    """
+
+    def __init__(self, registry: GameDataRegistry = game_data):
+        self.registry = registry
+        # (отсортированные термины, id героев по терминам, триграммы -> номера терминов)
+        self._index: Tuple[List[str], List[int], Dict[str, List[int]]] = ([], [], {})
+        self.rebuild()
+        registry.add_reload_listener(self._on_reload)
+
+    def _on_reload(self, name: str):
+        if name in ('hero_names', 'hero_aliases'):
+            self.rebuild()
+
+    def rebuild(self):
+        """Пересобрать индекс из текущих справочников"""
+        pairs = set()
+        for hero_id, name in self.registry.hero_list:
+            variants = [name] + list(self.registry.hero_aliases.get(str(hero_id), ()))
+            for variant in variants:
+                term = normalize(variant)
+                if not term:
+                    continue
+                pairs.add((term, hero_id))
+                # Слитное написание и отдельные слова: "crystalmaiden", "maiden"
+                pairs.add((term.replace(' ', ''), hero_id))
+                for word in term.split(' '):
+                    if len(word) >= 2:
+                        pairs.add((word, hero_id))
+
+        ordered = sorted(pairs)
+        terms = [t for t, _ in ordered]
+        hero_ids = [h for _, h in ordered]
+        grams: Dict[str, List[int]] = {}
+        for i, term in enumerate(terms):
+            for gram in trigrams(term):
+                grams.setdefault(gram, []).append(i)
+
+        # Подмена одним присваиванием: поиск всегда видит целый индекс
+        self._index = (terms, hero_ids, grams)
+        logger.info(f"✅ Индекс поиска героев: {len(terms)} терминов")
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[Tuple[int, str]]:
+        """Герои, подходящие под запрос: [(hero_id, имя)], лучшие первыми"""
+        q = normalize(query)
+        if not q:
+            return []
+
+        terms, hero_ids, grams = self._index
+        scores: Dict[int, float] = {}
+
+        def offer(i: int, score: float):
+            hero_id = hero_ids[i]
+            if score < scores.get(hero_id, float('inf')):
+                scores[hero_id] = score
+
+        for variant in {q, q.replace(' ', '')}:
+            # Точное совпадение и префикс
+            i = bisect_left(terms, variant)
+            while i < len(terms) and terms[i].startswith(variant):
+                extra = len(terms[i]) - len(variant)
+                offer(i, 0 if extra == 0 else 1 + extra / 100)
+                i += 1
+
+            # Подстрока: кандидаты - термины со всеми внутренними триграммами запроса
+            if len(variant) >= 3:
+                inner = [variant[k:k + 3] for k in range(len(variant) - 2)]
+                postings = [set(grams.get(g, ())) for g in inner]
+                for i in set.intersection(*postings) if postings else ():
+                    if variant in terms[i]:
+                        offer(i, 2 + len(terms[i]) / 100)
+
+        # Опечатки: ближайшие по общим триграммам (коэффициент Дайса),
+        # затем расстояние редактирования до термина или его начала
+        if len(q) >= 3:
+            max_distance = 1 if len(q) <= 5 else 2
+            query_grams = trigrams(q)
+            shared: Dict[int, int] = {}
+            for gram in query_grams:
+                for i in grams.get(gram, ()):
+                    shared[i] = shared.get(i, 0) + 1
+            candidates = sorted(
+                shared,
+                key=lambda i: shared[i] / (len(query_grams) + len(terms[i]) + 1),
+                reverse=True
+            )[:FUZZY_CANDIDATES]
+            for i in candidates:
+                term = terms[i]
+                distance = edit_distance(q, term, max_distance)
+                if distance <= max_distance:
+                    offer(i, 3 + distance)
+                elif len(term) > len(q):
+                    # Опечатка в недописанном имени: "imvok" -> "invoker"
+                    distance = edit_distance(q, term[:len(q)], max_distance)
+                    if distance <= max_distance:
+                        offer(i, 3.5 + distance)
+
+        ranked = sorted(scores.items(), key=lambda s: (s[1], self.registry.hero_name(s[0])))
+        return [(hero_id, self.registry.hero_name(hero_id)) for hero_id, _ in ranked[:limit]]
+
+
+# Общий индекс поиска героев
+hero_search = HeroSearchIndex()
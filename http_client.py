@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import asyncio
+import aiohttp
+from multidict import CIMultiDict
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+import logging
+from response_cache import ResponseCache, response_cache
+from request_coalescer import RequestCoalescer
+from metrics import api_cache, api_request_seconds, api_responses, endpoint_name
+from tracing import span
+from rate_limiter import (
+    RateLimiter, RateLimitExceeded, PRIORITY_INTERACTIVE, opendota_limiter
+)
+
+logger = logging.getLogger(__name__)
+
+# Лимиты соединений и таймауты (можно переопределить через переменные окружения)
+HTTP_TOTAL_CONNECTIONS = int(os.getenv("HTTP_TOTAL_CONNECTIONS", "100"))
+HTTP_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_CONNECTIONS_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+
+class ApiResponse:
+    """Прочитанный ответ API: статус, заголовки и разобранный JSON.
+
+    Заголовки без учета регистра (Retry-After и retry-after - одно и то же).
+    """
+
+    __slots__ = ('status', 'data', 'headers', 'size')
+
+    def __init__(self, status: int, data, headers: Mapping[str, str], size: int = 0):
+        self.status = status
+        self.data = data
+        self.headers = headers
+        self.size = size
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+
+class HttpClient:
+    """Общий HTTP клиент с пулом соединений для OpenDota и Steam"""
+
+    def __init__(self, cache: Optional[ResponseCache] = None,
+                 limiters: Optional[Dict[str, RateLimiter]] = None):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.cache = cache
+        self.limiters = limiters or {}
+        self.coalescer = RequestCoalescer()
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Создать сессию (вызывается при старте бота в main())"""
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=HTTP_TOTAL_CONNECTIONS,
+                    limit_per_host=HTTP_CONNECTIONS_PER_HOST,
+                    keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                    use_dns_cache=True,
+                )
+                timeout = aiohttp.ClientTimeout(
+                    total=HTTP_TIMEOUT,
+                    sock_connect=HTTP_CONNECT_TIMEOUT,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=timeout,
+                    raise_for_status=False,
+                )
+                logger.info("✅ HTTP клиент запущен")
+            return self._session
+
+    async def close(self):
+        """Закрыть сессию и все соединения (вызывается при остановке бота)"""
+        async with self._lock:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+                logger.info("✅ HTTP клиент остановлен")
+            self._session = None
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Текущая сессия; создается лениво, если start() еще не вызывался"""
+        if self._session is None or self._session.closed:
+            return await self.start()
+        return self._session
+
+    async def get_json(self, url: str, params: Optional[Dict] = None,
+                       timeout: Optional[float] = None,
+                       use_cache: bool = True,
+                       priority: int = PRIORITY_INTERACTIVE) -> ApiResponse:
+        """GET запрос с разбором JSON.
+
+        Успешные ответы кэшируемых эндпоинтов OpenDota берутся из кэша,
+        а одновременные одинаковые запросы объединяются в один. Для хостов
+        с лимитером запрос ждет своей очереди по priority, а на 429
+        повторяется с паузой по Retry-After или backoff.
+        Сетевые ошибки (aiohttp.ClientError, asyncio.TimeoutError) пробрасываются
+        вызывающему коду, как и раньше при работе с собственной сессией.
+        """
+        endpoint = endpoint_name(url)
+        cache_key = self.cache.key_for(url, params) if self.cache is not None and use_cache else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            api_cache.inc(endpoint=endpoint, result='miss' if cached is None else 'hit')
+            if cached is not None:
+                return cached
+
+        async def load() -> ApiResponse:
+            response = await self._fetch_limited(url, params, timeout, priority)
+            if cache_key is not None and response.ok:
+                self.cache.set(cache_key, response, response.size)
+            return response
+
+        # Приоритет входит в ключ: интерактивный запрос не должен ждать
+        # в фоновой очереди лимитера, присоединившись к фоновому
+        flight_key = (url, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())), priority)
+        # Спан включает ожидание лимитера и чужого одинакового запроса
+        with span(f"http:{endpoint}") as s:
+            response = await self.coalescer.run(flight_key, load)
+            s.set(status=response.status)
+        return response
+
+    async def _fetch_limited(self, url: str, params: Optional[Dict],
+                             timeout: Optional[float], priority: int) -> ApiResponse:
+        limiter = self.limiters.get(urlsplit(url).hostname)
+        if limiter is None:
+            return await self._fetch(url, params, timeout)
+
+        attempt = 0
+        while True:
+            try:
+                await limiter.acquire(priority)
+            except RateLimitExceeded as e:
+                # Ведем себя как при 429 от сервера, не тратя запрос
+                logger.warning(f"⚠️ Запрос не отправлен: {e}")
+                return ApiResponse(429, None, CIMultiDict(), 0)
+
+            response = await self._fetch(url, params, timeout)
+            if response.status != 429:
+                return response
+
+            limiter.on_rate_limited(limiter.backoff_delay(attempt, response.headers.get('Retry-After')))
+            if attempt >= limiter.max_retries:
+                return response
+            attempt += 1
+
+    async def _fetch(self, url: str, params: Optional[Dict],
+                     timeout: Optional[float]) -> ApiResponse:
+        session = await self.session()
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        endpoint = endpoint_name(url)
+        started = time.perf_counter()
+        status = 'error'
+
+        try:
+            with span("fetch") as s:
+                async with session.get(url, params=params, timeout=request_timeout) as r:
+                    status = r.status
+                    s.set(status=status)
+                    body = await r.read()
+        finally:
+            api_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+            api_responses.inc(endpoint=endpoint, status=status)
+
+        data = None
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                logger.warning(f"⚠️ Некорректный JSON от {url} (статус {status})")
+        return ApiResponse(status, data, CIMultiDict(r.headers), len(body))
+
+
+# Единственный экземпляр на процесс
+http_client = HttpClient(
+    cache=response_cache,
+    limiters={opendota_limiter.name: opendota_limiter}
+)
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+import logging
+from database import Database, run_in_db_thread
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """Таблица лидеров в памяти: отсортированный список (-очки, user_id).
+
+    Заполняется из users при старте и обновляется после каждого commit,
+    меняющего очки. Место игрока и соседи ищутся бинарным поиском,
+    без ORDER BY по всей таблице.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: List[Tuple[int, int]] = []
+        self._scores: Dict[int, int] = {}
+        self._names: Dict[int, str] = {}
+
+    def load(self, db: Database):
+        """Заполнить таблицу из базы (синхронно, в потоке базы)"""
+        with db.transaction() as c:
+            c.execute("SELECT telegram_id, username, score FROM users")
+            rows = c.fetchall()
+
+        with self._lock:
+            self._scores = {user_id: score or 0 for user_id, _, score in rows}
+            self._names = {user_id: username for user_id, username, _ in rows if username}
+            self._entries = sorted((-score, user_id) for user_id, score in self._scores.items())
+        logger.info(f"✅ Таблица лидеров: {len(rows)} игроков")
+
+    async def reload_every(self, db: Database, interval: float):
+        """Периодически перечитывать таблицу (очки меняют и другие процессы)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_db_thread(self.load, db)
+            except Exception as e:
+                logger.error(f"Ошибка обновления таблицы лидеров: {e}")
+
+    def set_score(self, user_id: int, score: int, username: Optional[str] = None):
+        """Записать текущие очки игрока"""
+        score = score or 0
+        with self._lock:
+            if username:
+                self._names[user_id] = username
+
+            old = self._scores.get(user_id)
+            if old == score:
+                return
+            if old is not None:
+                i = bisect_left(self._entries, (-old, user_id))
+                if i < len(self._entries) and self._entries[i] == (-old, user_id):
+                    del self._entries[i]
+            insort(self._entries, (-score, user_id))
+            self._scores[user_id] = score
+
+    def track(self, db: Database, c, user_id: int):
+        """Перечитать очки игрока в текущей транзакции и применить их после commit"""
+        c.execute("SELECT username, score FROM users WHERE telegram_id = ?", (user_id,))
+        row = c.fetchone()
+        if row:
+            username, score = row
+            db.after_commit(lambda: self.set_score(user_id, score, username))
+
+    def _row(self, position: int) -> Tuple[int, int, str, int]:
+        score, user_id = self._entries[position]
+        return position + 1, user_id, self._names.get(user_id), -score
+
+    def top(self, limit: int = 10) -> List[Tuple[int, str, int]]:
+        """Лучшие игроки: [(user_id, username, score)]"""
+        with self._lock:
+            return [(user_id, self._names.get(user_id), -score)
+                    for score, user_id in self._entries[:limit]]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """Место игрока (с 1) или None, если его нет в таблице"""
+        with self._lock:
+            score = self._scores.get(user_id)
+            if score is None:
+                return None
+            return bisect_left(self._entries, (-score, user_id)) + 1
+
+    def around(self, user_id: int, radius: int = 2) -> List[Tuple[int, int, str, int]]:
+        """Игрок и соседи по таблице: [(место, user_id, username, score)]"""
+        with self._lock:
+            score = self._scores.get(user_id)
+            if score is None:
+                return []
+            position = bisect_left(self._entries, (-score, user_id))
+            start = max(0, position - radius)
+            end = min(len(self._entries), position + radius + 1)
+            return [self._row(i) for i in range(start, end)]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Общая таблица лидеров
+leaderboard = Leaderboard()
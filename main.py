@@ -1,20 +1,20 @@
 import os
+import re
+import sys
 import asyncio
 import aiohttp
-import json
 import logging
 import traceback  # Добавьте этот импорт
-from datetime import datetime
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, StateFilter
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, InlineQueryResultArticle, InputTextMessageContent
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 from dotenv import load_dotenv
-import sqlite3
 from collections import Counter
 import random
 # В начало main.py после других импортов добавьте:
@@ -23,6 +23,23 @@ from daily_quests_manager import DailyQuestsManager
 from tournament_manager import TournamentManager
 from game_mini_apps import MiniGamesManager
 from achievements_system import AchievementsSystem
+from http_client import http_client
+from response_cache import response_cache
+from match_store import MatchStore
+from database import get_db, in_db_thread, run_in_db_thread, close_all as close_databases
+from leaderboard import leaderboard
+from game_data import game_data
+from hero_search import hero_search
+from builds_catalog import builds_catalog, BuildCardError
+from meta_snapshot import META_NOOP, meta_snapshot, parse_view as parse_meta_view
+from quiz_buffer import quiz_buffer
+from quiz_bank import quiz_bank
+from quiz_generator import quiz_generator
+from fsm_storage import create_storage, FSM_STORAGE
+from sharding import ShardRouter, run_worker, BOT_WORKERS
+from web_server import create_app, start_server, set_webhook, WEBHOOK_URL
+from metrics import HandlerMetricsMiddleware, registry
+from tracing import HandlerSpanMiddleware, TelegramSpanMiddleware, TracingMiddleware
 # Добавьте эти импорты если их нет:
 from aiogram import Router
 from aiogram.types import CallbackQuery
@@ -30,7 +47,8 @@ from aiogram.types import CallbackQuery
 
 
 # Инициализация менеджеров
-adv_stats = AdvancedStats()
+match_store = MatchStore()
+adv_stats = AdvancedStats(match_store=match_store)
 quests_manager = DailyQuestsManager()
 tournament_manager = TournamentManager()
 games_manager = MiniGamesManager()
@@ -47,55 +65,56 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 STEAM_API_KEY = os.getenv("STEAM_API_KEY")
 
+# Как часто обработчик шарда перечитывает таблицу лидеров (режим BOT_WORKERS > 1)
+LEADERBOARD_RELOAD_INTERVAL = int(os.getenv("LEADERBOARD_RELOAD_INTERVAL", "60"))
+
+# Общий дедлайн на параллельные запросы к API в одном хендлере (секунды)
+API_DEADLINE = float(os.getenv("API_DEADLINE", "12"))
+
 if not BOT_TOKEN:
     logger.error("❌ BOT_TOKEN не найден!")
     exit(1)
 
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-storage = MemoryStorage()
+storage = create_storage()  # FSM_STORAGE: sqlite (по умолчанию), redis, memory
 dp = Dispatcher(storage=storage)
 
-# ========== БАЗА ДАННЫХ ==========
-def init_db():
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            telegram_id INTEGER PRIMARY KEY,
-            steam_id TEXT,
-            account_id INTEGER,
-            username TEXT,
-            score INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS friends (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            friend_account_id INTEGER,
-            friend_name TEXT,
-            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(telegram_id)
-        )
-    ''')
-    
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS quiz_state (
-            user_id INTEGER PRIMARY KEY,
-            current_question INTEGER DEFAULT 0,
-            score INTEGER DEFAULT 0,
-            last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    logger.info("✅ База данных инициализирована")
+# Кнопки главного меню
+MENU_ITEMS = (
+    "👤 Профиль", "📊 Статистика", "🎮 Викторина", "👥 Друзья",
+    "⚔️ Мета", "🛠 Сборки", "📈 Анализ", "🎯 Квесты",
+    "🏆 Турниры", "🎮 Игры", "🏅 Достижения", "❤️ Поддержка"
+)
 
-init_db()
+# Префиксы callback_data кнопок бота (остальное в метриках - 'other')
+CALLBACK_ROUTES = (
+    "quiz_continue", "quiz_answer", "quiz_restart", "quiz_leaderboard", "quiz_back",
+    "add_friend", "list_friends", "compare_menu", "compare",
+    "meta_noop", "meta_view",
+    "builds", "builds_search", "builds_back", "hero_build", "hero_role",
+    "profile_back", "refresh_profile", "detailed_stats", "best_heroes", "weekly_stats",
+    "mini_game_tic_tac_toe", "mini_game_random_hero", "back_to_main",
+)
+
+# Время хендлеров по пунктам меню / префиксам callback_data (/metrics)
+handler_metrics = HandlerMetricsMiddleware(MENU_ITEMS, commands=("start",), callback_prefixes=CALLBACK_ROUTES)
+dp.message.middleware(handler_metrics)
+dp.callback_query.middleware(handler_metrics)
+dp.inline_query.middleware(handler_metrics)
+
+# Трассировка: trace id на обновление, таймлайн медленных - в лог slow_updates
+dp.update.outer_middleware(TracingMiddleware())
+handler_spans = HandlerSpanMiddleware()
+dp.message.middleware(handler_spans)
+dp.callback_query.middleware(handler_spans)
+dp.inline_query.middleware(handler_spans)
+bot.session.middleware(TelegramSpanMiddleware())
+registry.gauge('bot_quiz_buffer_pending', 'Несохраненные изменения викторины',
+               function=lambda: quiz_buffer.pending)
+registry.gauge('bot_leaderboard_size', 'Игроков в таблице лидеров', function=lambda: len(leaderboard))
+
+# ========== БАЗА ДАННЫХ ==========
+db = get_db('dota2.db')  # схема создается миграциями (migrations.py)
 
 # ========== STATES ==========
 class ProfileStates(StatesGroup):
@@ -134,15 +153,14 @@ async def extract_account_id(steam_input: str):
                 return None
             
             vanity = steam_input.split("/id/")[-1].split("/")[0]
-            async with aiohttp.ClientSession() as session:
-                url = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/"
-                params = {'key': STEAM_API_KEY, 'vanityurl': vanity}
-                
-                async with session.get(url, params=params, timeout=10) as r:
-                    data = await r.json()
-                    if data.get('response', {}).get('success') == 1:
-                        steam64 = int(data['response']['steamid'])
-                        return steam64_to_account_id(steam64)
+            url = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/"
+            params = {'key': STEAM_API_KEY, 'vanityurl': vanity}
+            
+            r = await http_client.get_json(url, params=params, timeout=10)
+            data = r.data or {}
+            if data.get('response', {}).get('success') == 1:
+                steam64 = int(data['response']['steamid'])
+                return steam64_to_account_id(steam64)
             return None
         
         # 3. Просто SteamID64
@@ -154,15 +172,14 @@ async def extract_account_id(steam_input: str):
         # 4. Только vanity (без /id/)
         elif not steam_input.startswith("http"):
             if STEAM_API_KEY:
-                async with aiohttp.ClientSession() as session:
-                    url = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/"
-                    params = {'key': STEAM_API_KEY, 'vanityurl': steam_input}
-                    
-                    async with session.get(url, params=params, timeout=10) as r:
-                        data = await r.json()
-                        if data.get('response', {}).get('success') == 1:
-                            steam64 = int(data['response']['steamid'])
-                            return steam64_to_account_id(steam64)
+                url = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/"
+                params = {'key': STEAM_API_KEY, 'vanityurl': steam_input}
+                
+                r = await http_client.get_json(url, params=params, timeout=10)
+                data = r.data or {}
+                if data.get('response', {}).get('success') == 1:
+                    steam64 = int(data['response']['steamid'])
+                    return steam64_to_account_id(steam64)
         
         return None
         
@@ -175,60 +192,60 @@ async def get_player_data(account_id: int):
     try:
         logger.info(f"🔄 Запрашиваю данные игрока с Account ID: {account_id}")
         
-        async with aiohttp.ClientSession() as session:
-            url = f"https://api.opendota.com/api/players/{account_id}"
-            logger.info(f"📡 Запрос к OpenDota: {url}")
+        url = f"https://api.opendota.com/api/players/{account_id}"
+        logger.info(f"📡 Запрос к OpenDota: {url}")
+        
+        r = await http_client.get_json(url, timeout=15)
+        if r.status == 200:
+            # Копия: ответ может быть общим объектом из кэша
+            data = dict(r.data or {})
+            logger.info(f"✅ Данные получены успешно")
             
-            async with session.get(url, timeout=15) as r:
-                if r.status == 200:
-                    data = await r.json()
-                    logger.info(f"✅ Данные получены успешно")
-                    
-                    # Проверяем есть ли профиль в ответе
-                    if 'profile' in data:
-                        profile = data.get('profile', {})
-                        name = profile.get('personaname', f'Игрок {account_id}')
-                        logger.info(f"👤 Имя игрока: {name}")
-                    else:
-                        logger.warning(f"⚠️ В ответе нет профиля, создаем базовый")
-                        data['profile'] = {
-                            'personaname': f'Игрок {account_id}',
-                            'account_id': account_id,
-                            'steamid': str(76561197960265728 + account_id)
-                        }
-                    
-                    return data
-                    
-                elif r.status == 404:
-                    logger.warning(f"❌ Игрок {account_id} не найден в OpenDota")
-                    # Возвращаем базовые данные даже если игрок не найден
-                    return {
-                        'profile': {
-                            'personaname': f'Игрок {account_id}',
-                            'account_id': account_id,
-                            'steamid': str(76561197960265728 + account_id)
-                        },
-                        'mmr_estimate': {},
-                        'rank_tier': None
-                    }
-                    
-                elif r.status == 429:
-                    logger.warning(f"⚠️ Превышен лимит запросов к OpenDota (429)")
-                    return {
-                        'profile': {
-                            'personaname': f'Игрок {account_id} (ограничение API)',
-                            'account_id': account_id
-                        }
-                    }
-                    
-                else:
-                    logger.warning(f"⚠️ OpenDota вернул статус {r.status}")
-                    return {
-                        'profile': {
-                            'personaname': f'Игрок {account_id}',
-                            'account_id': account_id
-                        }
-                    }
+            # Проверяем есть ли профиль в ответе
+            if 'profile' in data:
+                profile = data.get('profile', {})
+                name = profile.get('personaname', f'Игрок {account_id}')
+                logger.info(f"👤 Имя игрока: {name}")
+            else:
+                logger.warning(f"⚠️ В ответе нет профиля, создаем базовый")
+                data['profile'] = {
+                    'personaname': f'Игрок {account_id}',
+                    'account_id': account_id,
+                    'steamid': str(76561197960265728 + account_id)
+                }
+            
+            return data
+            
+        elif r.status == 404:
+            logger.warning(f"❌ Игрок {account_id} не найден в OpenDota")
+            # Возвращаем базовые данные даже если игрок не найден
+            return {
+                'profile': {
+                    'personaname': f'Игрок {account_id}',
+                    'account_id': account_id,
+                    'steamid': str(76561197960265728 + account_id)
+                },
+                'mmr_estimate': {},
+                'rank_tier': None
+            }
+            
+        elif r.status == 429:
+            logger.warning(f"⚠️ Превышен лимит запросов к OpenDota (429)")
+            return {
+                'profile': {
+                    'personaname': f'Игрок {account_id} (ограничение API)',
+                    'account_id': account_id
+                }
+            }
+            
+        else:
+            logger.warning(f"⚠️ OpenDota вернул статус {r.status}")
+            return {
+                'profile': {
+                    'personaname': f'Игрок {account_id}',
+                    'account_id': account_id
+                }
+            }
                     
     except asyncio.TimeoutError:
         logger.error(f"⏱️ Таймаут запроса к OpenDota для {account_id}")
@@ -259,40 +276,53 @@ async def get_player_data(account_id: int):
         }
 
 async def get_matches(account_id: int, limit=100):
-    """Матчи игрока"""
+    """Матчи игрока (из локального хранилища, новые догружаются из API)"""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"https://api.opendota.com/api/players/{account_id}/matches",
-                params={'limit': limit},
-                timeout=15
-            ) as r:
-                if r.status == 200:
-                    return await r.json()
+        await match_store.sync(account_id)
+        return await match_store.get_recent_matches(account_id, limit)
     except:
         return []
 
 async def get_heroes_data():
-    """Данные героев"""
-    try:
-        with open('hero_names.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return {}
+    """Данные героев (из реестра справочников)"""
+    return game_data.hero_names
 
 async def get_winloss(account_id: int):
     """Статистика побед/поражений"""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"https://api.opendota.com/api/players/{account_id}/wl",
-                timeout=10
-            ) as r:
-                if r.status == 200:
-                    return await r.json()
+        r = await http_client.get_json(
+            f"https://api.opendota.com/api/players/{account_id}/wl",
+            timeout=10
+        )
+        if r.status == 200:
+            return r.data
     except:
         return None
 
+async def gather_with_deadline(*coros, timeout: float = API_DEADLINE):
+    """Параллельный запуск независимых запросов с общим дедлайном.
+    
+    Результаты возвращаются в порядке аргументов; для упавших или
+    не успевших к дедлайну запросов - None (частичный результат).
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"⏱️ {len(pending)} из {len(tasks)} запросов не уложились в {timeout} с")
+    
+    results = []
+    for task in tasks:
+        if task in done and task.exception() is None:
+            results.append(task.result())
+        else:
+            if task in done:
+                logger.error(f"Ошибка параллельного запроса: {task.exception()}")
+            results.append(None)
+    return results
+
 # ========== ОПРЕДЕЛЕНИЕ РОЛИ ==========
 def determine_main_role(matches):
     """Определяет основную роль игрока по последним матчам"""
@@ -323,65 +353,57 @@ def determine_main_role(matches):
     return "Универсал"
 
 # ========== DATABASE FUNCTIONS ==========
+@in_db_thread
 def save_user(telegram_id, steam_id, account_id, username=""):
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    c.execute(
-        "INSERT OR REPLACE INTO users (telegram_id, steam_id, account_id, username) VALUES (?, ?, ?, ?)",
-        (telegram_id, steam_id, account_id, username)
-    )
-    conn.commit()
-    conn.close()
-
+    with db.transaction() as c:
+        # Upsert вместо INSERT OR REPLACE: очки и дата регистрации сохраняются
+        c.execute('''
+            INSERT INTO users (telegram_id, steam_id, account_id, username) VALUES (?, ?, ?, ?)
+            ON CONFLICT(telegram_id) DO UPDATE SET
+                steam_id = excluded.steam_id,
+                account_id = excluded.account_id,
+                username = excluded.username
+        ''', (telegram_id, steam_id, account_id, username))
+        leaderboard.track(db, c, telegram_id)
+
+@in_db_thread
 def get_user(telegram_id):
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-    row = c.fetchone()
-    conn.close()
-    return row
+    with db.transaction() as c:
+        c.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
+        row = c.fetchone()
+        return row
 
+@in_db_thread
 def add_friend(telegram_id, friend_account_id, friend_name):
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO friends (user_id, friend_account_id, friend_name) VALUES (?, ?, ?)",
-        (telegram_id, friend_account_id, friend_name)
-    )
-    conn.commit()
-    conn.close()
-
+    with db.transaction() as c:
+        # Повторное добавление того же друга только обновляет имя
+        c.execute('''
+            INSERT INTO friends (user_id, friend_account_id, friend_name) VALUES (?, ?, ?)
+            ON CONFLICT(user_id, friend_account_id) DO UPDATE SET friend_name = excluded.friend_name
+        ''', (telegram_id, friend_account_id, friend_name))
+
+@in_db_thread
 def get_friends(telegram_id):
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    c.execute(
-        "SELECT friend_account_id, friend_name FROM friends WHERE user_id = ?",
-        (telegram_id,)
-    )
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    with db.transaction() as c:
+        c.execute(
+            "SELECT friend_account_id, friend_name FROM friends WHERE user_id = ?",
+            (telegram_id,)
+        )
+        rows = c.fetchall()
+        return rows
 
+@in_db_thread
 def update_score(telegram_id, points):
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    c.execute(
-        "UPDATE users SET score = score + ? WHERE telegram_id = ?",
-        (points, telegram_id)
-    )
-    conn.commit()
-    conn.close()
-
-def get_leaderboard(limit=10):
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    c.execute(
-        "SELECT telegram_id, username, score FROM users ORDER BY score DESC LIMIT ?",
-        (limit,)
-    )
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    with db.transaction() as c:
+        c.execute(
+            "UPDATE users SET score = score + ? WHERE telegram_id = ?",
+            (points, telegram_id)
+        )
+        leaderboard.track(db, c, telegram_id)
+
+async def get_leaderboard(limit=10):
+    # Таблица лидеров в памяти, обновляется при каждом изменении очков
+    return leaderboard.top(limit)
 
 # ========== KEYBOARDS ==========
 def get_main_keyboard():
@@ -417,19 +439,14 @@ async def start_cmd(message: types.Message):
     )
 
 # Заменяем старый обработчик на новый, более надежный
-@dp.message(F.text)
+# Только вне FSM-состояний: ввод в поиске героя и добавлении друга идет своим хендлерам
+@dp.message(StateFilter(None), F.text)
 async def handle_text_input(message: types.Message):
     text = message.text.strip()
     
     # Пропускаем команды меню
-    menu_items = [
-        "👤 Профиль", "📊 Статистика", "🎮 Викторина", "👥 Друзья",
-        "⚔️ Мета", "🛠 Сборки", "📈 Анализ", "🎯 Квесты",
-        "🏆 Турниры", "🎮 Игры", "🏅 Достижения", "❤️ Поддержка"
-    ]
-    
-    if text in menu_items:
-        return  # Эти сообщения обрабатываются другими хендлерами
+    if text in MENU_ITEMS:
+        raise SkipHandler()  # Эти сообщения обрабатываются другими хендлерами
     
     # Проверяем, похоже ли сообщение на Steam ссылку или ID
     is_steam_input = False
@@ -466,18 +483,19 @@ async def handle_steam_profile(message: types.Message):
     if account_id:
         logger.info(f"Успешно извлечен Account ID: {account_id}")
         
-        # Получаем данные игрока
-        player_data = await get_player_data(account_id)
+        # Получаем данные игрока и статистику параллельно
+        player_data, winloss = await gather_with_deadline(
+            get_player_data(account_id),
+            get_winloss(account_id)
+        )
         
         if player_data:
             profile = player_data.get('profile', {})
             name = profile.get('personaname', 'Игрок')
             
             # Сохраняем пользователя
-            save_user(message.from_user.id, text, account_id, name)
+            await save_user(message.from_user.id, text, account_id, name)
             
-            # Получаем дополнительную статистику
-            winloss = await get_winloss(account_id)
             if winloss:
                 wins = winloss.get('win', 0)
                 losses = winloss.get('lose', 0)
@@ -502,7 +520,7 @@ async def handle_steam_profile(message: types.Message):
             )
         else:
             # Сохраняем даже если не получили данные профиля
-            save_user(message.from_user.id, text, account_id, "")
+            await save_user(message.from_user.id, text, account_id, "")
             
             await message.answer(
                 f"✅ <b>Account ID привязан!</b>\n\n"
@@ -593,23 +611,22 @@ async def extract_account_id_enhanced(steam_input: str):
                     vanity = parts[1].split("/")[0]
                     logger.info(f"Пытаюсь разрешить Vanity URL: {vanity}")
                     
-                    async with aiohttp.ClientSession() as session:
-                        url = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/"
-                        params = {'key': STEAM_API_KEY, 'vanityurl': vanity}
+                    url = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/"
+                    params = {'key': STEAM_API_KEY, 'vanityurl': vanity}
+                    
+                    r = await http_client.get_json(url, params=params, timeout=10)
+                    if r.status == 200:
+                        data = r.data or {}
+                        logger.info(f"Steam API ответ: {data}")
                         
-                        async with session.get(url, params=params, timeout=10) as r:
-                            if r.status == 200:
-                                data = await r.json()
-                                logger.info(f"Steam API ответ: {data}")
-                                
-                                if data.get('response', {}).get('success') == 1:
-                                    steam64 = int(data['response']['steamid'])
-                                    account_id = steam64_to_account_id(steam64)
-                                    logger.info(f"Разрешено {vanity} -> {steam64} -> {account_id}")
-                                    return account_id
-                                else:
-                                    logger.warning(f"Steam API не смог разрешить {vanity}")
-                                    return None
+                        if data.get('response', {}).get('success') == 1:
+                            steam64 = int(data['response']['steamid'])
+                            account_id = steam64_to_account_id(steam64)
+                            logger.info(f"Разрешено {vanity} -> {steam64} -> {account_id}")
+                            return account_id
+                        else:
+                            logger.warning(f"Steam API не смог разрешить {vanity}")
+                            return None
             except Exception as e:
                 logger.error(f"Ошибка разрешения Vanity URL: {e}")
                 return None
@@ -653,7 +670,7 @@ async def handle_steam_input(message: types.Message):
             profile = player_data.get('profile', {})
             name = profile.get('personaname', 'Игрок')
             
-            save_user(message.from_user.id, text, account_id, name)
+            await save_user(message.from_user.id, text, account_id, name)
             
             await message.answer(
                 f"✅ <b>Профиль привязан!</b>\n\n"
@@ -663,7 +680,7 @@ async def handle_steam_input(message: types.Message):
                 reply_markup=get_main_keyboard()
             )
         else:
-            save_user(message.from_user.id, text, account_id, "")
+            await save_user(message.from_user.id, text, account_id, "")
             await message.answer(
                 f"✅ Account ID привязан: <code>{account_id}</code>\n\n"
                 f"<i>Не удалось получить данные профиля. Возможно профиль скрыт.</i>",
@@ -682,8 +699,9 @@ async def handle_steam_input(message: types.Message):
         )
 
 @dp.message(F.text == "👤 Профиль")
-async def profile_cmd(message: types.Message):
-    user = get_user(message.from_user.id)
+async def profile_cmd(message: types.Message, telegram_id: int = None):
+    # Из callback-кнопок message - сообщение бота, поэтому id передается явно
+    user = await get_user(telegram_id or message.from_user.id)
     
     if not user or not user[2]:
         await message.answer("❌ Профиль не привязан. Отправьте Steam ссылку.")
@@ -692,9 +710,11 @@ async def profile_cmd(message: types.Message):
     account_id = user[2]
     await message.chat_action("typing")
     
-    # Получаем данные
-    player_data = await get_player_data(account_id)
-    matches = await get_matches(account_id, 20)
+    # Получаем данные (параллельно)
+    player_data, matches = await gather_with_deadline(
+        get_player_data(account_id),
+        get_matches(account_id, 20)
+    )
     
     if not player_data:
         await message.answer("❌ Не удалось получить данные профиля.")
@@ -797,7 +817,7 @@ async def profile_cmd(message: types.Message):
 
 @dp.message(F.text == "📊 Статистика")
 async def stats_cmd(message: types.Message):
-    user = get_user(message.from_user.id)
+    user = await get_user(message.from_user.id)
     
     if not user or not user[2]:
         await message.answer("❌ Сначала привяжите профиль.")
@@ -807,8 +827,10 @@ async def stats_cmd(message: types.Message):
     await message.chat_action("typing")
     
     # Получаем общую статистику
-    winloss = await get_winloss(account_id)
-    matches = await get_matches(account_id, 50)
+    winloss, matches = await gather_with_deadline(
+        get_winloss(account_id),
+        get_matches(account_id, 50)
+    )
     
     if not winloss:
         await message.answer("❌ Не удалось получить статистику.")
@@ -861,85 +883,50 @@ async def stats_cmd(message: types.Message):
     await message.answer(response, parse_mode="HTML")
 
 # ========== QUIZ SYSTEM ==========
-QUIZ_QUESTIONS = [
-    {
-        "question": "Какой герой имеет ультимейт 'Black Hole'?",
-        "options": ["Enigma", "Magnus", "Faceless Void", "Tidehunter"],
-        "correct": 0
-    },
-    {
-        "question": "Какой предмет дает невидимость?",
-        "options": ["Black King Bar", "Manta Style", "Shadow Blade", "Blink Dagger"],
-        "correct": 2
-    },
-    {
-        "question": "Кто является боссом на реке?",
-        "options": ["Roshan", "Tormentor", "Ancient", "Courier"],
-        "correct": 0
-    },
-    {
-        "question": "Сколько игроков в команде Dota 2?",
-        "options": ["4", "5", "6", "7"],
-        "correct": 1
-    },
-    {
-        "question": "Какой максимальный уровень у героя?",
-        "options": ["20", "25", "30", "Без ограничений"],
-        "correct": 1
-    }
-]
-
-def get_quiz_state(user_id):
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    c.execute("SELECT * FROM quiz_state WHERE user_id = ?", (user_id,))
-    row = c.fetchone()
-    conn.close()
-    
-    if not row:
-        conn = sqlite3.connect('dota2.db')
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO quiz_state (user_id, current_question, score) VALUES (?, ?, ?)",
-            (user_id, 0, 0)
-        )
-        conn.commit()
-        conn.close()
-        return (user_id, 0, 0, datetime.now().isoformat())
-    
-    return row
-
-def update_quiz_state(user_id, question_num, score):
-    conn = sqlite3.connect('dota2.db')
-    c = conn.cursor()
-    c.execute(
-        "UPDATE quiz_state SET current_question = ?, score = ?, last_active = CURRENT_TIMESTAMP WHERE user_id = ?",
-        (question_num, score, user_id)
+async def get_quiz_state(user_id):
+    # Через буфер: несохраненные ответы видны сразу
+    return await quiz_buffer.get_state(user_id)
+
+def quiz_question_screen(user_id, seed, position, prefix=""):
+    """Текст и готовая клавиатура вопроса на позиции position"""
+    qid = quiz_bank.question_id(user_id, seed, position)
+    question_text, markup = quiz_bank.question(qid)
+    text = (
+        f"{prefix}"
+        f"❓ Вопрос {position + 1}/{quiz_bank.round_size}\n\n"
+        f"{question_text}"
     )
-    conn.commit()
-    conn.close()
+    return text, markup
+
+def quiz_finished_markup():
+    keyboard = InlineKeyboardBuilder()
+    keyboard.button(text="🔄 Начать заново", callback_data="quiz_restart")
+    keyboard.button(text="🏆 Топ игроков", callback_data="quiz_leaderboard")
+    keyboard.adjust(1)
+    return keyboard.as_markup()
 
 @dp.message(F.text == "🎮 Викторина")
 async def quiz_menu(message: types.Message):
-    state = get_quiz_state(message.from_user.id)
+    if not quiz_bank.round_size:
+        await message.answer("❌ Вопросы викторины не загружены.")
+        return
+
+    state = await get_quiz_state(message.from_user.id)
     current_question = state[1]
     score = state[2]
+    max_score = quiz_bank.round_size * 10
     
-    keyboard = InlineKeyboardBuilder()
-    
-    if current_question >= len(QUIZ_QUESTIONS):
-        keyboard.button(text="🔄 Начать заново", callback_data="quiz_restart")
-        keyboard.button(text="🏆 Топ игроков", callback_data="quiz_leaderboard")
-        
+    if current_question >= quiz_bank.round_size:
         await message.answer(
             f"🎮 <b>Викторина завершена!</b>\n\n"
-            f"🏆 Ваш счет: {score}/{len(QUIZ_QUESTIONS)}\n"
-            f"📊 Правильных ответов: {(score/len(QUIZ_QUESTIONS)*100):.1f}%\n\n"
+            f"🏆 Ваш счет: {score}/{max_score}\n"
+            f"📊 Правильных ответов: {(score/max_score*100):.1f}%\n\n"
             f"Начать заново или посмотреть топ?",
-            reply_markup=keyboard.as_markup(),
+            reply_markup=quiz_finished_markup(),
             parse_mode="HTML"
         )
     else:
+        keyboard = InlineKeyboardBuilder()
         keyboard.button(text="🎯 Продолжить", callback_data="quiz_continue")
         keyboard.button(text="🔄 Начать заново", callback_data="quiz_restart")
         keyboard.button(text="🏆 Топ игроков", callback_data="quiz_leaderboard")
@@ -947,7 +934,7 @@ async def quiz_menu(message: types.Message):
         
         await message.answer(
             f"🎮 <b>Викторина по Dota 2</b>\n\n"
-            f"📊 Прогресс: {current_question}/{len(QUIZ_QUESTIONS)}\n"
+            f"📊 Прогресс: {current_question}/{quiz_bank.round_size}\n"
             f"🏆 Текущий счет: {score}\n\n"
             f"Продолжить или начать заново?",
             reply_markup=keyboard.as_markup(),
@@ -956,81 +943,69 @@ async def quiz_menu(message: types.Message):
 
 @dp.callback_query(F.data == "quiz_continue")
 async def quiz_continue(callback: types.CallbackQuery):
-    state = get_quiz_state(callback.from_user.id)
+    user_id = callback.from_user.id
+    state = await get_quiz_state(user_id)
     question_num = state[1]
     
-    if question_num >= len(QUIZ_QUESTIONS):
+    if question_num >= quiz_bank.round_size:
         await callback.answer("Викторина завершена!")
         return
     
-    question = QUIZ_QUESTIONS[question_num]
-    
-    keyboard = InlineKeyboardBuilder()
-    for i, option in enumerate(question["options"]):
-        keyboard.button(text=option, callback_data=f"quiz_answer_{i}")
-    keyboard.adjust(2)
-    
-    await callback.message.edit_text(
-        f"❓ Вопрос {question_num + 1}/{len(QUIZ_QUESTIONS)}\n\n"
-        f"{question['question']}",
-        reply_markup=keyboard.as_markup()
-    )
+    text, markup = quiz_question_screen(user_id, state[4], question_num)
+    await callback.message.edit_text(text, reply_markup=markup)
     await callback.answer()
 
 @dp.callback_query(F.data.startswith("quiz_answer_"))
 async def quiz_answer(callback: types.CallbackQuery):
-    answer_idx = int(callback.data.split("_")[-1])
+    # quiz_answer_{qid}_{i}
+    parts = callback.data.split("_")
+    if len(parts) != 4:
+        await callback.answer("Вопрос устарел, откройте викторину заново")
+        return
+    qid, answer_idx = int(parts[2]), int(parts[3])
     user_id = callback.from_user.id
     
-    state = get_quiz_state(user_id)
-    question_num = state[1]
+    # Чтение, проверка и запись состояния - под блокировкой пользователя
+    async with quiz_buffer.user_lock(user_id):
+        state = await get_quiz_state(user_id)
+        question_num, score, seed = state[1], state[2], state[4]
     
-    if question_num >= len(QUIZ_QUESTIONS):
-        await callback.answer("Викторина завершена!")
-        return
-    
-    question = QUIZ_QUESTIONS[question_num]
-    score = state[2]
+        if question_num >= quiz_bank.round_size:
+            await callback.answer("Викторина завершена!")
+            return
+
+        # Кнопка от другого вопроса (уже отвеченного или до обновления пула) -
+        # показываем актуальный
+        if qid != quiz_bank.question_id(user_id, seed, question_num):
+            text, markup = quiz_question_screen(user_id, seed, question_num)
+            await callback.message.edit_text(text, reply_markup=markup)
+            await callback.answer("Вопрос обновился")
+            return
     
-    if answer_idx == question["correct"]:
-        score += 10
-        response = "✅ <b>Правильно!</b> +10 очков 🎉"
-    else:
-        response = "❌ <b>Неправильно!</b>"
+        correct = quiz_bank.is_correct(qid, answer_idx)
+        if correct:
+            score += 10
+            response = "✅ <b>Правильно!</b> +10 очков 🎉"
+        else:
+            response = "❌ <b>Неправильно!</b>"
     
-    # Обновляем состояние
-    update_quiz_state(user_id, question_num + 1, score)
-    update_score(user_id, 10 if answer_idx == question["correct"] else 0)
+        # Обновляем состояние (запишется в базу пачкой)
+        quiz_buffer.set_state(user_id, question_num + 1, score, seed)
+        quiz_buffer.add_score(user_id, 10 if correct else 0)
     
     # Показываем результат и сразу следующий вопрос
-    if question_num + 1 < len(QUIZ_QUESTIONS):
-        next_question = QUIZ_QUESTIONS[question_num + 1]
-        
-        keyboard = InlineKeyboardBuilder()
-        for i, option in enumerate(next_question["options"]):
-            keyboard.button(text=option, callback_data=f"quiz_answer_{i}")
-        keyboard.adjust(2)
-        
-        await callback.message.edit_text(
-            f"{response}\n\n"
-            f"❓ Вопрос {question_num + 2}/{len(QUIZ_QUESTIONS)}\n\n"
-            f"{next_question['question']}",
-            reply_markup=keyboard.as_markup(),
-            parse_mode="HTML"
-        )
+    if question_num + 1 < quiz_bank.round_size:
+        text, markup = quiz_question_screen(user_id, seed, question_num + 1, prefix=f"{response}\n\n")
+        await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
     else:
         # Викторина завершена
-        keyboard = InlineKeyboardBuilder()
-        keyboard.button(text="🔄 Начать заново", callback_data="quiz_restart")
-        keyboard.button(text="🏆 Топ игроков", callback_data="quiz_leaderboard")
-        keyboard.adjust(1)
-        
+        max_score = quiz_bank.round_size * 10
         await callback.message.edit_text(
             f"{response}\n\n"
             f"🎮 <b>Викторина завершена!</b>\n\n"
-            f"🏆 Итоговый счет: {score}/{len(QUIZ_QUESTIONS)*10}\n"
-            f"📊 Правильных ответов: {(score/(len(QUIZ_QUESTIONS)*10)*100):.1f}%",
-            reply_markup=keyboard.as_markup(),
+            f"🏆 Итоговый счет: {score}/{max_score}\n"
+            f"📊 Правильных ответов: {(score/max_score*100):.1f}%",
+            reply_markup=quiz_finished_markup(),
             parse_mode="HTML"
         )
     
@@ -1038,31 +1013,37 @@ async def quiz_answer(callback: types.CallbackQuery):
 
 @dp.callback_query(F.data == "quiz_restart")
 async def quiz_restart(callback: types.CallbackQuery):
-    update_quiz_state(callback.from_user.id, 0, 0)
-    
-    question = QUIZ_QUESTIONS[0]
-    
-    keyboard = InlineKeyboardBuilder()
-    for i, option in enumerate(question["options"]):
-        keyboard.button(text=option, callback_data=f"quiz_answer_{i}")
-    keyboard.adjust(2)
+    if not quiz_bank.round_size:
+        await callback.answer("❌ Вопросы викторины не загружены.")
+        return
+
+    # Новое зерно - новый порядок вопросов
+    seed = random.getrandbits(31)
+    quiz_buffer.set_state(callback.from_user.id, 0, 0, seed)
     
-    await callback.message.edit_text(
-        f"❓ Вопрос 1/{len(QUIZ_QUESTIONS)}\n\n"
-        f"{question['question']}",
-        reply_markup=keyboard.as_markup()
-    )
+    text, markup = quiz_question_screen(callback.from_user.id, seed, 0)
+    await callback.message.edit_text(text, reply_markup=markup)
     await callback.answer()
 
 @dp.callback_query(F.data == "quiz_leaderboard")
 async def quiz_leaderboard(callback: types.CallbackQuery):
-    leaders = get_leaderboard(10)
+    leaders = await get_leaderboard(10)
     
     response = "🏆 <b>Топ игроков викторины:</b>\n\n"
     for i, (user_id, username, score) in enumerate(leaders, 1):
         name = username if username else f"ID {user_id}"
         response += f"{i}. {name}: {score} очков\n"
-    
+
+    # Место игрока и соседи, если он не в топе
+    my_rank = leaderboard.rank(callback.from_user.id)
+    if my_rank:
+        response += f"\n📍 Ваше место: <b>{my_rank}</b> из {len(leaderboard)}\n"
+        if my_rank > len(leaders):
+            for rank, user_id, username, score in leaderboard.around(callback.from_user.id):
+                name = username if username else f"ID {user_id}"
+                marker = "👉 " if user_id == callback.from_user.id else ""
+                response += f"{marker}{rank}. {name}: {score} очков\n"
+
     keyboard = InlineKeyboardBuilder()
     keyboard.button(text="🎯 Вернуться к викторине", callback_data="quiz_back")
     
@@ -1114,7 +1095,7 @@ async def add_friend_process(message: types.Message, state: FSMContext):
         player_data = await get_player_data(account_id)
         if player_data:
             name = player_data.get('profile', {}).get('personaname', 'Друг')
-            add_friend(message.from_user.id, account_id, name)
+            await add_friend(message.from_user.id, account_id, name)
             
             await message.answer(f"✅ Друг {name} добавлен!")
         else:
@@ -1126,7 +1107,7 @@ async def add_friend_process(message: types.Message, state: FSMContext):
 
 @dp.callback_query(F.data == "list_friends")
 async def list_friends(callback: types.CallbackQuery):
-    friends = get_friends(callback.from_user.id)
+    friends = await get_friends(callback.from_user.id)
     
     if not friends:
         await callback.message.answer("📭 У вас пока нет друзей.")
@@ -1145,7 +1126,7 @@ async def list_friends(callback: types.CallbackQuery):
 
 @dp.callback_query(F.data == "compare_menu")
 async def compare_menu_callback(callback: types.CallbackQuery):
-    friends = get_friends(callback.from_user.id)
+    friends = await get_friends(callback.from_user.id)
     
     if not friends:
         await callback.message.answer("📭 У вас пока нет друзей для сравнения.")
@@ -1167,7 +1148,7 @@ async def compare_menu_callback(callback: types.CallbackQuery):
 async def compare_friend(callback: types.CallbackQuery):
     friend_id = int(callback.data.split("_")[1])
     
-    user = get_user(callback.from_user.id)
+    user = await get_user(callback.from_user.id)
     if not user or not user[2]:
         await callback.answer("❌ Сначала привяжите свой профиль!")
         return
@@ -1177,16 +1158,22 @@ async def compare_friend(callback: types.CallbackQuery):
     
     await callback.answer("⏳ Сравниваю статистику...")
     
-    user_data = await get_player_data(user_account)
-    friend_data = await get_player_data(friend_account)
-    
-    user_winloss = await get_winloss(user_account)
-    friend_winloss = await get_winloss(friend_account)
+    user_data, friend_data, user_winloss, friend_winloss = await gather_with_deadline(
+        get_player_data(user_account),
+        get_player_data(friend_account),
+        get_winloss(user_account),
+        get_winloss(friend_account)
+    )
     
-    if not user_data or not friend_data:
+    # Сравнение имеет смысл, если по каждому игроку есть хоть что-то
+    if not (user_data or user_winloss) or not (friend_data or friend_winloss):
         await callback.message.answer("❌ Не удалось получить данные для сравнения.")
         return
     
+    partial = not all((user_data, friend_data, user_winloss, friend_winloss))
+    user_data = user_data or {}
+    friend_data = friend_data or {}
+    
     # MMR
     user_mmr = user_data.get('mmr_estimate', {}).get('estimate', 0)
     friend_mmr = friend_data.get('mmr_estimate', {}).get('estimate', 0)
@@ -1222,83 +1209,57 @@ async def compare_friend(callback: types.CallbackQuery):
 • По винрейту побеждает: {wr_winner}
 """
     
+    if partial:
+        response += "\n<i>⚠️ Часть данных временно недоступна</i>"
+    
     await callback.message.answer(response, parse_mode="HTML")
 
 # ========== META HEROES ==========
 @dp.message(F.text == "⚔️ Мета")
 async def meta_cmd(message: types.Message):
-    await message.chat_action("typing")
+    # Снимок меты готовится в фоне; грузим сами только если его еще нет
+    if not meta_snapshot.screen():
+        await message.chat_action("typing")
+        if not await meta_snapshot.ensure_loaded():
+            await message.answer("❌ Ошибка API. Попробуйте позже.")
+            return
     
+    text, markup = meta_snapshot.screen()
+    await message.answer(text, reply_markup=markup, parse_mode="HTML")
+
+@dp.callback_query(F.data == META_NOOP)
+async def meta_view_current(callback: types.CallbackQuery):
+    # Нажата уже выбранная кнопка - экран не меняется
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("meta_view_"))
+async def meta_view_switch(callback: types.CallbackQuery):
+    view = parse_meta_view(callback.data)
+    if view is None:
+        await callback.answer("⚠️ Кнопка устарела, откройте меню меты заново", show_alert=True)
+        return
+    screen = meta_snapshot.screen(*view)
+    if not screen:
+        await callback.answer("📭 Данные меты еще не загружены")
+        return
+    
+    text, markup = screen
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://api.opendota.com/api/heroStats",
-                timeout=15
-            ) as r:
-                if r.status == 200:
-                    heroes_data = await r.json()
-                    
-                    meta_heroes = []
-                    
-                    for hero in heroes_data:
-                        divine_pick = hero.get('8_pick', 0)
-                        divine_win = hero.get('8_win', 0)
-                        
-                        if divine_pick > 50:
-                            winrate = (divine_win / divine_pick * 100) if divine_pick > 0 else 0
-                            if winrate > 52.0:
-                                meta_heroes.append({
-                                    'name': hero.get('localized_name', 'Unknown'),
-                                    'winrate': winrate,
-                                    'pick_rate': divine_pick,
-                                    'hero_id': hero.get('id', 0)
-                                })
-                    
-                    meta_heroes.sort(key=lambda x: x['winrate'], reverse=True)
-                    
-                    if meta_heroes:
-                        response = "⚔️ <b>Текущая мета (Divine/Immortal):</b>\n\n"
-                        
-                        for i, hero in enumerate(meta_heroes[:15], 1):
-                            response += f"{i}. <b>{hero['name']}</b>\n"
-                            response += f"   📊 Winrate: <code>{hero['winrate']:.1f}%</code>\n"
-                            response += f"   🎯 Пиков: {hero['pick_rate']}\n\n"
-                        
-                        response += "<i>Данные обновляются с OpenDota API</i>"
-                    else:
-                        response = "📭 Не удалось получить данные меты. Попробуйте позже."
-                    
-                    await message.answer(response, parse_mode="HTML")
-                else:
-                    await message.answer("❌ Ошибка API. Попробуйте позже.")
-                    
-    except Exception as e:
-        logger.error(f"Meta error: {e}")
-        await message.answer("❌ Ошибка при получении меты.")
+        await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
+    except TelegramBadRequest as e:
+        # Двойное нажатие: экран уже такой же
+        if "message is not modified" not in str(e):
+            raise
+    finally:
+        await callback.answer()
 
 # ========== HERO BUILDS ==========
 @dp.message(F.text == "🛠 Сборки")
 async def builds_menu(message: types.Message):
-    keyboard = InlineKeyboardBuilder()
-    
-    hero_roles = [
-        ("⚔️ Керри", "carry"),
-        ("🎯 Мидер", "mid"),
-        ("🛡️ Оффлейнер", "offlane"),
-        ("💫 Саппорт", "support"),
-        ("🔮 Хард саппорт", "hard_support"),
-        ("🔍 Поиск героя", "search")
-    ]
-    
-    for role_name, role_id in hero_roles:
-        keyboard.button(text=role_name, callback_data=f"builds_{role_id}")
-    
-    keyboard.adjust(2)
-    
     await message.answer(
         "🛠 <b>Сборки предметов и способностей</b>\n\n"
         "Выберите категорию или найдите героя:",
-        reply_markup=keyboard.as_markup(),
+        reply_markup=builds_catalog.menu_markup,
         parse_mode="HTML"
     )
 
@@ -1314,15 +1275,8 @@ async def search_hero(callback: types.CallbackQuery, state: FSMContext):
 
 @dp.message(ProfileStates.searching_hero)
 async def process_hero_search(message: types.Message, state: FSMContext):
-    search_term = message.text.strip().lower()
-    
-    with open('hero_names.json', 'r', encoding='utf-8') as f:
-        heroes = json.load(f)
-    
-    found_heroes = []
-    for hero_id, hero_name in heroes.items():
-        if search_term in hero_name.lower():
-            found_heroes.append((int(hero_id), hero_name))
+    # Ранжированный поиск по именам, сокращениям и русским названиям
+    found_heroes = hero_search.search(message.text or "")
     
     if found_heroes:
         keyboard = InlineKeyboardBuilder()
@@ -1345,211 +1299,66 @@ async def process_hero_search(message: types.Message, state: FSMContext):
     
     await state.clear()
 
-@dp.callback_query(F.data.startswith("builds_"))
+@dp.inline_query()
+async def inline_hero_search(inline_query: types.InlineQuery):
+    """Автодополнение героев в inline-режиме (@bot имя героя)"""
+    query = inline_query.query.strip()
+    heroes = hero_search.search(query, limit=20) if query else list(game_data.hero_list[:20])
+
+    results = []
+    for hero_id, hero_name in heroes:
+        hero_data = game_data.hero_builds.get(str(hero_id), {})
+        roles = ", ".join(hero_data.get('primary_roles', ()))
+
+        # Карточка сборки из кэша каталога, если она есть
+        try:
+            text, _ = builds_catalog.build_card(str(hero_id))
+        except BuildCardError:
+            text = f"🦸 <b>{hero_name}</b>"
+
+        results.append(InlineQueryResultArticle(
+            id=str(hero_id),
+            title=hero_name,
+            description=roles or "Сборка пока не добавлена",
+            input_message_content=InputTextMessageContent(message_text=text, parse_mode="HTML")
+        ))
+
+    await inline_query.answer(results, cache_time=300)
+
+@dp.callback_query(F.data.in_(builds_catalog.role_callbacks))
 async def builds_by_role(callback: types.CallbackQuery):
-    role_id = callback.data.split("_")[1]
-    
-    if role_id == "search":
-        await search_hero(callback, FSMContext)
-        return
-    
-    # Загружаем данные из hero_builds.json
-    try:
-        with open('hero_builds.json', 'r', encoding='utf-8') as f:
-            heroes_builds = json.load(f)
-    except FileNotFoundError:
-        await callback.message.answer("❌ Файл сборок не найден.")
-        return
-    
-    role_names = {
-        "carry": "Керри",
-        "mid": "Мидер",
-        "offlane": "Оффлейнер",
-        "support": "Саппорт",
-        "hard_support": "Хард саппорт"
-    }
-    
-    role_name = role_names.get(role_id, role_id)
-    
-    # Ищем героев с этой ролью
-    heroes = []
-    for hero_id, hero_data in heroes_builds.items():
-        if role_name in hero_data.get('primary_roles', []) or role_name in hero_data.get('secondary_roles', []):
-            heroes.append((int(hero_id), hero_data.get('name', f"Герой {hero_id}")))
+    role_id = callback.data.split("_", 1)[1]
     
-    if not heroes:
+    # Готовое меню роли из каталога сборок
+    menu = builds_catalog.role_menu(role_id)
+    if not menu:
         await callback.answer("❌ Нет героев для этой роли")
         return
     
-    keyboard = InlineKeyboardBuilder()
-    for hero_id, hero_name in heroes:
-        keyboard.button(text=hero_name, callback_data=f"hero_build_{hero_id}")
-    
-    keyboard.button(text="⬅️ Назад", callback_data="builds_back")
-    keyboard.adjust(1)
-    
-    await callback.message.edit_text(
-        f"🛠 <b>Герои ({role_name}):</b>\n\n"
-        f"Выберите героя для просмотра сборки:",
-        reply_markup=keyboard.as_markup(),
-        parse_mode="HTML"
-    )
+    text, markup = menu
+    await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
     await callback.answer()
 
 @dp.callback_query(F.data.startswith("hero_build_"))
 async def hero_build_display(callback: types.CallbackQuery):
     hero_id = callback.data.split("_")[2]
-    
-    # Загружаем данные из hero_builds.json
-    try:
-        with open('hero_builds.json', 'r', encoding='utf-8') as f:
-            heroes_builds = json.load(f)
-    except FileNotFoundError:
-        await callback.message.answer("❌ Файл сборок не найден.")
-        await callback.answer()
-        return
-    
-    hero_data = heroes_builds.get(hero_id)
-    
-    if not hero_data:
-        await callback.message.answer(f"❌ Сборки для героя с ID {hero_id} не найдены.")
-        await callback.answer()
-        return
-    
-    hero_name = hero_data.get('name', f"Герой {hero_id}")
-    
-    # Получаем первую роль из списка
-    roles = hero_data.get('primary_roles', [])
-    if not roles:
-        roles = hero_data.get('secondary_roles', [])
-    
-    if not roles:
-        await callback.message.answer(f"❌ Для героя {hero_name} не указаны роли.")
-        await callback.answer()
-        return
-    
-    role = roles[0]
-    builds = hero_data.get('builds', {})
-    
-    if role not in builds:
-        # Пытаемся найти любую сборку
-        if builds:
-            role = list(builds.keys())[0]
-        else:
-            await callback.message.answer(f"❌ Для героя {hero_name} нет сборок.")
-            await callback.answer()
-            return
-    
-    build = builds[role]
-    
-    response = f"""
-🛠 <b>{hero_name} ({role})</b>
-
-🎒 <b>Предметы:</b>
-"""
-    
-    for item in build.get("items", []):
-        response += f"• {item}\n"
-    
-    response += f"""
-⚡ <b>Способности:</b>
-{build.get('skills', 'Не указано')}
-
-📈 <b>Прокачка:</b>
-{build.get('skill_build', 'Не указано')}
-
-🌟 <b>Таланты:</b>
-{build.get('talents', 'Не указано')}
-
-🎮 <b>Стиль игры:</b>
-{build.get('playstyle', 'Не указано')}
-
-<i>Сборка основана на текущей мете</i>
-"""
-    
-    # Кнопки для других ролей если есть
-    keyboard = InlineKeyboardBuilder()
-    other_roles = [r for r in builds.keys() if r != role]
-    for other_role in other_roles:
-        keyboard.button(text=f"🎯 {other_role}", callback_data=f"hero_role_{hero_id}_{other_role}")
-    
-    keyboard.button(text="⬅️ Назад", callback_data="builds_back")
-    keyboard.adjust(2)
-    
-    await callback.message.edit_text(
-        response,
-        reply_markup=keyboard.as_markup(),
-        parse_mode="HTML"
-    )
-    await callback.answer()
-
+    await show_build_card(callback, hero_id)
 
 @dp.callback_query(F.data.startswith("hero_role_"))
 async def hero_role_switch(callback: types.CallbackQuery):
-    parts = callback.data.split("_")
-    hero_id = parts[2]
-    role = parts[3]
-    
-    # Загружаем данные из hero_builds.json
+    _, _, hero_id, role = callback.data.split("_", 3)
+    await show_build_card(callback, hero_id, role)
+
+async def show_build_card(callback: types.CallbackQuery, hero_id: str, role: str = None):
+    """Показать готовую карточку сборки (из кэша каталога)"""
     try:
-        with open('hero_builds.json', 'r', encoding='utf-8') as f:
-            heroes_builds = json.load(f)
-    except FileNotFoundError:
-        await callback.message.answer("❌ Файл сборок не найден.")
-        return
-    
-    hero_data = heroes_builds.get(hero_id)
-    if not hero_data:
-        await callback.message.answer("❌ Герой не найден.")
-        return
-    
-    hero_name = hero_data.get('name', f"Герой {hero_id}")
-    builds = hero_data.get('builds', {})
-    
-    if role not in builds:
-        await callback.message.answer(f"❌ Для героя {hero_name} нет сборки для роли {role}.")
+        text, markup = builds_catalog.build_card(hero_id, role)
+    except BuildCardError as e:
+        await callback.message.answer(str(e))
+        await callback.answer()
         return
     
-    build = builds[role]
-    
-    response = f"""
-🛠 <b>{hero_name} ({role})</b>
-
-🎒 <b>Предметы:</b>
-"""
-    
-    for item in build.get("items", []):
-        response += f"• {item}\n"
-    
-    response += f"""
-⚡ <b>Способности:</b>
-{build.get('skills', 'Не указано')}
-
-📈 <b>Прокачка:</b>
-{build.get('skill_build', 'Не указано')}
-
-🌟 <b>Таланты:</b>
-{build.get('talents', 'Не указано')}
-
-🎮 <b>Стиль игры:</b>
-{build.get('playstyle', 'Не указано')}
-
-<i>Сборка основана на текущей мете</i>
-"""
-    
-    keyboard = InlineKeyboardBuilder()
-    other_roles = [r for r in builds.keys() if r != role]
-    for other_role in other_roles:
-        keyboard.button(text=f"🎯 {other_role}", callback_data=f"hero_role_{hero_id}_{other_role}")
-    
-    keyboard.button(text="⬅️ Назад", callback_data=f"hero_build_{hero_id}")
-    keyboard.adjust(2)
-    
-    await callback.message.edit_text(
-        response,
-        reply_markup=keyboard.as_markup(),
-        parse_mode="HTML"
-    )
+    await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
     await callback.answer()
     
 @dp.callback_query(F.data == "builds_back")
@@ -1577,17 +1386,21 @@ async def support_cmd(message: types.Message):
 # ========== BACK BUTTONS ==========
 @dp.callback_query(F.data == "profile_back")
 async def profile_back(callback: types.CallbackQuery):
-    await profile_cmd(callback.message)
+    await profile_cmd(callback.message, callback.from_user.id)
     await callback.answer()
 
 @dp.callback_query(F.data == "refresh_profile")
 async def refresh_profile(callback: types.CallbackQuery):
     await callback.answer("🔄 Обновляю...")
-    await profile_cmd(callback.message)
+    # Сбрасываем кэш ответов OpenDota по игроку, иначе покажем тот же профиль
+    user = await get_user(callback.from_user.id)
+    if user and user[2]:
+        response_cache.invalidate(int(user[2]))
+    await profile_cmd(callback.message, callback.from_user.id)
 
 @dp.callback_query(F.data == "detailed_stats")
 async def detailed_stats(callback: types.CallbackQuery):
-    user = get_user(callback.from_user.id)
+    user = await get_user(callback.from_user.id)
     if not user or not user[2]:
         await callback.answer("❌ Сначала привяжите профиль!")
         return
@@ -1595,8 +1408,10 @@ async def detailed_stats(callback: types.CallbackQuery):
     account_id = user[2]
     await callback.answer("⏳ Получаю подробную статистику...")
     
-    winloss = await get_winloss(account_id)
-    matches = await get_matches(account_id, 50)
+    winloss, matches = await gather_with_deadline(
+        get_winloss(account_id),
+        get_matches(account_id, 50)
+    )
     
     if not winloss:
         await callback.message.answer("❌ Не удалось получить данные.")
@@ -1658,7 +1473,7 @@ async def detailed_stats(callback: types.CallbackQuery):
 
 @dp.callback_query(F.data == "best_heroes")
 async def best_heroes(callback: types.CallbackQuery):
-    user = get_user(callback.from_user.id)
+    user = await get_user(callback.from_user.id)
     if not user or not user[2]:
         await callback.answer("❌ Сначала привяжите профиль!")
         return
@@ -1667,94 +1482,137 @@ async def best_heroes(callback: types.CallbackQuery):
     await callback.answer("⏳ Анализирую героев...")
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"https://api.opendota.com/api/players/{account_id}/heroes",
-                timeout=10
-            ) as r:
-                if r.status == 200:
-                    heroes_data = await r.json()
-                    
-                    valid_heroes = []
-                    for hero in heroes_data:
-                        games = hero.get('games', 0)
-                        wins = hero.get('win', 0)
-                        
-                        if games >= 3:
-                            winrate = (wins / games * 100) if games > 0 else 0
-                            valid_heroes.append({
-                                'hero_id': hero.get('hero_id', 0),
-                                'games': games,
-                                'wins': wins,
-                                'winrate': winrate
-                            })
-                    
-                    valid_heroes.sort(key=lambda x: x['winrate'], reverse=True)
-                    
-                    heroes = await get_heroes_data()
-                    
-                    response = "🏆 <b>Ваши лучшие герои:</b>\n\n"
-                    
-                    for i, hero in enumerate(valid_heroes[:10], 1):
-                        hero_name = heroes.get(str(hero['hero_id']), f"Герой {hero['hero_id']}")
-                        response += f"{i}. <b>{hero_name}</b>\n"
-                        response += f"   📊 {hero['winrate']:.1f}% ({hero['wins']}W-{hero['games']-hero['wins']}L)\n"
-                        response += f"   🎮 Игр: {hero['games']}\n\n"
-                    
-                    if not valid_heroes:
-                        response = "📭 Недостаточно данных по героям. Сыграйте больше игр!"
-                    
-                    keyboard = InlineKeyboardBuilder()
-                    keyboard.button(text="⬅️ Назад в профиль", callback_data="profile_back")
-                    
-                    await callback.message.edit_text(
-                        response,
-                        reply_markup=keyboard.as_markup(),
-                        parse_mode="HTML"
-                    )
-                else:
-                    await callback.message.answer("❌ Не удалось получить данные по героям.")
+        r = await http_client.get_json(
+            f"https://api.opendota.com/api/players/{account_id}/heroes",
+            timeout=10
+        )
+        if r.status == 200:
+            heroes_data = r.data or []
+            
+            valid_heroes = []
+            for hero in heroes_data:
+                games = hero.get('games', 0)
+                wins = hero.get('win', 0)
+                
+                if games >= 3:
+                    winrate = (wins / games * 100) if games > 0 else 0
+                    valid_heroes.append({
+                        'hero_id': hero.get('hero_id', 0),
+                        'games': games,
+                        'wins': wins,
+                        'winrate': winrate
+                    })
+            
+            valid_heroes.sort(key=lambda x: x['winrate'], reverse=True)
+            
+            heroes = await get_heroes_data()
+            
+            response = "🏆 <b>Ваши лучшие герои:</b>\n\n"
+            
+            for i, hero in enumerate(valid_heroes[:10], 1):
+                hero_name = heroes.get(str(hero['hero_id']), f"Герой {hero['hero_id']}")
+                response += f"{i}. <b>{hero_name}</b>\n"
+                response += f"   📊 {hero['winrate']:.1f}% ({hero['wins']}W-{hero['games']-hero['wins']}L)\n"
+                response += f"   🎮 Игр: {hero['games']}\n\n"
+            
+            if not valid_heroes:
+                response = "📭 Недостаточно данных по героям. Сыграйте больше игр!"
+            
+            keyboard = InlineKeyboardBuilder()
+            keyboard.button(text="⬅️ Назад в профиль", callback_data="profile_back")
+            
+            await callback.message.edit_text(
+                response,
+                reply_markup=keyboard.as_markup(),
+                parse_mode="HTML"
+            )
+        else:
+            await callback.message.answer("❌ Не удалось получить данные по героям.")
     
     except Exception as e:
         logger.error(f"Best heroes error: {e}")
         await callback.message.answer("❌ Ошибка при анализе героев.")
 
-# ========== FLASK SERVER FOR RENDER ==========
-from flask import Flask, jsonify
-from threading import Thread
-import waitress
-
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-    return "🤖 Dota2 Bot is running"
-
-@app.route('/health')
-def health():
-    return jsonify({"status": "healthy"}), 200
+# ========== START BOT ==========
+async def start_services():
+    """Фоновые службы процесса, который обрабатывает обновления"""
+    await http_client.start()
+    await run_in_db_thread(leaderboard.load, db)
+    game_data.start_watching()
+    meta_snapshot.start()
+    quiz_buffer.start()
+    quiz_generator.start()
+
+async def stop_services():
+    game_data.stop_watching()
+    meta_snapshot.stop()
+    quiz_generator.stop()
+    await quiz_buffer.close()
+    await http_client.close()
+    close_databases()
+
+async def run_ingress():
+    """Входной процесс: получает обновления и раздает их BOT_WORKERS обработчикам"""
+    if FSM_STORAGE == 'memory':
+        logger.warning("⚠️ FSM_STORAGE=memory: состояния обработчиков не переживут перезапуск")
+
+    router = ShardRouter(BOT_WORKERS, os.path.abspath(__file__))
+    await router.start()
+    logger.info(f"✅ Режим шардирования: {BOT_WORKERS} обработчиков")
+    runner = await start_server(create_app(bot, dp, router, webhook=bool(WEBHOOK_URL),
+                                           checks={"workers": router.alive}))
+    try:
+        if WEBHOOK_URL:
+            await set_webhook(bot, dp)
+            await asyncio.Event().wait()
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await router.poll(bot, dp.resolve_used_update_types())
+    finally:
+        await runner.cleanup()
+        await router.stop()
+        await bot.session.close()
+        close_databases()
 
-@app.route('/ping')
-def ping():
-    return "pong", 200
+async def db_alive():
+    await run_in_db_thread(db.conn.execute, "SELECT 1")
+    return True
 
-def run_flask():
-    port = int(os.environ.get('PORT', 10000))
-    waitress.serve(app, host='0.0.0.0', port=port, threads=1)
+async def http_client_alive():
+    return not http_client.closed
 
-# ========== START BOT ==========
 async def main():
     logger.info("🚀 Starting Dota2 Bot...")
-    
-    flask_thread = Thread(target=run_flask, daemon=True)
-    flask_thread.start()
-    logger.info(f"✅ Flask server started on port {os.environ.get('PORT', 10000)}")
-    
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
 
-if __name__ == "__main__":
-    asyncio.run(main())
+    if BOT_WORKERS > 1:
+        await run_ingress()
+        return
+    
+    await start_services()
+    # Служебные маршруты (/health, /ready, /metrics) и вебхук - в этом же event loop
+    runner = await start_server(create_app(bot, dp, webhook=bool(WEBHOOK_URL),
+                                           checks={"database": db_alive, "http_client": http_client_alive}))
+    try:
+        if WEBHOOK_URL:
+            await set_webhook(bot, dp)
+            await asyncio.Event().wait()
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
+    finally:
+        await runner.cleanup()
+        await stop_services()
+
+async def worker_main(index):
+    """Процесс-обработчик шарда index (запускается из run_ingress)"""
+    await start_services()
+    # Очки меняют и другие обработчики - таблицу лидеров нужно подтягивать
+    reload_task = asyncio.create_task(leaderboard.reload_every(db, LEADERBOARD_RELOAD_INTERVAL))
+    try:
+        await run_worker(index, bot, dp)
+    finally:
+        reload_task.cancel()
+        await stop_services()
 
 @dp.message(F.text == "📈 Анализ")
 async def analysis_menu(message: types.Message):
@@ -1775,7 +1633,7 @@ async def analysis_menu(message: types.Message):
 # Недельная статистика
 @dp.callback_query(F.data == "weekly_stats")
 async def weekly_stats_handler(callback: types.CallbackQuery):
-    user = get_user(callback.from_user.id)
+    user = await get_user(callback.from_user.id)
     if not user or not user[2]:
         await callback.answer("❌ Сначала привяжите профиль!")
         return
@@ -1805,8 +1663,7 @@ async def weekly_stats_handler(callback: types.CallbackQuery):
     best_hero = None
     best_winrate = 0
     
-    with open('hero_names.json', 'r', encoding='utf-8') as f:
-        hero_names = json.load(f)
+    hero_names = game_data.hero_names
     
     for hero_id, hero_data in stats['heroes'].items():
         if hero_data['games'] >= 3:
@@ -1835,12 +1692,12 @@ async def weekly_stats_handler(callback: types.CallbackQuery):
 @dp.message(F.text == "🎯 Квесты")
 async def daily_quests_menu(message: types.Message):
     user_id = message.from_user.id
-    quests = quests_manager.get_user_quests(user_id)
+    quests = await quests_manager.get_user_quests(user_id)
     
     if not quests:
         # Генерируем новые квесты
-        quests_manager.generate_daily_quests(user_id)
-        quests = quests_manager.get_user_quests(user_id)
+        await quests_manager.generate_daily_quests(user_id)
+        quests = await quests_manager.get_user_quests(user_id)
     
     response = "🎯 <b>Ежедневные задания</b>\n\n"
     
@@ -1868,7 +1725,7 @@ async def daily_quests_menu(message: types.Message):
 
 @dp.message(F.text == "🏆 Турниры")
 async def tournaments_menu(message: types.Message):
-    tournaments = tournament_manager.get_active_tournaments()
+    tournaments = await tournament_manager.get_active_tournaments()
     
     if not tournaments:
         response = "🏆 <b>Текущие турниры</b>\n\n"
@@ -1907,7 +1764,7 @@ async def games_menu(message: types.Message):
 
 @dp.message(F.text == "🏅 Достижения")
 async def achievements_menu(message: types.Message):
-    user_achievements = achievements_system.get_user_achievements(message.from_user.id)
+    user_achievements = await achievements_system.get_user_achievements(message.from_user.id)
     # Отображение достижений
 
 @dp.callback_query(F.data == "mini_game_tic_tac_toe")
@@ -1919,10 +1776,7 @@ async def mini_game_tic_tac_toe_handler(callback: types.CallbackQuery):
 @dp.callback_query(F.data == "mini_game_random_hero")
 async def mini_game_random_hero_handler(callback: types.CallbackQuery):
     # Случайный герой
-    with open('hero_names.json', 'r', encoding='utf-8') as f:
-        heroes = json.load(f)
-    
-    hero_id, hero_name = random.choice(list(heroes.items()))
+    hero_id, hero_name = random.choice(game_data.hero_list)
     await callback.message.answer(f"🎲 Ваш случайный герой: <b>{hero_name}</b> (ID: {hero_id})", parse_mode="HTML")
     await callback.answer()
 
@@ -1934,7 +1788,7 @@ async def back_to_main_handler(callback: types.CallbackQuery):
 @dp.message(F.text == "🏅 Достижения")
 async def achievements_menu(message: types.Message):
     user_id = message.from_user.id
-    achievements_data = achievements_system.get_user_achievements(user_id)
+    achievements_data = await achievements_system.get_user_achievements(user_id)
     
     if not achievements_data:
         await message.answer("❌ Не удалось загрузить достижения.")
@@ -1973,10 +1827,7 @@ async def mini_game_tic_tac_toe_handler(callback: types.CallbackQuery):
 @dp.callback_query(F.data == "mini_game_random_hero")
 async def mini_game_random_hero_handler(callback: types.CallbackQuery):
     # Случайный герой
-    with open('hero_names.json', 'r', encoding='utf-8') as f:
-        heroes = json.load(f)
-    
-    hero_id, hero_name = random.choice(list(heroes.items()))
+    hero_id, hero_name = random.choice(game_data.hero_list)
     await callback.message.answer(f"🎲 Ваш случайный герой: <b>{hero_name}</b> (ID: {hero_id})", parse_mode="HTML")
     await callback.answer()
 
@@ -1985,25 +1836,8 @@ async def back_to_main_handler(callback: types.CallbackQuery):
     await callback.message.answer("Возвращаемся в главное меню.", reply_markup=get_main_keyboard())
     await callback.answer()
 
-import re
-
-def fix_chat_action_errors(file_path):
-    """Ищет и исправляет все answer_chat_action на chat_action"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Используем регулярное выражение для поиска
-    pattern = r'await message\.answer_chat_action\("typing"\)'
-    replacement = 'await message.chat_action("typing")'
-    
-    # Заменяем все вхождения
-    fixed_content = re.sub(pattern, replacement, content)
-    
-    # Записываем обратно
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(fixed_content)
-    
-    print(f"✅ Исправлены все answer_chat_action в {file_path}")
-
-# Запустите эту функцию для вашего файла
-fix_chat_action_errors('main.py')
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        asyncio.run(worker_main(int(sys.argv[2])))
+    else:
+        asyncio.run(main())
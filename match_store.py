@@ -0,0 +1,160 @@
+import os
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import logging
+from http_client import http_client
+from request_coalescer import RequestCoalescer
+from database import get_db, in_db_thread
+
+logger = logging.getLogger(__name__)
+
+MATCHES_URL = "https://api.opendota.com/api/players/{account_id}/matches"
+
+# Сколько матчей загружать при первой синхронизации аккаунта
+INITIAL_SYNC_LIMIT = 100
+# Размер страницы при догрузке новых матчей; если за INITIAL_SYNC_LIMIT
+# матчей не встретился сохраненный, история загружается заново
+DELTA_PAGE_SIZE = 20
+# Не ходить в API чаще, чем раз в N секунд на аккаунт
+MIN_SYNC_INTERVAL = int(os.getenv("MATCH_SYNC_INTERVAL", "60"))
+
+
+class MatchStore:
+    """Локальное хранилище матчей игроков с инкрементальной синхронизацией"""
+
+    def __init__(self, db_path='dota2.db'):
+        self.db = get_db(db_path)
+        # Время последней синхронизации по аккаунтам, от старых к новым
+        self._last_sync: "OrderedDict[int, float]" = OrderedDict()
+        self._syncs = RequestCoalescer()
+
+    async def sync(self, account_id: int, force: bool = False) -> bool:
+        """Догрузить матчи новее последнего сохраненного.
+
+        Одновременные синхронизации одного аккаунта объединяются в одну.
+        Возвращает False, если API недоступен (сохраненные матчи остаются).
+        """
+        last = self._last_sync.get(account_id)
+        if not force and last is not None and time.monotonic() - last < MIN_SYNC_INTERVAL:
+            return True
+
+        return await self._syncs.run(account_id, lambda: self._sync(account_id))
+
+    async def _sync(self, account_id: int) -> bool:
+        latest = await self.get_latest_start_time(account_id)
+        url = MATCHES_URL.format(account_id=account_id)
+
+        if latest is None:
+            # Первая синхронизация: одна страница истории
+            pages = [(0, INITIAL_SYNC_LIMIT)]
+        else:
+            pages = [(offset, DELTA_PAGE_SIZE)
+                     for offset in range(0, INITIAL_SYNC_LIMIT, DELTA_PAGE_SIZE)]
+
+        new_matches = []
+        # Догрузка не дошла до сохраненных матчей - между ними была бы дыра
+        reset = False
+        try:
+            for offset, limit in pages:
+                params = {'limit': limit}
+                if offset:
+                    params['offset'] = offset
+
+                # Ответ не кэшируем: хранилище само является кэшем матчей
+                r = await http_client.get_json(url, params=params, timeout=15, use_cache=False)
+                if r.status != 200:
+                    logger.warning(f"⚠️ Синхронизация матчей {account_id}: статус {r.status}")
+                    return False
+
+                page = r.data or []
+                fresh = [m for m in page if latest is None or m.get('start_time', 0) > latest]
+                new_matches.extend(fresh)
+
+                # Дошли до уже сохраненных матчей или до конца истории
+                if len(fresh) < len(page) or len(page) < limit:
+                    break
+            else:
+                reset = latest is not None
+        except Exception as e:
+            logger.error(f"Ошибка синхронизации матчей {account_id}: {e}")
+            return False
+
+        # Сохраняем только полную дельту, чтобы в истории не было дыр
+        if reset:
+            await self.replace_matches(account_id, new_matches)
+            logger.info(f"✅ Матчи {account_id}: история загружена заново ({len(new_matches)})")
+        elif new_matches:
+            await self.save_matches(account_id, new_matches)
+            logger.info(f"✅ Матчи {account_id}: +{len(new_matches)}")
+
+        self._mark_synced(account_id)
+        return True
+
+    def _mark_synced(self, account_id: int):
+        now = time.monotonic()
+        self._last_sync[account_id] = now
+        self._last_sync.move_to_end(account_id)
+        # Записи старше MIN_SYNC_INTERVAL уже ничего не ограничивают
+        while self._last_sync:
+            oldest, synced_at = next(iter(self._last_sync.items()))
+            if now - synced_at < MIN_SYNC_INTERVAL:
+                break
+            del self._last_sync[oldest]
+
+    @in_db_thread
+    def save_matches(self, account_id: int, matches: List[Dict]):
+        """Сохранить матчи аккаунта"""
+        with self.db.transaction() as c:
+            c.executemany('''
+                INSERT OR REPLACE INTO player_matches (account_id, match_id, start_time, data)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (account_id, m['match_id'], m.get('start_time', 0), json.dumps(m))
+                for m in matches if 'match_id' in m
+            ])
+
+    @in_db_thread
+    def replace_matches(self, account_id: int, matches: List[Dict]):
+        """Заменить всю сохраненную историю аккаунта"""
+        with self.db.transaction() as c:
+            c.execute("DELETE FROM player_matches WHERE account_id = ?", (account_id,))
+            self.save_matches.sync(self, account_id, matches)
+
+    @in_db_thread
+    def get_latest_start_time(self, account_id: int) -> Optional[int]:
+        """Время начала последнего сохраненного матча"""
+        with self.db.transaction() as c:
+            c.execute(
+                "SELECT MAX(start_time) FROM player_matches WHERE account_id = ?",
+                (account_id,)
+            )
+            row = c.fetchone()
+            return row[0] if row else None
+
+    @in_db_thread
+    def get_recent_matches(self, account_id: int, limit: int = 100) -> List[Dict]:
+        """Последние матчи аккаунта из локального хранилища"""
+        with self.db.transaction() as c:
+            c.execute('''
+                SELECT data FROM player_matches
+                WHERE account_id = ?
+                ORDER BY start_time DESC
+                LIMIT ?
+            ''', (account_id, limit))
+            rows = c.fetchall()
+            return [json.loads(row[0]) for row in rows]
+
+    @in_db_thread
+    def get_matches_since(self, account_id: int, since: int, limit: int = 100) -> List[Dict]:
+        """Матчи аккаунта, начавшиеся не раньше since (unix time)"""
+        with self.db.transaction() as c:
+            c.execute('''
+                SELECT data FROM player_matches
+                WHERE account_id = ? AND start_time >= ?
+                ORDER BY start_time DESC
+                LIMIT ?
+            ''', (account_id, since, limit))
+            rows = c.fetchall()
+            return [json.loads(row[0]) for row in rows]
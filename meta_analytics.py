@@ -0,0 +1,118 @@
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+# Число ранговых групп OpenDota (1_pick .. 8_pick)
+BRACKET_COUNT = 8
+# z для 95% доверительного интервала Уилсона
+WILSON_Z = 1.96
+
+# Критерии сортировки: ключ -> подпись кнопки
+SORTS = (
+    ('wilson', "🛡 Надежность"),
+    ('winrate', "📊 Винрейт"),
+    ('pickrate', "🎯 Пикрейт"),
+    ('delta', "📈 Рост"),
+)
+SORT_LABELS = dict(SORTS)
+
+
+def wilson_lower_bound(wins: np.ndarray, games: np.ndarray, z: float = WILSON_Z) -> np.ndarray:
+    """Нижняя граница интервала Уилсона для доли побед (0 при отсутствии игр)"""
+    n = np.maximum(games, 1.0)
+    p = np.clip(wins / n, 0.0, 1.0)
+    z2 = z * z
+    centre = p + z2 / (2 * n)
+    margin = z * np.sqrt((p * (1 - p) + z2 / (4 * n)) / n)
+    return np.where(games > 0, (centre - margin) / (1 + z2 / n), 0.0)
+
+
+class MetaTable:
+    """Статистика героев по ранговым группам в колоночном виде.
+
+    picks и wins - матрицы герой × группа; все показатели считаются
+    векторно один раз при построении, выборка топа для любой группы и
+    критерия - это один argsort по готовому столбцу.
+    """
+
+    def __init__(self, hero_ids: Sequence[int], names: Sequence[str],
+                 picks: np.ndarray, wins: np.ndarray):
+        self.hero_ids = np.asarray(hero_ids, dtype=np.int64)
+        self.names = tuple(names)
+        self.picks = np.asarray(picks, dtype=np.float64)
+        self.wins = np.asarray(wins, dtype=np.float64)
+
+        games = self.picks
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.winrate = np.where(games > 0, self.wins / games, 0.0)
+            # В каждом матче 10 пиков: доля матчей группы, где взят герой
+            matches = games.sum(axis=0) / 10
+            self.pickrate = np.where(matches > 0, games / matches, 0.0)
+        self.wilson = wilson_lower_bound(self.wins, games)
+
+        # Изменение винрейта относительно предыдущей (более низкой) группы
+        self.delta = np.zeros_like(self.winrate)
+        self.delta[:, 1:] = np.where(
+            (games[:, 1:] > 0) & (games[:, :-1] > 0),
+            self.winrate[:, 1:] - self.winrate[:, :-1],
+            0.0
+        )
+
+    @classmethod
+    def from_hero_stats(cls, hero_stats: List[Dict]) -> 'MetaTable':
+        """Построить таблицу из ответа /heroStats"""
+        hero_ids = [h.get('id', 0) for h in hero_stats]
+        names = [h.get('localized_name', 'Unknown') for h in hero_stats]
+        picks = np.array([[h.get(f'{b}_pick') or 0 for b in range(1, BRACKET_COUNT + 1)]
+                          for h in hero_stats], dtype=np.float64).reshape(-1, BRACKET_COUNT)
+        wins = np.array([[h.get(f'{b}_win') or 0 for b in range(1, BRACKET_COUNT + 1)]
+                         for h in hero_stats], dtype=np.float64).reshape(-1, BRACKET_COUNT)
+        return cls(hero_ids, names, picks, wins)
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[int, str, int, int, int]]) -> 'MetaTable':
+        """Построить таблицу из строк (hero_id, name, bracket, picks, wins)"""
+        order = {}
+        names = []
+        for hero_id, name, _, _, _ in rows:
+            if hero_id not in order:
+                order[hero_id] = len(order)
+                names.append(name)
+
+        picks = np.zeros((len(order), BRACKET_COUNT))
+        wins = np.zeros((len(order), BRACKET_COUNT))
+        for hero_id, _, bracket, hero_picks, hero_wins in rows:
+            picks[order[hero_id], bracket - 1] = hero_picks
+            wins[order[hero_id], bracket - 1] = hero_wins
+        return cls(list(order), names, picks, wins)
+
+    def to_rows(self) -> List[Tuple[int, str, int, int, int]]:
+        """Строки (hero_id, name, bracket, picks, wins) для сохранения"""
+        return [
+            (int(self.hero_ids[i]), self.names[i], b + 1, int(self.picks[i, b]), int(self.wins[i, b]))
+            for i in range(len(self.names))
+            for b in range(BRACKET_COUNT)
+        ]
+
+    def __len__(self):
+        return len(self.names)
+
+    def top(self, bracket: int, sort: str = 'wilson', limit: int = 15,
+            min_picks: int = 0) -> List[Dict]:
+        """Топ героев группы по критерию sort"""
+        if sort not in SORT_LABELS:
+            raise ValueError(f"Неизвестный критерий сортировки: {sort}")
+
+        column = bracket - 1
+        key = getattr(self, sort)[:, column]
+        eligible = np.flatnonzero(self.picks[:, column] > min_picks)
+        ranked = eligible[np.argsort(-key[eligible], kind='stable')][:limit]
+
+        return [{
+            'hero_id': int(self.hero_ids[i]),
+            'name': self.names[i],
+            'picks': int(self.picks[i, column]),
+            'winrate': float(self.winrate[i, column] * 100),
+            'wilson': float(self.wilson[i, column] * 100),
+            'pickrate': float(self.pickrate[i, column] * 100),
+            'delta': float(self.delta[i, column] * 100)
+        } for i in ranked]
@@ -0,0 +1,206 @@
+import os
+import time
+import asyncio
+from typing import Dict, Optional, Tuple
+import logging
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from http_client import http_client
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from request_coalescer import RequestCoalescer
+from database import get_db, in_db_thread
+from meta_analytics import MetaTable, SORTS, SORT_LABELS
+
+logger = logging.getLogger(__name__)
+
+HERO_STATS_URL = "https://api.opendota.com/api/heroStats"
+
+# Ранговые группы OpenDota: N_pick / N_win
+BRACKETS = (
+    (1, "Herald"),
+    (2, "Guardian"),
+    (3, "Crusader"),
+    (4, "Archon"),
+    (5, "Legend"),
+    (6, "Ancient"),
+    (7, "Divine"),
+    (8, "Immortal"),
+)
+BRACKET_NAMES = dict(BRACKETS)
+DEFAULT_BRACKET = 8
+DEFAULT_SORT = 'wilson'
+
+META_REFRESH_INTERVAL = int(os.getenv("META_REFRESH_INTERVAL", "1800"))
+# Повтор после неудачного обновления
+META_RETRY_INTERVAL = 300
+META_MIN_PICKS = int(os.getenv("META_MIN_PICKS", "50"))
+META_TOP_SIZE = 15
+# callback_data выбранных кнопок (экран уже показан)
+META_NOOP = "meta_noop"
+
+
+def parse_view(data: str) -> Optional[Tuple[int, str]]:
+    """(bracket, sort) из callback_data вида meta_view_{bracket}_{sort}; None - данные не наши"""
+    parts = data.split("_", 3)
+    if len(parts) != 4 or not parts[2].isdigit():
+        return None
+    bracket, sort = int(parts[2]), parts[3]
+    if bracket not in BRACKET_NAMES or sort not in SORT_LABELS:
+        return None
+    return bracket, sort
+
+
+class MetaSnapshot:
+    """Снимок меты по ранговым группам, обновляемый в фоне.
+
+    heroStats загружается по расписанию с фоновым приоритетом и
+    превращается в MetaTable (матрицы герой × группа), которая хранится
+    в памяти и в SQLite (после перезапуска снимок доступен сразу).
+    Экраны для каждой пары (группа, сортировка) готовятся при
+    обновлении - показ и переключение ничего не считают.
+    """
+
+    def __init__(self, db_path='dota2.db'):
+        self.db = get_db(db_path)
+        self.table: Optional[MetaTable] = None
+        self.updated_at: Optional[int] = None
+        self._screens: Dict[Tuple[int, str], Tuple[str, InlineKeyboardMarkup]] = {}
+        self._refreshes = RequestCoalescer()
+        self._task: Optional[asyncio.Task] = None
+
+    def _apply(self, table: MetaTable, updated_at: int):
+        screens = {
+            (bracket, sort): self._render(table, bracket, sort, updated_at)
+            for bracket, _ in BRACKETS
+            for sort, _ in SORTS
+        }
+        self.table = table
+        self.updated_at = updated_at
+        self._screens = screens
+
+    @staticmethod
+    def _render(table: MetaTable, bracket: int, sort: str, updated_at: int) -> Tuple[str, InlineKeyboardMarkup]:
+        heroes = table.top(bracket, sort, limit=META_TOP_SIZE, min_picks=META_MIN_PICKS)
+        if heroes:
+            lines = [f"⚔️ <b>Текущая мета ({BRACKET_NAMES[bracket]}), {SORT_LABELS[sort]}:</b>\n"]
+            for i, hero in enumerate(heroes, 1):
+                line = (
+                    f"{i}. <b>{hero['name']}</b>\n"
+                    f"   📊 Winrate: <code>{hero['winrate']:.1f}%</code> (не ниже {hero['wilson']:.1f}%)\n"
+                    f"   🎯 Пикрейт: {hero['pickrate']:.1f}% ({hero['picks']} пиков)\n"
+                )
+                if bracket > 1:
+                    line += f"   📈 {hero['delta']:+.1f} п.п. к {BRACKET_NAMES[bracket - 1]}\n"
+                lines.append(line)
+            updated = time.strftime('%d.%m %H:%M', time.localtime(updated_at))
+            lines.append(f"<i>Данные OpenDota, обновлено {updated}</i>")
+            text = "\n".join(lines)
+        else:
+            text = f"📭 Нет данных меты для {BRACKET_NAMES[bracket]}. Попробуйте позже."
+
+        keyboard = InlineKeyboardBuilder()
+        # Выбранные кнопки ведут на текущий экран - им отдельный пустой callback
+        for other_sort, label in SORTS:
+            if other_sort == sort:
+                keyboard.button(text=f"• {label} •", callback_data=META_NOOP)
+            else:
+                keyboard.button(text=label, callback_data=f"meta_view_{bracket}_{other_sort}")
+        for other, name in BRACKETS:
+            if other == bracket:
+                keyboard.button(text=f"• {name} •", callback_data=META_NOOP)
+            else:
+                keyboard.button(text=name, callback_data=f"meta_view_{other}_{sort}")
+        keyboard.adjust(2, 2, 4, 4)
+        return text, keyboard.as_markup()
+
+    # ---------- доступ ----------
+
+    def screen(self, bracket: int = DEFAULT_BRACKET, sort: str = DEFAULT_SORT) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+        """Готовые текст и клавиатура экрана меты (None - снимка еще нет)"""
+        return self._screens.get((bracket, sort))
+
+    async def ensure_loaded(self) -> bool:
+        """Снимок есть в памяти; если нет - загрузить сейчас (с приоритетом пользователя)"""
+        if self._screens:
+            return True
+        return await self.refresh(priority=PRIORITY_INTERACTIVE)
+
+    # ---------- обновление ----------
+
+    async def refresh(self, priority: int = PRIORITY_BACKGROUND) -> bool:
+        """Загрузить heroStats и пересчитать снимок (одновременные вызовы объединяются)"""
+        return await self._refreshes.run('heroStats', lambda: self._refresh(priority))
+
+    async def _refresh(self, priority: int) -> bool:
+        r = await http_client.get_json(HERO_STATS_URL, timeout=30, use_cache=False, priority=priority)
+        if r.status != 200 or not r.data:
+            logger.warning(f"⚠️ Мета: heroStats статус {r.status}")
+            return False
+
+        table = MetaTable.from_hero_stats(r.data)
+        updated_at = int(time.time())
+        self._apply(table, updated_at)
+        await self.save(table, updated_at)
+        logger.info(f"✅ Снимок меты обновлен: {len(table)} героев")
+        return True
+
+    @in_db_thread
+    def save(self, table: MetaTable, updated_at: int):
+        """Сохранить снимок (заменяет предыдущий)"""
+        with self.db.transaction() as c:
+            c.execute("DELETE FROM meta_hero_stats")
+            c.executemany('''
+                INSERT INTO meta_hero_stats (hero_id, name, bracket, picks, wins, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [row + (updated_at,) for row in table.to_rows()])
+
+    @in_db_thread
+    def _load_saved(self):
+        with self.db.transaction() as c:
+            c.execute('''
+                SELECT hero_id, name, bracket, picks, wins, updated_at
+                FROM meta_hero_stats
+                ORDER BY hero_id, bracket
+            ''')
+            return c.fetchall()
+
+    async def load(self) -> bool:
+        """Восстановить сохраненный снимок из базы"""
+        rows = await self._load_saved()
+        if not rows:
+            return False
+
+        table = MetaTable.from_rows([row[:5] for row in rows])
+        self._apply(table, max(row[5] for row in rows))
+        return True
+
+    async def _run(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки снимка меты: {e}")
+
+        while True:
+            delay = META_REFRESH_INTERVAL - (time.time() - self.updated_at) if self.updated_at else 0
+            if delay <= 0:
+                ok = False
+                try:
+                    ok = await self.refresh()
+                except Exception as e:
+                    logger.error(f"Ошибка обновления меты: {e}")
+                delay = META_REFRESH_INTERVAL if ok else META_RETRY_INTERVAL
+            await asyncio.sleep(delay)
+
+    def start(self):
+        """Запустить фоновое обновление (в запущенном event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+# Общий снимок меты
+meta_snapshot = MetaSnapshot()
@@ -0,0 +1,234 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.types import CallbackQuery, InlineQuery, Message, TelegramObject
+
+# Границы корзин гистограмм времени (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """Метрика с метками; значения меняются из любого потока"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, key)} {value:g}"
+                    for key, value in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        if self.function is not None:
+            return [f"{self.name} {self.function():g}"]
+        return super()._samples()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [счетчики корзин..., +Inf], сумма
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Замерить время блока"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                bucket_labels = _labels(self.labelnames, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик процесса и их вывод в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Общий реестр метрик процесса
+registry = MetricsRegistry()
+
+handler_seconds = registry.histogram(
+    'bot_handler_seconds', 'Время работы хендлера', ('handler', 'route'))
+handler_errors = registry.counter(
+    'bot_handler_errors_total', 'Исключения в хендлерах', ('handler', 'route'))
+api_request_seconds = registry.histogram(
+    'bot_api_request_seconds', 'Время HTTP-запроса к внешнему API', ('endpoint',))
+api_responses = registry.counter(
+    'bot_api_responses_total', 'Ответы внешних API по статусу', ('endpoint', 'status'))
+api_cache = registry.counter(
+    'bot_api_cache_total', 'Обращения к кэшу ответов API', ('endpoint', 'result'))
+db_seconds = registry.histogram(
+    'bot_db_seconds', 'Время выполнения функции в потоке базы', ('operation',))
+db_queue_seconds = registry.histogram(
+    'bot_db_queue_seconds', 'Ожидание потока базы', ())
+
+
+def endpoint_name(url: str) -> str:
+    """Адрес без параметров и числовых id: api.opendota.com/api/players/:id/matches"""
+    url = url.split('?', 1)[0].split('://', 1)[-1]
+    return '/'.join(':id' if part.isdigit() else part for part in url.split('/'))
+
+
+def callback_prefix(data: str, known: Iterable[str]) -> str:
+    """Самый длинный известный префикс callback_data: hero_build_12 -> hero_build.
+
+    callback_data присылает клиент, поэтому все, что не совпало
+    с известными префиксами, попадает в одну метку 'other'.
+    """
+    best = ''
+    for prefix in known:
+        if (data == prefix or data.startswith(prefix + '_')) and len(prefix) > len(best):
+            best = prefix
+    return best or 'other'
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время и ошибки хендлеров (inner-middleware: только для найденного хендлера).
+
+    Маршрут - пункт меню, команда или префикс callback_data; произвольный
+    текст пользователя и неизвестные callback_data в метки не попадают.
+    """
+
+    def __init__(self, menu_texts: Iterable[str] = (), commands: Iterable[str] = (),
+                 callback_prefixes: Iterable[str] = ()):
+        self.menu_texts = frozenset(menu_texts)
+        self.commands = frozenset(f"/{command}" for command in commands)
+        self.callback_prefixes = frozenset(callback_prefixes)
+
+    def route(self, event: TelegramObject) -> str:
+        if isinstance(event, Message):
+            text = event.text or ''
+            if text in self.menu_texts:
+                return text
+            if text.startswith('/'):
+                command = text.split()[0].split('@')[0]
+                return command if command in self.commands else 'command'
+            return 'text' if text else (event.content_type or 'message')
+        if isinstance(event, CallbackQuery):
+            return callback_prefix(event.data or '', self.callback_prefixes)
+        if isinstance(event, InlineQuery):
+            return 'inline'
+        return type(event).__name__
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        route = self.route(event)
+        started = time.perf_counter()
+        try:
+            result = await handler(event, data)
+        except SkipHandler:
+            raise
+        except Exception:
+            handler_errors.inc(handler=name, route=route)
+            handler_seconds.observe(time.perf_counter() - started, handler=name, route=route)
+            raise
+        handler_seconds.observe(time.perf_counter() - started, handler=name, route=route)
+        return result
@@ -0,0 +1,386 @@
+import sqlite3
+from typing import List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы хранится в PRAGMA user_version.
+# Каждая миграция: (номер, описание, список SQL). Применяется один раз,
+# атомарно, в порядке номеров. Существующие миграции не менять - только добавлять новые.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Базовая схема", [
+        # Пользователи, друзья, викторина
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            telegram_id INTEGER PRIMARY KEY,
+            steam_id TEXT,
+            account_id INTEGER,
+            username TEXT,
+            score INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS friends (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            friend_account_id INTEGER,
+            friend_name TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_state (
+            user_id INTEGER PRIMARY KEY,
+            current_question INTEGER DEFAULT 0,
+            score INTEGER DEFAULT 0,
+            last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Квесты
+        '''
+        CREATE TABLE IF NOT EXISTS user_quests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            quest_id INTEGER,
+            progress INTEGER DEFAULT 0,
+            completed BOOLEAN DEFAULT 0,
+            claimed BOOLEAN DEFAULT 0,
+            assigned_date DATE,
+            completed_date DATE,
+            FOREIGN KEY (user_id) REFERENCES users(telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quest_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            quest_type TEXT,
+            value INTEGER DEFAULT 0,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Турниры
+        '''
+        CREATE TABLE IF NOT EXISTS tournaments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            max_participants INTEGER DEFAULT 32,
+            current_participants INTEGER DEFAULT 0,
+            prize TEXT,
+            status TEXT DEFAULT 'upcoming',
+            start_date DATE,
+            end_date DATE,
+            created_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS tournament_participants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tournament_id INTEGER,
+            user_id INTEGER,
+            account_id INTEGER,
+            username TEXT,
+            wins INTEGER DEFAULT 0,
+            losses INTEGER DEFAULT 0,
+            points INTEGER DEFAULT 0,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (tournament_id) REFERENCES tournaments(id),
+            FOREIGN KEY (user_id) REFERENCES users(telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS tournament_matches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tournament_id INTEGER,
+            round_number INTEGER,
+            player1_id INTEGER,
+            player2_id INTEGER,
+            winner_id INTEGER,
+            status TEXT DEFAULT 'scheduled',
+            match_data TEXT,
+            scheduled_time TIMESTAMP,
+            played_at TIMESTAMP,
+            FOREIGN KEY (tournament_id) REFERENCES tournaments(id)
+        )
+        ''',
+        # Достижения
+        '''
+        CREATE TABLE IF NOT EXISTS user_achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            achievement_id TEXT,
+            progress INTEGER DEFAULT 0,
+            unlocked BOOLEAN DEFAULT 0,
+            unlocked_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(telegram_id)
+        )
+        ''',
+        # Кланы
+        '''
+        CREATE TABLE IF NOT EXISTS clans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            tag TEXT,
+            description TEXT,
+            owner_id INTEGER,
+            members_count INTEGER DEFAULT 1,
+            total_score INTEGER DEFAULT 0,
+            avg_mmr INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (owner_id) REFERENCES users(telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS clan_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            clan_id INTEGER,
+            user_id INTEGER,
+            account_id INTEGER,
+            role TEXT DEFAULT 'member',
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            contribution INTEGER DEFAULT 0,
+            FOREIGN KEY (clan_id) REFERENCES clans(id),
+            FOREIGN KEY (user_id) REFERENCES users(telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS clan_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            clan_id INTEGER,
+            name TEXT,
+            description TEXT,
+            event_type TEXT,
+            start_time TIMESTAMP,
+            end_time TIMESTAMP,
+            status TEXT DEFAULT 'upcoming',
+            FOREIGN KEY (clan_id) REFERENCES clans(id)
+        )
+        ''',
+        # Сезоны
+        '''
+        CREATE TABLE IF NOT EXISTS seasons (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            number INTEGER,
+            start_date DATE,
+            end_date DATE,
+            status TEXT DEFAULT 'active',
+            rewards TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS season_rankings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            season_id INTEGER,
+            user_id INTEGER,
+            account_id INTEGER,
+            username TEXT,
+            rating INTEGER DEFAULT 1000,
+            games_played INTEGER DEFAULT 0,
+            games_won INTEGER DEFAULT 0,
+            rank TEXT DEFAULT 'Unranked',
+            rewards_claimed BOOLEAN DEFAULT 0,
+            FOREIGN KEY (season_id) REFERENCES seasons(id)
+        )
+        ''',
+        # Ставки
+        '''
+        CREATE TABLE IF NOT EXISTS matches_to_bet (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team1 TEXT NOT NULL,
+            team2 TEXT NOT NULL,
+            odds1 REAL DEFAULT 1.8,
+            odds2 REAL DEFAULT 2.1,
+            start_time TIMESTAMP,
+            status TEXT DEFAULT 'upcoming',
+            winner TEXT,
+            match_data TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_bets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            match_id INTEGER,
+            team TEXT,
+            amount INTEGER,
+            potential_win INTEGER,
+            status TEXT DEFAULT 'pending',
+            placed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            settled_at TIMESTAMP,
+            FOREIGN KEY (match_id) REFERENCES matches_to_bet(id)
+        )
+        ''',
+        # Мини-игры
+        '''
+        CREATE TABLE IF NOT EXISTS tic_tac_toe_games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player1_id INTEGER,
+            player2_id INTEGER,
+            board_state TEXT DEFAULT '000000000',
+            current_turn INTEGER DEFAULT 1,
+            winner_id INTEGER,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        ''',
+        # Локальное хранилище матчей
+        '''
+        CREATE TABLE IF NOT EXISTS player_matches (
+            account_id INTEGER NOT NULL,
+            match_id INTEGER NOT NULL,
+            start_time INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL,
+            PRIMARY KEY (account_id, match_id)
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_player_matches_start_time
+        ON player_matches (account_id, start_time DESC)
+        ''',
+    ]),
+
+    (2, "Индексы горячих запросов и уникальные ограничения", [
+        # Перед уникальными индексами убираем накопившиеся дубликаты
+        '''
+        DELETE FROM friends WHERE id NOT IN (
+            SELECT MAX(id) FROM friends GROUP BY user_id, friend_account_id
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_friends_user_friend
+        ON friends (user_id, friend_account_id)
+        ''',
+        '''
+        DELETE FROM user_quests WHERE id NOT IN (
+            SELECT MAX(id) FROM user_quests GROUP BY user_id, assigned_date, quest_id
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_user_quests_user_date_quest
+        ON user_quests (user_id, assigned_date, quest_id)
+        ''',
+        '''
+        DELETE FROM user_achievements WHERE id NOT IN (
+            SELECT MAX(id) FROM user_achievements GROUP BY user_id, achievement_id
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_user_achievements_user_achievement
+        ON user_achievements (user_id, achievement_id)
+        ''',
+        '''
+        DELETE FROM tournament_participants WHERE id NOT IN (
+            SELECT MIN(id) FROM tournament_participants GROUP BY tournament_id, user_id
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_tournament_participants_tournament_user
+        ON tournament_participants (tournament_id, user_id)
+        ''',
+        '''
+        DELETE FROM clan_members WHERE id NOT IN (
+            SELECT MIN(id) FROM clan_members GROUP BY clan_id, user_id
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_clan_members_clan_user
+        ON clan_members (clan_id, user_id)
+        ''',
+        '''
+        DELETE FROM season_rankings WHERE id NOT IN (
+            SELECT MIN(id) FROM season_rankings GROUP BY user_id, season_id
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_season_rankings_user_season
+        ON season_rankings (user_id, season_id)
+        ''',
+        # Таблица лидеров: покрывающий индекс (telegram_id - это rowid)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_users_score
+        ON users (score DESC, username)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_tournaments_status_start
+        ON tournaments (status, start_date)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_tournament_matches_tournament
+        ON tournament_matches (tournament_id, round_number)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_seasons_status_start
+        ON seasons (status, start_date)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_user_bets_user
+        ON user_bets (user_id, status)
+        ''',
+    ]),
+
+    (3, "Снимок меты: пики и победы героев по ранговым группам", [
+        '''
+        CREATE TABLE IF NOT EXISTS meta_hero_stats (
+            hero_id INTEGER NOT NULL,
+            name TEXT,
+            bracket INTEGER NOT NULL,
+            picks INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER,
+            PRIMARY KEY (hero_id, bracket)
+        )
+        ''',
+    ]),
+
+    (4, "Зерно порядка вопросов викторины", [
+        'ALTER TABLE quiz_state ADD COLUMN seed INTEGER NOT NULL DEFAULT 0',
+    ]),
+
+    (5, "Хранилище FSM-состояний", [
+        '''
+        CREATE TABLE IF NOT EXISTS fsm_state (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT,
+            expires_at INTEGER NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_fsm_state_expires ON fsm_state(expires_at)',
+    ]),
+]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Применить недостающие миграции; возвращает итоговую версию схемы"""
+    version = get_version(conn)
+
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+
+        try:
+            conn.execute("BEGIN")
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.error(f"❌ Миграция {number} ({description}) не применена")
+            raise
+
+        version = number
+        logger.info(f"✅ Миграция {number}: {description}")
+
+    return version
@@ -0,0 +1,106 @@
+import os
+from math import gcd
+from typing import Mapping, Optional, Sequence, Tuple
+import logging
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from game_data import game_data, GameDataRegistry
+
+logger = logging.getLogger(__name__)
+
+# Сколько вопросов в одном прохождении викторины
+QUIZ_ROUND_SIZE = int(os.getenv("QUIZ_ROUND_SIZE", "10"))
+
+
+class QuizBank:
+    """Банк вопросов викторины с готовыми клавиатурами.
+
+    Вопросы грузятся из quiz_questions.json (плюс пул quiz_generator);
+    для каждого вопроса один раз строится клавиатура с callback
+    quiz_answer_{qid}_{i}, общая для всех пользователей. Порядок вопросов у каждого свой, но не хранится:
+    позиция n переводится в номер вопроса аффинной перестановкой
+    (a * n + b) mod N, где a и b выводятся из user_id и зерна.
+    """
+
+    def __init__(self, registry: GameDataRegistry = game_data):
+        self.registry = registry
+        # Сгенерированные вопросы (quiz_generator) идут после вопросов из файла
+        self.generated: Tuple[Mapping, ...] = ()
+        # (тексты, правильные ответы, клавиатуры) - подменяется целиком
+        self._compiled: Tuple[Tuple[str, ...], bytes, Tuple[InlineKeyboardMarkup, ...]] = ((), b'', ())
+
+        self.rebuild()
+        registry.add_reload_listener(self._on_reload)
+
+    def _on_reload(self, name: str):
+        # С большим пулом пересборкой займется генератор (в фоне)
+        if name == 'quiz_questions' and not self.generated:
+            self.rebuild()
+
+    @staticmethod
+    def compile(questions: Sequence[Mapping]):
+        """Собрать тексты, ответы и клавиатуры (можно вызывать из другого потока)"""
+        texts = []
+        correct = bytearray()
+        markups = []
+
+        for question in questions:
+            options = question.get('options', ())
+            answer = question.get('correct')
+            if not question.get('question') or not isinstance(answer, int) or not 0 <= answer < len(options):
+                continue
+
+            qid = len(texts)
+            keyboard = InlineKeyboardBuilder()
+            for i, option in enumerate(options):
+                keyboard.button(text=option, callback_data=f"quiz_answer_{qid}_{i}")
+            keyboard.adjust(2)
+
+            texts.append(question['question'])
+            correct.append(answer)
+            markups.append(keyboard.as_markup())
+
+        return tuple(texts), bytes(correct), tuple(markups)
+
+    def apply(self, compiled, generated: Tuple[Mapping, ...] = ()):
+        """Подменить банк готовым результатом compile()"""
+        self.generated = generated
+        self._compiled = compiled
+        logger.info(f"✅ Викторина: {len(compiled[0])} вопросов ({len(generated)} сгенерировано)")
+
+    def rebuild(self):
+        """Пересобрать банк из файла вопросов и текущего сгенерированного пула"""
+        self.apply(self.compile(self.registry.quiz_questions + self.generated), self.generated)
+
+    def __len__(self):
+        return len(self._compiled[0])
+
+    @property
+    def round_size(self) -> int:
+        """Число вопросов в прохождении"""
+        return min(QUIZ_ROUND_SIZE, len(self))
+
+    def question_id(self, user_id: int, seed: int, position: int) -> Optional[int]:
+        """Номер вопроса на позиции position для пользователя (None - банк пуст)"""
+        size = len(self._compiled[0])
+        if not size:
+            return None
+
+        mix = (user_id * 0x9E3779B1 + seed * 0x85EBCA6B) & 0xFFFFFFFF
+        a = (mix % size) | 1
+        while gcd(a, size) != 1:
+            a += 1
+        b = (mix >> 16) % size
+        return (a * position + b) % size
+
+    def question(self, qid: int) -> Tuple[str, InlineKeyboardMarkup]:
+        """Текст вопроса и готовая клавиатура"""
+        texts, _, markups = self._compiled
+        return texts[qid], markups[qid]
+
+    def is_correct(self, qid: int, answer: int) -> bool:
+        return self._compiled[1][qid] == answer
+
+
+# Общий банк вопросов
+quiz_bank = QuizBank()
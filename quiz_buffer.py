@@ -0,0 +1,178 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+import logging
+from database import get_db, in_db_thread
+from leaderboard import leaderboard
+
+logger = logging.getLogger(__name__)
+
+# Как часто сбрасывать накопленные изменения в базу
+QUIZ_FLUSH_INTERVAL = float(os.getenv("QUIZ_FLUSH_INTERVAL", "2"))
+# Сбросить раньше, если накопилось столько пользователей
+QUIZ_FLUSH_MAX_PENDING = int(os.getenv("QUIZ_FLUSH_MAX_PENDING", "500"))
+
+
+class QuizWriteBuffer:
+    """Write-behind буфер для состояния викторины и очков.
+
+    Ответы только меняют словари в памяти; раз в QUIZ_FLUSH_INTERVAL все
+    накопленное записывается в базу одной транзакцией. Чтение состояния
+    идет через буфер: сначала несохраненные изменения, затем пачка,
+    которая пишется прямо сейчас, и только потом база.
+    """
+
+    def __init__(self, db_path='dota2.db'):
+        self.db = get_db(db_path)
+        # user_id -> (current_question, score, seed)
+        self._states: Dict[int, Tuple[int, int, int]] = {}
+        # user_id -> сколько очков добавить в users.score
+        self._scores: Dict[int, int] = {}
+        # Пачка, которая сейчас записывается
+        self._flushing_states: Dict[int, Tuple[int, int, int]] = {}
+        self._flush_lock = asyncio.Lock()
+        # user_id -> [lock, сколько корутин его держат или ждут]
+        self._user_locks: Dict[int, List] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._early_flush: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.rows_written = 0
+
+    # ---------- блокировка пользователя ----------
+
+    @asynccontextmanager
+    async def user_lock(self, user_id: int):
+        """Последовательная обработка ответов одного пользователя.
+
+        get_state может уйти в базу, поэтому между чтением и set_state
+        проходит await; без блокировки двойное нажатие засчитало бы
+        ответ дважды. Блокировка удаляется, когда ее никто не ждет.
+        """
+        entry = self._user_locks.get(user_id)
+        if entry is None:
+            entry = self._user_locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[user_id]
+
+    # ---------- чтение ----------
+
+    async def get_state(self, user_id: int) -> Tuple:
+        """Состояние викторины: (user_id, current_question, score, last_active, seed)"""
+        state = self._states.get(user_id) or self._flushing_states.get(user_id)
+        if state is not None:
+            return (user_id, state[0], state[1], None, state[2])
+
+        row = await self._load_state(user_id)
+        return row or (user_id, 0, 0, None, 0)
+
+    @in_db_thread
+    def _load_state(self, user_id: int):
+        with self.db.transaction() as c:
+            c.execute(
+                "SELECT user_id, current_question, score, last_active, seed FROM quiz_state WHERE user_id = ?",
+                (user_id,)
+            )
+            return c.fetchone()
+
+    # ---------- запись ----------
+
+    def set_state(self, user_id: int, question_num: int, score: int, seed: int):
+        """Запомнить состояние викторины (запишется при следующем сбросе)"""
+        self._states[user_id] = (question_num, score, seed)
+        self._maybe_flush_early()
+
+    def add_score(self, user_id: int, points: int):
+        """Добавить очки пользователю (запишется при следующем сбросе)"""
+        if points:
+            self._scores[user_id] = self._scores.get(user_id, 0) + points
+            self._maybe_flush_early()
+
+    @property
+    def pending(self) -> int:
+        return len(self._states) + len(self._scores)
+
+    def _maybe_flush_early(self):
+        if self.pending >= QUIZ_FLUSH_MAX_PENDING and (self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Записать все накопленное одной транзакцией"""
+        async with self._flush_lock:
+            if not self._states and not self._scores:
+                return
+
+            states, self._states = self._states, {}
+            scores, self._scores = self._scores, {}
+            self._flushing_states = states
+            try:
+                await self._write(states, scores)
+            except Exception as e:
+                logger.error(f"Ошибка записи буфера викторины: {e}")
+                # Возвращаем изменения в буфер, более новые состояния не затираем
+                for user_id, state in states.items():
+                    self._states.setdefault(user_id, state)
+                for user_id, points in scores.items():
+                    self._scores[user_id] = self._scores.get(user_id, 0) + points
+                raise
+            finally:
+                self._flushing_states = {}
+
+            self.flushes += 1
+            self.rows_written += len(states) + len(scores)
+
+    @in_db_thread
+    def _write(self, states: Dict[int, Tuple[int, int, int]], scores: Dict[int, int]):
+        with self.db.transaction() as c:
+            c.executemany('''
+                INSERT INTO quiz_state (user_id, current_question, score, seed, last_active)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    current_question = excluded.current_question,
+                    score = excluded.score,
+                    seed = excluded.seed,
+                    last_active = excluded.last_active
+            ''', [(user_id, *state) for user_id, state in states.items()])
+
+            c.executemany(
+                "UPDATE users SET score = score + ? WHERE telegram_id = ?",
+                [(points, user_id) for user_id, points in scores.items()]
+            )
+            for user_id in scores:
+                leaderboard.track(self.db, c, user_id)
+
+    # ---------- фоновый сброс ----------
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(QUIZ_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception:
+                pass  # уже залогировано, изменения остались в буфере
+
+    def start(self):
+        """Запустить периодический сброс (в запущенном event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Остановить сброс и записать остаток (при остановке бота)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.error(f"❌ Не записано при остановке: {self.pending} изменений викторины")
+
+
+# Общий буфер викторины
+quiz_buffer = QuizWriteBuffer()
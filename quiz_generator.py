@@ -0,0 +1,182 @@
+import os
+import random
+import asyncio
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+from game_data import game_data, GameDataRegistry
+from quiz_bank import quiz_bank, QuizBank
+
+logger = logging.getLogger(__name__)
+
+# Сколько вопросов генерировать
+QUIZ_POOL_SIZE = int(os.getenv("QUIZ_POOL_SIZE", "1000"))
+# Наборы данных, из которых строятся вопросы
+SOURCES = ('hero_names', 'item_ids', 'hero_builds', 'hero_counters', 'quiz_questions')
+
+OPTIONS_COUNT = 4
+
+
+def _pick_others(rng: random.Random, population: Sequence[str], exclude, count: int) -> Optional[List[str]]:
+    """count случайных значений из population, не входящих в exclude"""
+    picked: List[str] = []
+    for _ in range(count * 10):
+        if len(picked) == count:
+            break
+        value = rng.choice(population)
+        if value not in exclude and value not in picked:
+            picked.append(value)
+    return picked if len(picked) == count else None
+
+
+def _question(rng: random.Random, text: str, answer: str, others: Optional[List[str]]) -> Optional[Dict]:
+    if not others:
+        return None
+    options = others + [answer]
+    rng.shuffle(options)
+    return {"question": text, "options": options, "correct": options.index(answer)}
+
+
+class QuizGenerator:
+    """Генератор вопросов викторины из справочников игры.
+
+    Пул строится в отдельном потоке (вместе с клавиатурами банка) и
+    подменяет сгенерированную часть quiz_bank целиком, поэтому выдача
+    вопроса остается поиском по индексу. Зерно выводится из версии
+    справочников: пока данные не изменились, пул одинаков после каждой
+    пересборки и во всех процессах, и вопрос на позиции прохождения
+    не меняется.
+    """
+
+    def __init__(self, registry: GameDataRegistry = game_data, bank: QuizBank = quiz_bank):
+        self.registry = registry
+        self.bank = bank
+        self._task: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+        # Версия справочников, из которой построен текущий пул
+        self.version: Optional[int] = None
+        registry.add_reload_listener(self._on_reload)
+
+    def _on_reload(self, name: str):
+        if name in SOURCES and self._changed is not None:
+            self._changed.set()
+
+    # ---------- виды вопросов ----------
+
+    def _item_by_id(self, rng: random.Random, items: Sequence[Tuple[str, str]],
+                    item_names: Sequence[str]) -> Optional[Dict]:
+        item_id, name = rng.choice(items)
+        others = _pick_others(rng, item_names, {name}, OPTIONS_COUNT - 1)
+        return _question(rng, f"Какой предмет имеет ID {item_id}?", name, others)
+
+    def _hero_by_id(self, rng: random.Random, heroes: Sequence[Tuple[int, str]],
+                    hero_names: Sequence[str]) -> Optional[Dict]:
+        hero_id, name = rng.choice(heroes)
+        others = _pick_others(rng, hero_names, {name}, OPTIONS_COUNT - 1)
+        return _question(rng, f"Какой герой имеет ID {hero_id}?", name, others)
+
+    def _hero_counter(self, rng: random.Random, counters_by_hero: Sequence,
+                      hero_names: Sequence[str]) -> Optional[Dict]:
+        hero, data = rng.choice(counters_by_hero)
+        counters = data.get('weak_against', ())
+        if not counters:
+            return None
+        answer = rng.choice(counters)
+        others = _pick_others(rng, hero_names, set(counters) | {hero}, OPTIONS_COUNT - 1)
+        return _question(rng, f"Какой герой хорошо играет против {hero}?", answer, others)
+
+    def _build_item(self, rng: random.Random, builds_by_hero: Sequence,
+                    item_names: Sequence[str]) -> Optional[Dict]:
+        hero = rng.choice(builds_by_hero)
+        builds = hero.get('builds', {})
+        if not builds:
+            return None
+        role = rng.choice(list(builds))
+        build_items = builds[role].get('items', ())
+        if not build_items:
+            return None
+        answer = rng.choice(build_items)
+        others = _pick_others(rng, item_names, set(build_items), OPTIONS_COUNT - 1)
+        return _question(rng, f"Какой предмет входит в сборку {hero.get('name')} ({role})?", answer, others)
+
+    # ---------- пул ----------
+
+    def generate(self, size: int = QUIZ_POOL_SIZE, seed: Optional[int] = None) -> List[Dict]:
+        """Сгенерировать до size разных вопросов (синхронно)"""
+        rng = random.Random(seed)
+        heroes = self.registry.hero_list
+        hero_names = [name for _, name in heroes]
+        # Рецепты не показываем: их названия выдают ответ
+        items = [(item_id, name) for item_id, name in self.registry.item_ids.items()
+                 if 'Recipe' not in name]
+        item_names = [name for _, name in items]
+        counters_by_hero = list(self.registry.hero_counters.items())
+        builds_by_hero = list(self.registry.hero_builds.values())
+
+        kinds: List[Callable] = []
+        if len(items) >= OPTIONS_COUNT:
+            kinds.append(lambda: self._item_by_id(rng, items, item_names))
+            if builds_by_hero:
+                kinds.append(lambda: self._build_item(rng, builds_by_hero, item_names))
+        if len(heroes) >= OPTIONS_COUNT:
+            kinds.append(lambda: self._hero_by_id(rng, heroes, hero_names))
+            if counters_by_hero:
+                kinds.append(lambda: self._hero_counter(rng, counters_by_hero, hero_names))
+        if not kinds:
+            return []
+
+        questions: List[Dict] = []
+        seen = set()
+        for _ in range(size * 3):
+            if len(questions) >= size:
+                break
+            question = rng.choice(kinds)()
+            if question is None:
+                continue
+            key = (question['question'], question['options'][question['correct']])
+            if key in seen:
+                continue
+            seen.add(key)
+            questions.append(question)
+        return questions
+
+    def _build(self, version: int):
+        generated = tuple(self.generate(seed=version))
+        compiled = self.bank.compile(self.registry.quiz_questions + generated)
+        return compiled, generated
+
+    async def refresh(self):
+        """Пересобрать пул в отдельном потоке и подменить его в банке.
+
+        Если справочники не изменились с прошлой сборки, пул остается прежним.
+        """
+        version = self.registry.version(SOURCES)
+        if version == self.version:
+            return
+        compiled, generated = await asyncio.to_thread(self._build, version)
+        self.bank.apply(compiled, generated)
+        self.version = version
+
+    async def _run(self):
+        while True:
+            self._changed.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка генерации вопросов викторины: {e}")
+            await self._changed.wait()
+
+    def start(self):
+        """Запустить фоновую генерацию (в запущенном event loop)"""
+        if self._task is None:
+            self._changed = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._changed = None
+
+
+# Общий генератор вопросов
+quiz_generator = QuizGenerator()
@@ -0,0 +1,204 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from typing import Dict, Optional
+import logging
+from sharding import BOT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты очереди: меньше - раньше
+PRIORITY_INTERACTIVE = 0   # пользователь ждет ответа (профиль, статистика)
+PRIORITY_BACKGROUND = 10   # фоновые обновления
+
+# Бюджет бесплатного тарифа OpenDota
+OPENDOTA_RATE_PER_MINUTE = int(os.getenv("OPENDOTA_RATE_PER_MINUTE", "60"))
+OPENDOTA_RATE_PER_DAY = int(os.getenv("OPENDOTA_RATE_PER_DAY", "2000"))
+OPENDOTA_MAX_RETRIES = int(os.getenv("OPENDOTA_MAX_RETRIES", "2"))
+OPENDOTA_MAX_WAIT = float(os.getenv("OPENDOTA_MAX_WAIT", "20"))
+
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class RateLimitExceeded(Exception):
+    """Бюджет запросов исчерпан или ожидание дольше допустимого"""
+
+
+class RateLimiter:
+    """Token bucket с минутным и суточным бюджетом и очередью по приоритету.
+
+    Минутный бюджет пополняется равномерно, суточный сбрасывается в полночь
+    UTC. После 429 хост блокируется на Retry-After или на время backoff.
+    """
+
+    def __init__(self, name: str, per_minute: int, per_day: int,
+                 max_retries: int = OPENDOTA_MAX_RETRIES, max_wait: float = OPENDOTA_MAX_WAIT):
+        self.name = name
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+
+        self._tokens = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._last_refill = time.monotonic()
+        self._day = self._current_day()
+        self._day_used = 0
+        self._blocked_until = 0.0
+
+        self._queue = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # Статистика для подбора бюджета
+        self.granted = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    @staticmethod
+    def _current_day() -> int:
+        return int(time.time() // 86400)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.per_minute), self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+        day = self._current_day()
+        if day != self._day:
+            self._day = day
+            self._day_used = 0
+
+    def _estimated_wait(self, priority: int) -> float:
+        """Грубая оценка ожидания для нового запроса с данным приоритетом"""
+        ahead = sum(1 for p, _, fut in self._queue if p <= priority and not fut.done())
+        missing = max(0.0, ahead + 1 - self._tokens)
+        blocked = max(0.0, self._blocked_until - time.monotonic())
+        return blocked + missing / self._rate if self._rate > 0 else float('inf')
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        """Дождаться разрешения на запрос.
+
+        Бросает RateLimitExceeded, если суточный бюджет исчерпан или
+        ожидание заведомо превысит max_wait.
+        """
+        self._refill()
+        if self._day_used >= self.per_day:
+            self.rejected += 1
+            raise self._day_exhausted()
+
+        if self._estimated_wait(priority) > self.max_wait:
+            self.rejected += 1
+            raise RateLimitExceeded(f"{self.name}: очередь слишком длинная")
+
+        started = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), fut))
+        self._dispatch()
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                # Токен уже выдан, но запрос не состоится - возвращаем его
+                self._tokens = min(float(self.per_minute), self._tokens + 1)
+                self._day_used = max(0, self._day_used - 1)
+            raise
+
+        waited = time.monotonic() - started
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+
+    def _dispatch(self):
+        """Выдать токены ожидающим по приоритету и запланировать следующий проход"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        self._refill()
+        now = time.monotonic()
+
+        while (self._queue and now >= self._blocked_until and self._tokens >= 1
+               and self._day_used < self.per_day):
+            _, _, fut = heapq.heappop(self._queue)
+            if fut.done():
+                continue
+            self._tokens -= 1
+            self._day_used += 1
+            fut.set_result(None)
+
+        if self._day_used >= self.per_day:
+            # Суточный бюджет кончился, пока запросы стояли в очереди
+            while self._queue:
+                _, _, fut = heapq.heappop(self._queue)
+                if not fut.done():
+                    self.rejected += 1
+                    fut.set_exception(self._day_exhausted())
+
+        # Убираем отмененных ожидающих с вершины очереди
+        while self._queue and self._queue[0][2].done():
+            heapq.heappop(self._queue)
+
+        if self._queue:
+            delay = max(self._blocked_until - now, (1 - self._tokens) / self._rate, 0.01)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _day_exhausted(self) -> RateLimitExceeded:
+        return RateLimitExceeded(f"{self.name}: суточный лимит {self.per_day} исчерпан")
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Задержка перед повтором: Retry-After, иначе экспоненциальный backoff с jitter"""
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, 1)
+            except ValueError:
+                pass
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)) + BACKOFF_BASE
+
+    def on_rate_limited(self, delay: float):
+        """Сервер вернул 429: блокируем выдачу токенов на delay секунд"""
+        self.rate_limited += 1
+        self._tokens = 0.0
+        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        logger.warning(f"⚠️ {self.name}: 429, пауза {delay:.1f} c")
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, fut in self._queue if not fut.done())
+
+    def stats(self) -> Dict:
+        """Глубина очереди, ожидание и расход бюджета"""
+        self._refill()
+        return {
+            'queue_depth': self.queue_depth,
+            'granted': self.granted,
+            'rejected': self.rejected,
+            'rate_limited': self.rate_limited,
+            'avg_wait': (self.total_wait / self.granted) if self.granted else 0,
+            'max_wait': self.max_wait_seen,
+            'tokens': self._tokens,
+            'day_used': self._day_used,
+            'day_budget': self.per_day,
+            'blocked_for': max(0.0, self._blocked_until - time.monotonic())
+        }
+
+
+def budget_share(total: int, shares: int) -> int:
+    """Доля бюджета одного из shares процессов (не меньше 1)"""
+    return max(1, total // max(1, shares))
+
+
+# Лимитеры по хосту. Лимитер живет в памяти процесса, поэтому при
+# BOT_WORKERS > 1 каждый обработчик получает свою долю бюджета OpenDota
+opendota_limiter = RateLimiter(
+    'api.opendota.com',
+    budget_share(OPENDOTA_RATE_PER_MINUTE, BOT_WORKERS),
+    budget_share(OPENDOTA_RATE_PER_DAY, BOT_WORKERS)
+)
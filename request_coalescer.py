@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+    """Single-flight: одновременные одинаковые запросы разделяют один вызов.
+
+    Первый вызывающий запускает загрузку отдельной задачей, остальные
+    ждут тот же результат. Отмена одного из ожидающих (например, по
+    таймауту хендлера) не прерывает загрузку для остальных.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable]):
+        """Выполнить factory() или присоединиться к уже идущему вызову с тем же ключом"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            self.started += 1
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Забираем исключение, чтобы не было предупреждения, если все ожидающие отменены
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict:
+        """Счетчики запущенных и объединенных запросов"""
+        return {
+            'started': self.started,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight)
+        }
@@ -0,0 +1,124 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# TTL (в секундах) для каждого эндпоинта OpenDota /players/{account_id}[/...]
+# Профиль почти не меняется, матчи и W/L меняются после каждой игры.
+ENDPOINT_TTLS = {
+    'players': int(os.getenv("CACHE_TTL_PROFILE", "3600")),
+    'players/wl': int(os.getenv("CACHE_TTL_WINLOSS", "180")),
+    'players/matches': int(os.getenv("CACHE_TTL_MATCHES", "120")),
+    'players/heroes': int(os.getenv("CACHE_TTL_HEROES", "600")),
+}
+
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Примерные накладные расходы на запись поверх размера тела ответа
+ENTRY_OVERHEAD = 512
+
+PLAYER_URL_RE = re.compile(r'^https://api\.opendota\.com/api/players/(\d+)(?:/(\w+))?/?$')
+
+
+class ResponseCache:
+    """LRU кэш ответов OpenDota с TTL по эндпоинту и лимитом по памяти.
+
+    Ключ: (эндпоинт, account_id, параметры запроса). Закэшированные данные
+    общие для всех вызывающих, поэтому их нельзя изменять на месте.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, ttls: Dict[str, int] = None):
+        self.max_bytes = max_bytes
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self._entries: "OrderedDict[Tuple, Tuple[float, object, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key_for(self, url: str, params: Optional[Dict] = None) -> Optional[Tuple]:
+        """Ключ кэша для URL или None, если эндпоинт не кэшируется"""
+        match = PLAYER_URL_RE.match(url)
+        if not match:
+            return None
+
+        account_id, suffix = match.groups()
+        endpoint = f"players/{suffix}" if suffix else "players"
+        if self.ttls.get(endpoint, 0) <= 0:
+            return None
+
+        params_key = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return (endpoint, int(account_id), params_key)
+
+    def get(self, key: Tuple):
+        """Вернуть значение из кэша или None (с учетом TTL)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value, size = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Tuple, value, size: int = 0):
+        """Сохранить значение; вытесняет самые старые записи при превышении лимита"""
+        ttl = self.ttls.get(key[0], 0)
+        entry_size = size + ENTRY_OVERHEAD
+        if ttl <= 0 or entry_size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + ttl, value, entry_size)
+        self._bytes += entry_size
+
+        while self._bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, account_id: int = None):
+        """Удалить записи игрока (или весь кэш, если account_id не указан)"""
+        if account_id is None:
+            self._entries.clear()
+            self._bytes = 0
+            return
+
+        for key in [k for k in self._entries if k[1] == account_id]:
+            self._remove(key)
+
+    def _remove(self, key: Tuple):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict:
+        """Счетчики попаданий/промахов и занятая память"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total * 100) if total > 0 else 0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes
+        }
+
+
+# Единственный экземпляр на процесс
+response_cache = ResponseCache()
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Число процессов-обработчиков (1 - обычный режим в одном процессе)
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+# Пауза перед повтором getUpdates после ошибки (удваивается до максимума)
+POLL_RETRY_DELAY = 1
+POLL_RETRY_MAX_DELAY = 30
+# Максимальный размер одного обновления в канале к обработчику
+UPDATE_LINE_LIMIT = 16 * 1024 * 1024
+# Пауза перед перезапуском упавшего обработчика (защита от цикла падений)
+WORKER_RESTART_DELAY = 1
+
+
+def shard_key(update: Update) -> int:
+    """Ключ шардирования: чат события, иначе его автор"""
+    event = update.event
+    chat = getattr(event, 'chat', None)
+    if chat is None and getattr(event, 'message', None) is not None:
+        chat = getattr(event.message, 'chat', None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, 'from_user', None)
+    return user.id if user is not None else update.update_id
+
+
+class ChatSequencer:
+    """Цепочки задач по чатам: обновления одного чата обрабатываются строго
+    по порядку, разные чаты - параллельно."""
+
+    def __init__(self):
+        self._tails: Dict[int, asyncio.Task] = {}
+
+    def submit(self, key: int, factory: Callable[[], Awaitable]) -> asyncio.Task:
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._run_after(previous, factory))
+        self._tails[key] = task
+        task.add_done_callback(lambda t, k=key: self._done(k, t))
+        return task
+
+    @staticmethod
+    async def _run_after(previous: Optional[asyncio.Task], factory: Callable[[], Awaitable]):
+        if previous is not None:
+            # Ошибка предыдущего обновления не должна блокировать чат
+            await asyncio.wait([previous])
+        await factory()
+
+    def _done(self, key: int, task: asyncio.Task):
+        if self._tails.get(key) is task:
+            del self._tails[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка обработки обновления: {task.exception()}")
+
+    def __len__(self):
+        return len(self._tails)
+
+    async def drain(self):
+        """Дождаться всех начатых цепочек"""
+        while self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+class ShardRouter:
+    """Входной процесс: раздает обновления N процессам-обработчикам.
+
+    Обработчик - это `python main.py --worker i`; обновления передаются
+    в его stdin построчно в формате Bot API (JSON). Все обновления одного
+    чата попадают в один процесс, поэтому порядок внутри чата сохраняется.
+    За каждым обработчиком следит задача: упавший перезапускается сразу,
+    а не при следующем обновлении его шарда.
+    """
+
+    def __init__(self, workers: int, script: str):
+        self.workers = workers
+        self.script = script
+        self._processes: List[Optional[asyncio.subprocess.Process]] = [None] * workers
+        self._watchers: List[Optional[asyncio.Task]] = [None] * workers
+        self._locks = [asyncio.Lock() for _ in range(workers)]
+        self._stopping = False
+        self.forwarded = [0] * workers
+        self.restarts = 0
+
+    async def _spawn(self, index: int) -> asyncio.subprocess.Process:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, self.script, '--worker', str(index),
+            stdin=asyncio.subprocess.PIPE
+        )
+        self._processes[index] = process
+        self._watchers[index] = asyncio.create_task(self._watch(index, process))
+        logger.info(f"✅ Обработчик {index} запущен (pid {process.pid})")
+        return process
+
+    async def start(self):
+        for index in range(self.workers):
+            await self._spawn(index)
+
+    async def _watch(self, index: int, process: asyncio.subprocess.Process):
+        """Перезапустить обработчик, как только он завершится"""
+        code = await process.wait()
+        if self._stopping or self._processes[index] is not process:
+            return
+        logger.error(f"❌ Обработчик {index} завершился (код {code}), обновления в его канале потеряны; перезапуск")
+        await asyncio.sleep(WORKER_RESTART_DELAY)
+        async with self._locks[index]:
+            # За время паузы его мог перезапустить feed()
+            if not self._stopping and self._processes[index] is process:
+                self.restarts += 1
+                await self._spawn(index)
+
+    async def _restart(self, index: int, process: asyncio.subprocess.Process) -> asyncio.subprocess.Process:
+        """Заменить обработчик с оборванным каналом (вызывается под блокировкой шарда)"""
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        self.restarts += 1
+        return await self._spawn(index)
+
+    async def _process(self, index: int) -> asyncio.subprocess.Process:
+        process = self._processes[index]
+        if process is None:
+            return await self._spawn(index)
+        if process.returncode is not None:
+            logger.error(f"❌ Обработчик {index} завершился (код {process.returncode}), перезапуск")
+            return await self._restart(index, process)
+        return process
+
+    async def feed(self, update: Dict, key: int):
+        """Передать обновление (dict в формате Bot API) в шард по ключу.
+
+        Если канал оборван, обработчик перезапускается и обновление
+        отправляется еще раз.
+        """
+        index = key % self.workers
+        line = json.dumps(update, ensure_ascii=False, separators=(',', ':')).encode() + b'\n'
+        async with self._locks[index]:
+            process = await self._process(index)
+            if not await self._send(process, line):
+                logger.warning(f"⚠️ Канал к обработчику {index} оборван, перезапуск")
+                process = await self._restart(index, process)
+                if not await self._send(process, line):
+                    logger.error(f"❌ Обновление {update.get('update_id')} не передано обработчику {index}")
+                    return
+        self.forwarded[index] += 1
+
+    @staticmethod
+    async def _send(process: asyncio.subprocess.Process, line: bytes) -> bool:
+        try:
+            process.stdin.write(line)
+            await process.stdin.drain()
+            return True
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+
+    async def feed_update(self, update: Update):
+        await self.feed(update.model_dump(mode='json', exclude_unset=True, by_alias=True), shard_key(update))
+
+    async def poll(self, bot: Bot, allowed_updates: List[str]):
+        """Получать обновления long polling'ом и раздавать их обработчикам"""
+        offset = None
+        delay = POLL_RETRY_DELAY
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+            except Exception as e:
+                logger.error(f"Ошибка getUpdates: {e}, повтор через {delay} с")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, POLL_RETRY_MAX_DELAY)
+                continue
+
+            delay = POLL_RETRY_DELAY
+            for update in updates:
+                await self.feed_update(update)
+                offset = update.update_id + 1
+
+    async def alive(self) -> bool:
+        """Все обработчики работают (для /ready)"""
+        return all(p is not None and p.returncode is None for p in self._processes)
+
+    async def stop(self, timeout: float = 30):
+        """Закрыть каналы и дождаться, пока обработчики доделают начатое"""
+        self._stopping = True
+        for process in self._processes:
+            if process is not None and process.returncode is None:
+                process.stdin.close()
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Обработчик {index} не завершился за {timeout} с")
+                process.kill()
+        for watcher in self._watchers:
+            if watcher is not None:
+                watcher.cancel()
+
+
+async def run_worker(index: int, bot: Bot, dp: Dispatcher):
+    """Процесс-обработчик: читать обновления из stdin до EOF"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=UPDATE_LINE_LIMIT)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    sequencer = ChatSequencer()
+    workflow_data = {'dispatcher': dp, 'bots': [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow_data)
+    logger.info(f"✅ Обработчик {index} готов")
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                update = Update.model_validate_json(line, context={'bot': bot})
+            except ValueError as e:
+                logger.error(f"❌ Некорректное обновление: {e}")
+                continue
+            sequencer.submit(shard_key(update), lambda u=update: dp.feed_update(bot, u))
+        await sequencer.drain()
+    finally:
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+        await bot.session.close()
@@ -0,0 +1,43 @@
+import os
+import sys
+import asyncio
+import tempfile
+import pytest
+
+# Модули бота лежат в корне репозитория
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# Справочники читаются из репозитория, а общие экземпляры модулей
+# (quiz_buffer, match_store и т.п.) открывают dota2.db во временном каталоге
+os.environ.setdefault("GAME_DATA_DIR", REPO_DIR)
+os.chdir(tempfile.mkdtemp(prefix="dota_bot_tests_"))
+
+
+class FakeClock:
+    """Подмена модуля time: monotonic()/time() двигаются только вручную"""
+
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def run():
+    """Выполнить корутину в новом event loop (без pytest-asyncio)"""
+    return asyncio.run
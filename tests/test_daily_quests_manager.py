@@ -0,0 +1,16 @@
+from daily_quests_manager import DailyQuestsManager
+
+
+def test_same_day_regeneration_keeps_progress(tmp_path, run):
+    manager = DailyQuestsManager(str(tmp_path / 'quests.db'))
+    quests = run(manager.generate_daily_quests(1))
+    quest_ids = [q['id'] for q in quests]
+    with manager.db.transaction() as c:
+        c.execute("UPDATE user_quests SET progress = 2, completed = 1 WHERE user_id = 1")
+
+    run(manager.generate_daily_quests(1))
+    with manager.db.transaction() as c:
+        c.execute("SELECT quest_id, progress, completed FROM user_quests WHERE user_id = 1 AND quest_id IN (%s)"
+                  % ','.join('?' * len(quest_ids)), quest_ids)
+        rows = c.fetchall()
+    assert sorted(rows) == sorted((quest_id, 2, 1) for quest_id in quest_ids)
@@ -0,0 +1,88 @@
+import pytest
+import fsm_storage as module
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from database import Database
+from fsm_storage import SQLiteStorage, create_storage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+OTHER = StorageKey(bot_id=1, chat_id=20, user_id=20)
+
+
+class Form(StatesGroup):
+    waiting = State()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(Database(str(tmp_path / 'fsm.db')), ttl=60)
+
+
+def rows(storage):
+    with storage.db.transaction() as c:
+        c.execute("SELECT key, state, data FROM fsm_state")
+        return c.fetchall()
+
+
+def test_state_and_data_round_trip(storage, run):
+    async def main():
+        await storage.set_state(KEY, Form.waiting)
+        await storage.set_data(KEY, {'steam_id': '123', 'имя': 'Тест'})
+        assert await storage.get_state(KEY) == 'Form:waiting'
+        assert await storage.get_data(KEY) == {'steam_id': '123', 'имя': 'Тест'}
+        assert await storage.get_state(OTHER) is None
+        assert await storage.get_data(OTHER) == {}
+
+    run(main())
+    assert len(rows(storage)) == 1
+
+
+def test_empty_record_is_deleted(storage, run):
+    async def main():
+        await storage.set_state(KEY, Form.waiting)
+        await storage.set_data(KEY, {'a': 1})
+        await storage.set_state(KEY, None)
+        assert rows(storage) != []
+        await storage.set_data(KEY, {})
+
+    run(main())
+    assert rows(storage) == []
+
+
+def test_expired_records_are_ignored_and_purged(storage, run, monkeypatch, clock):
+    monkeypatch.setattr(module, 'time', clock)
+
+    async def main():
+        await storage.set_state(KEY, Form.waiting)
+        clock.advance(61)
+        assert await storage.get_state(KEY) is None
+        # Следующая запись после FSM_PURGE_INTERVAL удаляет просроченные
+        clock.advance(module.FSM_PURGE_INTERVAL)
+        await storage.set_state(OTHER, Form.waiting)
+
+    run(main())
+    assert [key for key, _, _ in rows(storage)] == [storage.key_builder.build(OTHER)]
+
+
+def test_write_extends_ttl(storage, run, monkeypatch, clock):
+    monkeypatch.setattr(module, 'time', clock)
+
+    async def main():
+        await storage.set_state(KEY, Form.waiting)
+        clock.advance(50)
+        await storage.set_data(KEY, {'a': 1})
+        clock.advance(50)
+        assert await storage.get_state(KEY) == 'Form:waiting'
+
+    run(main())
+
+
+def test_create_storage_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        create_storage('mongo')
+
+
+def test_redis_requires_url(monkeypatch):
+    monkeypatch.setattr(module, 'REDIS_URL', None)
+    with pytest.raises(ValueError):
+        create_storage('redis')
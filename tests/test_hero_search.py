@@ -0,0 +1,77 @@
+import pytest
+from hero_search import HeroSearchIndex, edit_distance, normalize
+
+
+class StubRegistry:
+    def __init__(self):
+        self.hero_list = ((74, 'Invoker'), (5, 'Crystal Maiden'), (11, 'Shadow Fiend'),
+                          (91, 'Io'), (106, 'Ember Spirit'))
+        self.hero_aliases = {'5': ('цм', 'Кристал Мейден'), '11': ('sf', 'Невермор')}
+        self.listeners = []
+
+    def hero_name(self, hero_id):
+        return dict(self.hero_list)[hero_id]
+
+    def add_reload_listener(self, listener):
+        self.listeners.append(listener)
+
+
+@pytest.fixture
+def index():
+    return HeroSearchIndex(StubRegistry())
+
+
+def ids(results):
+    return [hero_id for hero_id, _ in results]
+
+
+def test_normalize():
+    assert normalize("  Ёжик-в  Тумане! ") == "ежик в тумане"
+
+
+def test_edit_distance_counts_transposition_as_one():
+    assert edit_distance("invoekr", "invoker", 2) == 1
+    assert edit_distance("abc", "abcdef", 1) == 2  # отсечка: limit + 1
+
+
+def test_exact_match_ranks_first(index):
+    assert ids(index.search("io"))[0] == 91
+
+
+def test_prefix_and_alias(index):
+    assert ids(index.search("inv")) == [74]
+    assert ids(index.search("цм")) == [5]
+    assert ids(index.search("SF")) == [11]
+    assert ids(index.search("невер")) == [11]
+
+
+def test_words_and_joined_spelling(index):
+    assert ids(index.search("maiden")) == [5]
+    assert ids(index.search("crystalmaiden")) == [5]
+    assert ids(index.search("crystal-maiden")) == [5]
+
+
+def test_substring(index):
+    assert 106 in ids(index.search("spiri"))
+
+
+def test_typos(index):
+    assert ids(index.search("invokre"))[0] == 74
+    assert ids(index.search("imvok"))[0] == 74
+    assert ids(index.search("shadw fiend"))[0] == 11
+
+
+def test_empty_and_unknown_queries(index):
+    assert index.search("   ") == []
+    assert index.search("zzzzzz") == []
+
+
+def test_limit(index):
+    assert len(index.search("e", limit=2)) <= 2
+
+
+def test_reload_rebuilds_index(index):
+    registry = index.registry
+    registry.hero_list += ((999, 'Muerta'),)
+    registry.listeners[0]('hero_names')
+    assert ids(index.search("muer")) == [999]
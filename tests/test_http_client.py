@@ -0,0 +1,31 @@
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from http_client import HttpClient
+from rate_limiter import RateLimiter
+
+
+def test_headers_are_case_insensitive(run):
+    async def rate_limited(request):
+        return web.json_response({'error': 'rate limit'}, status=429, headers={'retry-after': '7', 'x-rate-limit-remaining-minute': '0'})
+
+    app = web.Application()
+    app.router.add_get('/api/players', rate_limited)
+    limiter = RateLimiter('test', per_minute=60, per_day=100, max_retries=0)
+    delays = []
+    limiter.on_rate_limited = delays.append
+
+    async def main():
+        async with TestServer(app) as server:
+            client = HttpClient(limiters={server.host: limiter})
+            try:
+                response = await client.get_json(str(server.make_url('/api/players')), use_cache=False)
+            finally:
+                await client.close()
+        assert response.status == 429
+        assert response.headers.get('Retry-After') == '7'
+        # Нестандартные заголовки aiohttp не нормализует - регистр как у сервера
+        assert response.headers.get('X-Rate-Limit-Remaining-Minute') == '0'
+
+    run(main())
+    # Задержка взята из заголовка, а не из экспоненциального backoff
+    assert len(delays) == 1 and 7 <= delays[0] <= 8
@@ -0,0 +1,58 @@
+import pytest
+from database import Database
+from leaderboard import Leaderboard
+
+
+@pytest.fixture
+def board():
+    board = Leaderboard()
+    for user_id, score in [(1, 50), (2, 80), (3, 50), (4, 10), (5, 100)]:
+        board.set_score(user_id, score, f"user{user_id}")
+    return board
+
+
+def test_top_is_sorted_by_score_then_id(board):
+    assert [user_id for user_id, _, _ in board.top(10)] == [5, 2, 1, 3, 4]
+    assert board.top(2) == [(5, 'user5', 100), (2, 'user2', 80)]
+
+
+def test_rank(board):
+    assert [board.rank(user_id) for user_id in (5, 2, 1, 3, 4)] == [1, 2, 3, 4, 5]
+    assert board.rank(99) is None
+
+
+def test_score_change_moves_player(board):
+    board.set_score(4, 90)
+    assert board.rank(4) == 2
+    assert board.rank(2) == 3
+    assert len(board) == 5
+    assert board.top(2)[1] == (4, 'user4', 90)
+
+
+def test_around_is_clamped_at_edges(board):
+    assert board.around(5, radius=1) == [(1, 5, 'user5', 100), (2, 2, 'user2', 80)]
+    assert [row[1] for row in board.around(1, radius=1)] == [2, 1, 3]
+    assert [row[0] for row in board.around(4, radius=2)] == [3, 4, 5]
+    assert board.around(99) == []
+
+
+def test_track_applies_score_after_commit(tmp_path):
+    db = Database(str(tmp_path / 'board.db'))
+    board = Leaderboard()
+    with db.transaction() as c:
+        c.execute("INSERT INTO users (telegram_id, username, score) VALUES (1, 'a', 10), (2, 'b', 20)")
+    board.load(db)
+    assert board.rank(1) == 2
+
+    with db.transaction() as c:
+        c.execute("UPDATE users SET score = 30 WHERE telegram_id = 1")
+        board.track(db, c, 1)
+        assert board.rank(1) == 2  # до commit таблица не меняется
+    assert board.rank(1) == 1
+
+    with pytest.raises(RuntimeError):
+        with db.transaction() as c:
+            c.execute("UPDATE users SET score = 0 WHERE telegram_id = 1")
+            board.track(db, c, 1)
+            raise RuntimeError
+    assert board.rank(1) == 1
@@ -0,0 +1,92 @@
+import pytest
+import match_store as module
+from http_client import ApiResponse
+from match_store import MatchStore, DELTA_PAGE_SIZE, INITIAL_SYNC_LIMIT
+
+ACCOUNT = 42
+
+
+class FakeApi:
+    """История матчей игрока от новых к старым, отдается страницами"""
+
+    def __init__(self, count: int):
+        self.matches = []
+        self.calls = []
+        self.add(count)
+
+    def add(self, count: int):
+        start = self.matches[0]['start_time'] + 1 if self.matches else 1
+        fresh = [{'match_id': t, 'start_time': t} for t in range(start, start + count)]
+        self.matches = fresh[::-1] + self.matches
+
+    async def get_json(self, url, params=None, **kwargs):
+        offset, limit = params.get('offset', 0), params['limit']
+        self.calls.append((offset, limit))
+        return ApiResponse(200, self.matches[offset:offset + limit], {}, 0)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(module, 'MIN_SYNC_INTERVAL', 0)
+    return MatchStore(str(tmp_path / 'matches.db'))
+
+
+def stored_ids(store, run):
+    return [m['match_id'] for m in run(store.get_recent_matches(ACCOUNT, 1000))]
+
+
+def test_initial_sync_loads_one_page(store, monkeypatch, run):
+    api = FakeApi(150)
+    monkeypatch.setattr(module, 'http_client', api)
+    assert run(store.sync(ACCOUNT))
+    assert api.calls == [(0, INITIAL_SYNC_LIMIT)]
+    assert stored_ids(store, run) == list(range(150, 50, -1))
+
+
+def test_delta_sync_stops_at_stored_match(store, monkeypatch, run):
+    api = FakeApi(30)
+    monkeypatch.setattr(module, 'http_client', api)
+    run(store.sync(ACCOUNT))
+    api.add(25)
+    api.calls.clear()
+
+    assert run(store.sync(ACCOUNT))
+    assert api.calls == [(0, DELTA_PAGE_SIZE), (DELTA_PAGE_SIZE, DELTA_PAGE_SIZE)]
+    assert stored_ids(store, run) == list(range(55, 0, -1))
+
+
+def test_delta_without_overlap_reloads_history(store, monkeypatch, run):
+    api = FakeApi(30)
+    monkeypatch.setattr(module, 'http_client', api)
+    run(store.sync(ACCOUNT))
+    api.add(INITIAL_SYNC_LIMIT + 20)
+
+    assert run(store.sync(ACCOUNT))
+    # Старые матчи отделены от новых дырой - история начинается заново
+    ids = stored_ids(store, run)
+    assert ids == list(range(150, 150 - INITIAL_SYNC_LIMIT, -1))
+
+
+def test_failed_page_saves_nothing(store, monkeypatch, run):
+    api = FakeApi(30)
+    monkeypatch.setattr(module, 'http_client', api)
+    run(store.sync(ACCOUNT))
+    api.add(25)
+
+    async def flaky(url, params=None, **kwargs):
+        if params.get('offset'):
+            return ApiResponse(500, None, {}, 0)
+        return await FakeApi.get_json(api, url, params)
+
+    monkeypatch.setattr(api, 'get_json', flaky)
+    assert not run(store.sync(ACCOUNT))
+    assert stored_ids(store, run) == list(range(30, 0, -1))
+
+
+def test_last_sync_keeps_only_recent_accounts(store, monkeypatch, run, clock):
+    monkeypatch.setattr(module, 'MIN_SYNC_INTERVAL', 60)
+    monkeypatch.setattr(module, 'time', clock)
+    for account_id in range(5):
+        store._mark_synced(account_id)
+        clock.advance(20)
+    assert list(store._last_sync) == [2, 3, 4]
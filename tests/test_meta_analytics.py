@@ -0,0 +1,79 @@
+import math
+import numpy as np
+import pytest
+from meta_analytics import BRACKET_COUNT, WILSON_Z, MetaTable, wilson_lower_bound
+
+
+def wilson_reference(wins, games, z=WILSON_Z):
+    p = wins / games
+    return ((p + z * z / (2 * games) - z * math.sqrt((p * (1 - p) + z * z / (4 * games)) / games))
+            / (1 + z * z / games))
+
+
+def hero(hero_id, name, picks, wins):
+    stats = {'id': hero_id, 'localized_name': name}
+    for b in range(1, BRACKET_COUNT + 1):
+        stats[f'{b}_pick'] = picks[b - 1]
+        stats[f'{b}_win'] = wins[b - 1]
+    return stats
+
+
+@pytest.fixture
+def table():
+    return MetaTable.from_hero_stats([
+        # Маленькая выборка с высоким винрейтом
+        hero(1, 'Lucky', [10] * 8, [8] * 8),
+        # Большая выборка чуть выше 50%
+        hero(2, 'Solid', [1000] * 8, [550] * 8),
+        # Растет по группам
+        hero(3, 'Climber', [200] * 8, [80, 90, 100, 110, 120, 130, 140, 150]),
+        # Нет игр в первой группе
+        hero(4, 'Rare', [0] + [50] * 7, [0] + [20] * 7),
+    ])
+
+
+def test_wilson_matches_formula():
+    wins = np.array([8.0, 550.0, 0.0])
+    games = np.array([10.0, 1000.0, 0.0])
+    bounds = wilson_lower_bound(wins, games)
+    assert bounds[0] == pytest.approx(wilson_reference(8, 10))
+    assert bounds[1] == pytest.approx(wilson_reference(550, 1000))
+    assert bounds[2] == 0.0
+    assert np.all(bounds[:2] < wins[:2] / games[:2])
+
+
+def test_wilson_prefers_large_samples(table):
+    assert [h['name'] for h in table.top(1, 'winrate', limit=2)] == ['Lucky', 'Solid']
+    assert table.top(1, 'wilson', limit=1)[0]['name'] == 'Solid'
+
+
+def test_pickrate_counts_ten_picks_per_match(table):
+    matches = (10 + 1000 + 200 + 0) / 10
+    solid = next(h for h in table.top(1, 'pickrate') if h['name'] == 'Solid')
+    assert solid['pickrate'] == pytest.approx(1000 / matches * 100)
+
+
+def test_delta_against_previous_bracket(table):
+    climber = next(h for h in table.top(3, 'delta') if h['name'] == 'Climber')
+    assert climber['delta'] == pytest.approx(5.0)
+    # Без игр в предыдущей группе рост не считается
+    rare = next(h for h in table.top(2, 'delta') if h['name'] == 'Rare')
+    assert rare['delta'] == 0.0
+
+
+def test_top_skips_heroes_without_enough_picks(table):
+    assert 'Rare' not in [h['name'] for h in table.top(1)]
+    assert [h['name'] for h in table.top(2, min_picks=100)] == ['Solid', 'Climber']
+
+
+def test_unknown_sort_is_rejected(table):
+    with pytest.raises(ValueError):
+        table.top(1, 'name')
+
+
+def test_rows_round_trip(table):
+    restored = MetaTable.from_rows(table.to_rows())
+    assert len(restored) == len(table)
+    assert np.array_equal(restored.picks, table.picks)
+    assert np.array_equal(restored.wins, table.wins)
+    assert restored.top(5) == table.top(5)
@@ -0,0 +1,33 @@
+from meta_analytics import BRACKET_COUNT, MetaTable
+from meta_snapshot import META_NOOP, MetaSnapshot, parse_view
+
+
+def hero(hero_id, name, picks, wins):
+    stats = {'id': hero_id, 'localized_name': name}
+    for b in range(1, BRACKET_COUNT + 1):
+        stats[f'{b}_pick'] = picks
+        stats[f'{b}_win'] = wins
+    return stats
+
+
+def test_parse_view_accepts_own_buttons_only():
+    assert parse_view("meta_view_8_wilson") == (8, 'wilson')
+    assert parse_view("meta_view_1_wilson") == (1, 'wilson')
+    assert parse_view("meta_view_x_wilson") is None
+    assert parse_view("meta_view_9_wilson") is None
+    assert parse_view("meta_view_0_wilson") is None
+    assert parse_view("meta_view_8_nope") is None
+    assert parse_view("meta_view_8") is None
+
+
+def test_selected_buttons_do_not_reload_screen():
+    table = MetaTable.from_hero_stats([hero(1, 'Solid', 1000, 550)])
+    _, markup = MetaSnapshot._render(table, 8, 'wilson', 0)
+    buttons = [button for row in markup.inline_keyboard for button in row]
+    selected = [button for button in buttons if button.text.startswith("•")]
+    assert len(selected) == 2
+    assert all(button.callback_data == META_NOOP for button in selected)
+    # Все остальные кнопки ведут на другой экран, и их данные разбираются
+    views = [parse_view(button.callback_data) for button in buttons if button not in selected]
+    assert None not in views
+    assert (8, 'wilson') not in views
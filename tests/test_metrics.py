@@ -0,0 +1,116 @@
+import datetime
+import pytest
+import metrics
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.types import CallbackQuery, Chat, Message, User
+from metrics import (
+    Counter, Histogram, HandlerMetricsMiddleware, MetricsRegistry, callback_prefix, endpoint_name
+)
+
+
+def test_counter_with_labels_and_escaping():
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', 'Запросы', ('path',))
+    counter.inc(path='/a')
+    counter.inc(2, path='/a')
+    counter.inc(path='say "hi"\n')
+    assert registry.render().splitlines() == [
+        '# HELP requests_total Запросы',
+        '# TYPE requests_total counter',
+        'requests_total{path="/a"} 3',
+        'requests_total{path="say \\"hi\\"\\n"} 1',
+    ]
+
+
+def test_gauge_function_and_value():
+    registry = MetricsRegistry()
+    registry.gauge('uptime', 'Время', function=lambda: 12.5)
+    gauge = registry.gauge('temp', 'Температура')
+    gauge.set(3)
+    text = registry.render()
+    assert 'uptime 12.5\n' in text
+    assert 'temp 3\n' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency', 'Время', ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, op='get')
+    assert histogram.render()[2:] == [
+        'latency_bucket{op="get",le="0.1"} 2',
+        'latency_bucket{op="get",le="1"} 3',
+        'latency_bucket{op="get",le="+Inf"} 4',
+        'latency_sum{op="get"} 3.65',
+        'latency_count{op="get"} 4',
+    ]
+
+
+def test_duplicate_metric_is_rejected():
+    registry = MetricsRegistry()
+    registry.counter('x', 'x')
+    with pytest.raises(ValueError):
+        registry.register(Counter('x', 'x'))
+
+
+def test_label_helpers():
+    assert endpoint_name("https://api.opendota.com/api/players/123/matches?limit=5") \
+        == "api.opendota.com/api/players/:id/matches"
+    known = ("builds", "builds_back", "hero_build", "quiz_answer")
+    assert callback_prefix("hero_build_12_carry", known) == "hero_build"
+    assert callback_prefix("quiz_answer_3_1", known) == "quiz_answer"
+    assert callback_prefix("builds_back", known) == "builds_back"
+    assert callback_prefix("builds_carry", known) == "builds"
+    # Произвольные данные от клиента не плодят новые метки
+    assert callback_prefix("hero_builder", known) == "other"
+    assert callback_prefix("garbage_abc", known) == "other"
+    assert callback_prefix("123", known) == "other"
+
+
+def test_handler_middleware_records_time_and_errors(run, monkeypatch):
+    seconds = Histogram('h', 'h', ('handler', 'route'))
+    errors = Counter('e', 'e', ('handler', 'route'))
+    monkeypatch.setattr(metrics, 'handler_seconds', seconds)
+    monkeypatch.setattr(metrics, 'handler_errors', errors)
+    middleware = HandlerMetricsMiddleware()
+
+    def profile_cmd():
+        pass
+
+    data = {'handler': type('H', (), {'callback': profile_cmd})()}
+
+    async def ok(event, data):
+        return 'done'
+
+    async def fail(event, data):
+        raise RuntimeError
+
+    async def skip(event, data):
+        raise SkipHandler
+
+    async def main():
+        assert await middleware(ok, object(), data) == 'done'
+        with pytest.raises(RuntimeError):
+            await middleware(fail, object(), data)
+        with pytest.raises(SkipHandler):
+            await middleware(skip, object(), data)
+
+    run(main())
+    assert seconds.render()[-1] == 'h_count{handler="profile_cmd",route="object"} 2'
+    assert errors.render()[-1] == 'e{handler="profile_cmd",route="object"} 1'
+
+
+def message(text):
+    return Message(message_id=1, date=datetime.datetime.now(), chat=Chat(id=1, type='private'), text=text)
+
+
+def test_route_never_contains_free_text():
+    middleware = HandlerMetricsMiddleware(menu_texts=("👤 Профиль",), commands=("start",),
+                                          callback_prefixes=("hero_build",))
+    assert middleware.route(message("👤 Профиль")) == "👤 Профиль"
+    assert middleware.route(message("/start@dota_bot x")) == "/start"
+    assert middleware.route(message("/secret_123")) == "command"
+    assert middleware.route(message("мой steam id 123")) == "text"
+    callback = CallbackQuery(id='1', from_user=User(id=1, is_bot=False, first_name='a'),
+                             chat_instance='1', data='hero_build_12')
+    assert middleware.route(callback) == "hero_build"
+    assert middleware.route(callback.model_copy(update={'data': 'crafted_payload'})) == "other"
@@ -0,0 +1,57 @@
+import sqlite3
+import pytest
+import migrations
+from migrations import MIGRATIONS, get_version, migrate
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def indexes(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA index_list({table})")}
+
+
+def test_numbers_are_strictly_increasing():
+    numbers = [number for number, _, _ in MIGRATIONS]
+    assert numbers == sorted(set(numbers))
+    assert numbers[0] == 1
+
+
+def test_fresh_database_gets_latest_schema():
+    conn = sqlite3.connect(':memory:')
+    assert migrate(conn) == LATEST
+    assert get_version(conn) == LATEST
+    assert 'uq_user_quests_user_date_quest' in indexes(conn, 'user_quests')
+    # Повторный запуск ничего не применяет
+    assert migrate(conn) == LATEST
+
+
+def test_duplicates_are_removed_before_unique_indexes(monkeypatch):
+    conn = sqlite3.connect(':memory:')
+    monkeypatch.setattr(migrations, 'MIGRATIONS', MIGRATIONS[:1])
+    migrate(conn)
+    conn.executemany("INSERT INTO friends (user_id, friend_account_id, friend_name) VALUES (?, ?, ?)",
+                     [(1, 100, 'old'), (1, 100, 'new'), (1, 200, 'other')])
+    conn.executemany("INSERT INTO user_quests (user_id, quest_id, assigned_date, progress) VALUES (?, ?, ?, ?)",
+                     [(1, 5, '2024-01-01', 1), (1, 5, '2024-01-01', 3)])
+    conn.commit()
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', MIGRATIONS)
+    assert migrate(conn) == LATEST
+    assert conn.execute("SELECT friend_account_id, friend_name FROM friends ORDER BY friend_account_id").fetchall() \
+        == [(100, 'new'), (200, 'other')]
+    assert conn.execute("SELECT progress FROM user_quests").fetchall() == [(3,)]
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO friends (user_id, friend_account_id) VALUES (1, 100)")
+
+
+def test_failed_migration_is_rolled_back(monkeypatch):
+    conn = sqlite3.connect(':memory:')
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [
+        (1, "ok", ['CREATE TABLE a (x INTEGER)']),
+        (2, "broken", ['CREATE TABLE b (x INTEGER)', 'INSERT INTO missing VALUES (1)']),
+    ])
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn)
+    assert get_version(conn) == 1
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'a' in tables and 'b' not in tables
@@ -0,0 +1,60 @@
+import pytest
+import quiz_bank as module
+from quiz_bank import QuizBank
+
+
+class StubRegistry:
+    def __init__(self, count):
+        self.quiz_questions = tuple(
+            {'question': f"Q{i}", 'options': ['a', 'b', 'c', 'd'], 'correct': i % 4} for i in range(count)
+        )
+
+    def add_reload_listener(self, listener):
+        pass
+
+
+def make_bank(count):
+    return QuizBank(StubRegistry(count))
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 10, 12, 30, 64, 97, 360])
+def test_question_order_is_a_permutation(size):
+    bank = make_bank(size)
+    for user_id, seed in [(1, 0), (123456789, 42), (987654321, 2 ** 31 - 1)]:
+        order = [bank.question_id(user_id, seed, n) for n in range(size)]
+        assert sorted(order) == list(range(size))
+
+
+def test_order_depends_on_user_and_seed():
+    bank = make_bank(30)
+    orders = {tuple(bank.question_id(user_id, seed, n) for n in range(10))
+              for user_id in (1, 2, 3) for seed in (0, 1)}
+    assert len(orders) > 1
+
+
+def test_empty_bank():
+    bank = make_bank(0)
+    assert bank.question_id(1, 0, 0) is None
+    assert bank.round_size == 0
+
+
+def test_invalid_questions_are_skipped():
+    texts, correct, markups = QuizBank.compile([
+        {'question': 'ok', 'options': ['x', 'y'], 'correct': 1},
+        {'question': 'bad answer', 'options': ['x'], 'correct': 3},
+        {'question': '', 'options': ['x'], 'correct': 0},
+    ])
+    assert texts == ('ok',)
+    assert correct == bytes([1])
+    assert [b.callback_data for row in markups[0].inline_keyboard for b in row] == \
+        ['quiz_answer_0_0', 'quiz_answer_0_1']
+
+
+def test_answers_and_round_size(monkeypatch):
+    monkeypatch.setattr(module, 'QUIZ_ROUND_SIZE', 10)
+    bank = make_bank(12)
+    text, markup = bank.question(5)
+    assert text == 'Q5'
+    assert bank.is_correct(5, 1) and not bank.is_correct(5, 0)
+    assert bank.round_size == 10
+    assert make_bank(4).round_size == 4
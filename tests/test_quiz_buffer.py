@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+import quiz_buffer as module
+from quiz_buffer import QuizWriteBuffer
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    buffer = QuizWriteBuffer(str(tmp_path / 'quiz.db'))
+    with buffer.db.transaction() as c:
+        c.execute("INSERT INTO users (telegram_id, username, score) VALUES (1, 'a', 5)")
+    return buffer
+
+
+def db_rows(buffer):
+    with buffer.db.transaction() as c:
+        c.execute("SELECT user_id, current_question, score, seed FROM quiz_state")
+        states = c.fetchall()
+        c.execute("SELECT score FROM users WHERE telegram_id = 1")
+        return states, c.fetchone()[0]
+
+
+def test_reads_see_pending_changes(buffer, run):
+    async def main():
+        assert await buffer.get_state(1) == (1, 0, 0, None, 0)
+        buffer.set_state(1, 3, 20, 7)
+        assert await buffer.get_state(1) == (1, 3, 20, None, 7)
+
+    run(main())
+    assert db_rows(buffer) == ([], 5)
+
+
+def test_flush_writes_one_batch(buffer, run):
+    async def main():
+        buffer.set_state(1, 1, 10, 7)
+        buffer.set_state(1, 2, 20, 7)
+        buffer.add_score(1, 10)
+        buffer.add_score(1, 10)
+        await buffer.flush()
+        assert buffer.pending == 0
+        # После сброса состояние читается из базы
+        state = await buffer.get_state(1)
+        assert state[1:3] == (2, 20) and state[4] == 7
+
+    run(main())
+    assert db_rows(buffer) == ([(1, 2, 20, 7)], 25)
+    assert buffer.flushes == 1
+
+
+def test_state_is_visible_while_batch_is_written(buffer, run, monkeypatch):
+    seen = []
+    write = QuizWriteBuffer._write
+
+    async def slow_write(self, states, scores):
+        seen.append(await self.get_state(1))
+        await write(self, states, scores)
+
+    monkeypatch.setattr(QuizWriteBuffer, '_write', slow_write)
+
+    async def main():
+        buffer.set_state(1, 4, 40, 1)
+        await buffer.flush()
+
+    run(main())
+    assert seen == [(1, 4, 40, None, 1)]
+
+
+def test_failed_flush_keeps_changes_without_overwriting_newer(buffer, run, monkeypatch):
+    async def main():
+        buffer.set_state(1, 1, 10, 7)
+        buffer.add_score(1, 10)
+
+        async def failing_write(states, scores):
+            # Пока пачка пишется, пользователь успел ответить еще раз
+            buffer.set_state(1, 2, 20, 7)
+            buffer.add_score(1, 10)
+            raise RuntimeError('disk full')
+
+        monkeypatch.setattr(buffer, '_write', failing_write)
+        with pytest.raises(RuntimeError):
+            await buffer.flush()
+        monkeypatch.undo()
+        assert (await buffer.get_state(1))[1] == 2
+        await buffer.flush()
+
+    run(main())
+    assert db_rows(buffer) == ([(1, 2, 20, 7)], 25)
+
+
+def test_early_flush_when_too_many_pending(buffer, run, monkeypatch):
+    monkeypatch.setattr(module, 'QUIZ_FLUSH_MAX_PENDING', 2)
+
+    async def main():
+        buffer.set_state(1, 1, 10, 7)
+        buffer.add_score(1, 10)
+        await asyncio.wait_for(buffer._early_flush, 5)
+
+    run(main())
+    assert buffer.pending == 0
+    assert db_rows(buffer) == ([(1, 1, 10, 7)], 15)
+
+
+def test_user_lock_serialises_answers_after_flush(buffer, run):
+    async def answer():
+        async with buffer.user_lock(1):
+            state = await buffer.get_state(1)
+            if state[1] == 3:
+                buffer.set_state(1, 4, state[2] + 10, state[4])
+                buffer.add_score(1, 10)
+
+    async def main():
+        buffer.set_state(1, 3, 20, 7)
+        await buffer.flush()
+        # Состояние уже только в базе: оба нажатия читают его через await
+        await asyncio.gather(answer(), answer())
+        assert await buffer.get_state(1) == (1, 4, 30, None, 7)
+        assert buffer._scores == {1: 10}
+        assert buffer._user_locks == {}
+
+    run(main())
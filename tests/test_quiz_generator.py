@@ -0,0 +1,69 @@
+import os
+import json
+import shutil
+import pytest
+from game_data import GameDataRegistry
+from quiz_bank import QuizBank
+from quiz_generator import OPTIONS_COUNT, SOURCES, QuizGenerator
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for filename in GameDataRegistry.SOURCES.values():
+        shutil.copy(os.path.join(REPO_DIR, filename), tmp_path / filename)
+    return tmp_path
+
+
+def make_generator(base_dir):
+    registry = GameDataRegistry(str(base_dir))
+    return QuizGenerator(registry, QuizBank(registry))
+
+
+def test_generated_questions_are_valid(data_dir):
+    questions = make_generator(data_dir).generate(size=200, seed=1)
+    assert questions
+    keys = set()
+    for q in questions:
+        assert len(q['options']) == OPTIONS_COUNT
+        assert len(set(q['options'])) == OPTIONS_COUNT
+        assert 0 <= q['correct'] < OPTIONS_COUNT
+        assert 'Recipe' not in q['options'][q['correct']]
+        keys.add((q['question'], q['options'][q['correct']]))
+    assert len(keys) == len(questions)
+
+
+def test_pool_is_the_same_in_every_process(data_dir, run):
+    first, second = make_generator(data_dir), make_generator(data_dir)
+    run(first.refresh())
+    run(second.refresh())
+    assert first.version == second.version
+    assert first.bank.generated == second.bank.generated
+    assert first.bank.question_id(7, 3, 5) == second.bank.question_id(7, 3, 5)
+
+
+def test_refresh_without_data_changes_keeps_pool(data_dir, run):
+    generator = make_generator(data_dir)
+    run(generator.refresh())
+    pool = generator.bank.generated
+    run(generator.refresh())
+    assert generator.bank.generated is pool
+
+
+def test_version_follows_content_not_mtime(data_dir):
+    registry = GameDataRegistry(str(data_dir))
+    version = registry.version(SOURCES)
+
+    path = data_dir / GameDataRegistry.SOURCES['quiz_questions']
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    registry.check_reload()
+    assert registry.version(SOURCES) == version
+
+    data = json.loads(path.read_text(encoding='utf-8'))
+    data['questions'] = data['questions'][:-1]
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, (stat.st_atime, stat.st_mtime + 20))
+    registry.check_reload()
+    assert registry.version(SOURCES) != version
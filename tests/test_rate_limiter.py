@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+import rate_limiter as module
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RateLimiter, RateLimitExceeded
+
+
+def test_burst_up_to_bucket_size_is_immediate(run):
+    limiter = RateLimiter('test', per_minute=3, per_day=100)
+
+    async def main():
+        for _ in range(3):
+            await asyncio.wait_for(limiter.acquire(), 0.1)
+
+    run(main())
+    assert limiter.stats()['day_used'] == 3
+    assert limiter.stats()['tokens'] < 1
+
+
+def test_interactive_waiters_go_first(run):
+    # 1200 в минуту - токен каждые 50 мс
+    limiter = RateLimiter('test', per_minute=1200, per_day=1000, max_wait=10)
+    limiter._tokens = 0.0
+    order = []
+
+    async def take(name, priority):
+        await limiter.acquire(priority)
+        order.append(name)
+
+    async def main():
+        background = [asyncio.ensure_future(take(f'bg{i}', PRIORITY_BACKGROUND)) for i in range(2)]
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(take('user', PRIORITY_INTERACTIVE))
+        await asyncio.gather(interactive, *background)
+
+    run(main())
+    assert order[0] == 'user'
+
+
+def test_daily_budget_rejects_new_callers(run):
+    limiter = RateLimiter('test', per_minute=10, per_day=2)
+
+    async def main():
+        await limiter.acquire()
+        await limiter.acquire()
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire()
+
+    run(main())
+    assert limiter.rejected == 1
+
+
+def test_daily_budget_applies_to_queued_waiters(run):
+    limiter = RateLimiter('test', per_minute=1200, per_day=2, max_wait=10)
+    limiter._tokens = 0.0
+
+    async def main():
+        return await asyncio.gather(*(limiter.acquire() for _ in range(5)), return_exceptions=True)
+
+    results = run(main())
+    assert results[:2] == [None, None]
+    assert all(isinstance(r, RateLimitExceeded) for r in results[2:])
+    assert limiter.stats()['day_used'] == 2
+
+
+def test_cancelled_grant_returns_token_within_bucket(run):
+    limiter = RateLimiter('test', per_minute=2, per_day=100, max_wait=100)
+    limiter._tokens = 0.0
+
+    async def main():
+        task = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)  # запрос встал в очередь
+        limiter._tokens = 1.0
+        limiter._dispatch()  # токен выдан, но задача еще не проснулась
+        limiter._tokens = 2.0  # а ведро за это время успело наполниться
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run(main())
+    assert limiter._tokens <= limiter.per_minute
+    assert limiter.stats()['day_used'] == 0
+
+
+def test_long_queue_is_rejected_up_front(run):
+    limiter = RateLimiter('test', per_minute=60, per_day=100, max_wait=0.5)
+    limiter._tokens = 0.0
+
+    async def main():
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire()
+
+    run(main())
+
+
+def test_backoff_prefers_retry_after(monkeypatch):
+    limiter = RateLimiter('test', per_minute=60, per_day=100)
+    monkeypatch.setattr(module.random, 'uniform', lambda a, b: 0)
+    assert limiter.backoff_delay(0, '7') == 7
+    assert limiter.backoff_delay(3, 'soon') == module.BACKOFF_BASE
+
+
+def test_rate_limited_blocks_dispatch():
+    limiter = RateLimiter('test', per_minute=60, per_day=100, max_wait=100)
+    limiter.on_rate_limited(30)
+    assert limiter.stats()['tokens'] < 1
+    assert limiter.stats()['blocked_for'] > 29
+
+
+def test_budget_is_split_between_workers():
+    assert module.budget_share(60, 1) == 60
+    assert module.budget_share(2000, 4) == 500
+    assert module.budget_share(60, 0) == 60
+    assert module.budget_share(3, 8) == 1
@@ -0,0 +1,76 @@
+import asyncio
+from request_coalescer import RequestCoalescer
+from http_client import ApiResponse, HttpClient
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+def test_concurrent_calls_share_one_flight(run):
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'data'
+
+    async def main():
+        return await asyncio.gather(*(coalescer.run('key', load) for _ in range(5)))
+
+    assert run(main()) == ['data'] * 5
+    assert len(calls) == 1
+    assert coalescer.stats() == {'started': 1, 'coalesced': 4, 'inflight': 0}
+
+
+def test_cancelled_waiter_does_not_cancel_flight(run):
+    coalescer = RequestCoalescer()
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return 'data'
+
+    async def main():
+        first = asyncio.ensure_future(coalescer.run('key', load))
+        second = asyncio.ensure_future(coalescer.run('key', load))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert run(main()) == 'data'
+
+
+def test_error_is_shared_and_flight_is_forgotten(run):
+    coalescer = RequestCoalescer()
+
+    async def fail():
+        raise ValueError('boom')
+
+    async def main():
+        results = await asyncio.gather(coalescer.run('key', fail), coalescer.run('key', fail),
+                                       return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert coalescer.inflight == 0
+
+    run(main())
+
+
+def test_flights_are_separate_per_priority(run):
+    client = HttpClient()
+    priorities = []
+
+    async def fetch_limited(url, params, timeout, priority):
+        priorities.append(priority)
+        await asyncio.sleep(0.01)
+        return ApiResponse(200, {}, {}, 0)
+
+    client._fetch_limited = fetch_limited
+    url = "https://api.opendota.com/api/heroStats"
+
+    async def main():
+        await asyncio.gather(
+            client.get_json(url, priority=PRIORITY_BACKGROUND),
+            client.get_json(url, priority=PRIORITY_INTERACTIVE),
+            client.get_json(url, priority=PRIORITY_INTERACTIVE),
+        )
+
+    run(main())
+    assert sorted(priorities) == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
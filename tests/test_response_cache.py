@@ -0,0 +1,70 @@
+import response_cache as module
+from response_cache import ResponseCache, ENTRY_OVERHEAD
+
+PROFILE = "https://api.opendota.com/api/players/42"
+MATCHES = "https://api.opendota.com/api/players/42/matches"
+
+
+def make_cache(monkeypatch, clock, **kwargs):
+    monkeypatch.setattr(module, 'time', clock)
+    kwargs.setdefault('ttls', {'players': 100, 'players/matches': 10})
+    return ResponseCache(**kwargs)
+
+
+def test_key_for_player_endpoints(monkeypatch, clock):
+    cache = make_cache(monkeypatch, clock)
+    assert cache.key_for(PROFILE) == ('players', 42, ())
+    assert cache.key_for(MATCHES, {'limit': 5}) == ('players/matches', 42, (('limit', '5'),))
+    # Эндпоинт без TTL и чужие адреса не кэшируются
+    assert cache.key_for("https://api.opendota.com/api/players/42/wl") is None
+    assert cache.key_for("https://api.opendota.com/api/heroStats") is None
+
+
+def test_params_order_does_not_change_key(monkeypatch, clock):
+    cache = make_cache(monkeypatch, clock)
+    assert cache.key_for(MATCHES, {'a': 1, 'b': 2}) == cache.key_for(MATCHES, {'b': 2, 'a': 1})
+
+
+def test_entry_expires_after_endpoint_ttl(monkeypatch, clock):
+    cache = make_cache(monkeypatch, clock)
+    key = cache.key_for(MATCHES)
+    cache.set(key, 'matches')
+    clock.advance(9)
+    assert cache.get(key) == 'matches'
+    clock.advance(1)
+    assert cache.get(key) is None
+    assert cache.expirations == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_eviction_by_bytes(monkeypatch, clock):
+    cache = make_cache(monkeypatch, clock, max_bytes=2 * (ENTRY_OVERHEAD + 100))
+    keys = [('players', account_id, ()) for account_id in (1, 2, 3)]
+    cache.set(keys[0], 'a', 100)
+    cache.set(keys[1], 'b', 100)
+    cache.get(keys[0])  # первая запись становится самой свежей
+    cache.set(keys[2], 'c', 100)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == 'a'
+    assert cache.get(keys[2]) == 'c'
+    assert cache.evictions == 1
+    assert cache.stats()['bytes'] == 2 * (ENTRY_OVERHEAD + 100)
+
+
+def test_oversized_entry_is_not_stored(monkeypatch, clock):
+    cache = make_cache(monkeypatch, clock, max_bytes=ENTRY_OVERHEAD + 10)
+    key = cache.key_for(PROFILE)
+    cache.set(key, 'big', 11)
+    assert cache.get(key) is None
+
+
+def test_invalidate_player(monkeypatch, clock):
+    cache = make_cache(monkeypatch, clock)
+    cache.set(cache.key_for(PROFILE), 'profile')
+    cache.set(cache.key_for(MATCHES), 'matches')
+    cache.set(('players', 7, ()), 'other')
+    cache.invalidate(42)
+    assert cache.get(cache.key_for(PROFILE)) is None
+    assert cache.get(('players', 7, ())) == 'other'
+    assert cache.stats()['bytes'] == ENTRY_OVERHEAD
@@ -0,0 +1,152 @@
+import asyncio
+import textwrap
+from types import SimpleNamespace
+import pytest
+import sharding
+from sharding import ChatSequencer, ShardRouter, shard_key
+
+# Обработчик-заглушка: дописывает полученные строки в файл out_<номер>.
+# Строка "die" завершает процесс.
+WORKER_SCRIPT = textwrap.dedent('''
+    import os, sys
+    index = sys.argv[2]
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "out_" + index)
+    for line in sys.stdin:
+        with open(path, "a") as f:
+            f.write(line)
+        if '"die"' in line:
+            sys.exit(3)
+''')
+
+
+def test_shard_key_prefers_chat():
+    message = SimpleNamespace(chat=SimpleNamespace(id=-100), from_user=SimpleNamespace(id=5))
+    assert shard_key(SimpleNamespace(event=message, update_id=1)) == -100
+    callback = SimpleNamespace(chat=None, message=message, from_user=SimpleNamespace(id=5))
+    assert shard_key(SimpleNamespace(event=callback, update_id=1)) == -100
+    inline = SimpleNamespace(from_user=SimpleNamespace(id=5))
+    assert shard_key(SimpleNamespace(event=inline, update_id=1)) == 5
+    assert shard_key(SimpleNamespace(event=SimpleNamespace(), update_id=9)) == 9
+
+
+def test_sequencer_keeps_order_within_chat(run):
+    sequencer = ChatSequencer()
+    log = []
+
+    def job(key, n, delay):
+        async def work():
+            await asyncio.sleep(delay)
+            log.append((key, n))
+        return work
+
+    async def main():
+        sequencer.submit(1, job(1, 0, 0.03))
+        sequencer.submit(1, job(1, 1, 0))
+        sequencer.submit(2, job(2, 0, 0.01))
+        sequencer.submit(1, job(1, 2, 0))
+        await sequencer.drain()
+
+    run(main())
+    assert [n for key, n in log if key == 1] == [0, 1, 2]
+    # Чаты не ждут друг друга
+    assert log.index((2, 0)) < log.index((1, 0))
+    assert len(sequencer) == 0
+
+
+def test_sequencer_continues_after_error(run):
+    sequencer = ChatSequencer()
+    log = []
+
+    async def fail():
+        raise RuntimeError('boom')
+
+    async def ok():
+        log.append('ok')
+
+    async def main():
+        sequencer.submit(1, fail)
+        sequencer.submit(1, ok)
+        await sequencer.drain()
+
+    run(main())
+    assert log == ['ok']
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / 'worker.py'
+    path.write_text(WORKER_SCRIPT)
+    return path
+
+
+def lines(script, index):
+    path = script.parent / f"out_{index}"
+    return path.read_text().splitlines() if path.exists() else []
+
+
+async def wait_for(condition, timeout=5):
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError('condition not met')
+
+
+def test_updates_go_to_worker_by_key(script, run):
+    router = ShardRouter(2, str(script))
+
+    async def main():
+        await router.start()
+        for key in (0, 1, 2, 3):
+            await router.feed({'update_id': key}, key)
+        await router.stop(timeout=5)
+
+    run(main())
+    assert lines(script, 0) == ['{"update_id":0}', '{"update_id":2}']
+    assert lines(script, 1) == ['{"update_id":1}', '{"update_id":3}']
+    assert router.forwarded == [2, 2]
+
+
+def test_dead_worker_is_restarted_without_new_updates(script, run, monkeypatch):
+    monkeypatch.setattr(sharding, 'WORKER_RESTART_DELAY', 0)
+    router = ShardRouter(1, str(script))
+
+    async def main():
+        await router.start()
+        first = router._processes[0]
+        await router.feed({'update_id': 'die'}, 0)
+        await wait_for(lambda: router._processes[0] is not first)
+        assert router.restarts == 1
+        assert await router.alive()
+        await router.stop(timeout=5)
+
+    run(main())
+
+
+def test_broken_pipe_respawns_and_resends(script, run, monkeypatch):
+    monkeypatch.setattr(sharding, 'WORKER_RESTART_DELAY', 10)
+    router = ShardRouter(1, str(script))
+
+    send = ShardRouter._send
+    failures = [True]
+
+    async def flaky_send(process, line):
+        # Первая запись: канал оборван, хотя процесс формально еще жив
+        if failures.pop() if failures else False:
+            return False
+        return await send(process, line)
+
+    monkeypatch.setattr(router, '_send', flaky_send)
+
+    async def main():
+        await router.start()
+        first = router._processes[0]
+        await router.feed({'update_id': 7}, 0)
+        assert router._processes[0] is not first
+        assert first.returncode is not None
+        await router.stop(timeout=5)
+
+    run(main())
+    assert lines(script, 0) == ['{"update_id":7}']
+    assert router.forwarded == [1]
+    assert router.restarts == 1
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+import tracing
+from tracing import TracingMiddleware, current_trace_id, span
+
+UPDATE = SimpleNamespace(update_id=1, event_type='message')
+
+
+def run_traced(run, handler, sample_rate=1.0, slow_threshold=0.0):
+    middleware = TracingMiddleware(sample_rate=sample_rate, slow_threshold=slow_threshold)
+    data = {}
+    result = run(middleware(handler, UPDATE, data))
+    return result, data
+
+
+def test_spans_nest_and_reach_slow_log(run, caplog):
+    async def handler(event, data):
+        with span("handler:profile_cmd"):
+            with span("db:get_user") as s:
+                s.set(rows=1)
+            await asyncio.gather(*(fetch() for _ in range(2)))
+        return 'ok'
+
+    async def fetch():
+        with span("http:players"):
+            await asyncio.sleep(0)
+
+    with caplog.at_level(logging.WARNING, logger='slow_updates'):
+        result, data = run_traced(run, handler)
+
+    assert result == 'ok'
+    record = caplog.records[-1].getMessage()
+    assert data['trace_id'] in record
+    timeline = record.splitlines()[1:]
+    names = [line.split(' ms  ')[-1] for line in timeline]
+    assert names == ['update:message  update_id=1', '  handler:profile_cmd',
+                     '    db:get_user  rows=1', '    http:players', '    http:players']
+
+
+def test_unsampled_slow_update_logs_one_line(run, caplog):
+    async def handler(event, data):
+        with span("ignored") as s:
+            s.set(x=1)
+
+    with caplog.at_level(logging.WARNING, logger='slow_updates'):
+        run_traced(run, handler, sample_rate=0.0)
+    assert len(caplog.records[-1].getMessage().splitlines()) == 1
+
+
+def test_fast_update_is_not_logged(run, caplog):
+    async def handler(event, data):
+        return current_trace_id()
+
+    with caplog.at_level(logging.WARNING, logger='slow_updates'):
+        trace_id, data = run_traced(run, handler, slow_threshold=60)
+    assert trace_id == data['trace_id']
+    assert not caplog.records
+    assert current_trace_id() is None
+
+
+def test_error_is_recorded_on_span(run, caplog):
+    async def handler(event, data):
+        with span("telegram:sendMessage"):
+            raise ValueError
+
+    with caplog.at_level(logging.WARNING, logger='slow_updates'):
+        try:
+            run_traced(run, handler)
+        except ValueError:
+            pass
+    assert 'telegram:sendMessage  error=ValueError' in caplog.records[-1].getMessage()
+
+
+def test_span_count_is_capped(run, monkeypatch):
+    monkeypatch.setattr(tracing, 'TRACE_MAX_SPANS', 3)
+    traces = []
+
+    async def handler(event, data):
+        traces.append(tracing._current_trace.get())
+        for _ in range(5):
+            with span("db:x"):
+                pass
+
+    run_traced(run, handler, slow_threshold=60)
+    assert len(traces[0].spans) == 3
+    assert traces[0].dropped == 3
@@ -0,0 +1,80 @@
+import asyncio
+from aiohttp.test_utils import TestClient, TestServer
+import web_server
+from web_server import SECRET_HEADER, create_app
+
+
+class FakeRouter:
+    def __init__(self):
+        self.fed = []
+
+    async def feed(self, update, key):
+        self.fed.append((update['update_id'], key))
+
+
+def request(run, app, method, path, **kwargs):
+    return requests(run, app, [(method, path, kwargs)])[0]
+
+
+def requests(run, app, calls):
+    """Выполнить запросы к приложению по очереди: [(статус, тело)]"""
+    async def main():
+        results = []
+        async with TestClient(TestServer(app)) as client:
+            for method, path, kwargs in calls:
+                response = await client.request(method, path, **kwargs)
+                results.append((response.status, await response.text()))
+        return results
+    return run(main())
+
+
+def test_health_reports_loop_lag(run, monkeypatch):
+    monkeypatch.setattr(web_server.loop_lag, 'current', lambda: 0.01)
+    assert request(run, create_app(None, None), 'GET', '/health')[0] == 200
+    monkeypatch.setattr(web_server.loop_lag, 'current', lambda: web_server.HEALTH_MAX_LAG + 1)
+    assert request(run, create_app(None, None), 'GET', '/health')[0] == 503
+
+
+def test_ready_runs_all_checks(run):
+    async def ok():
+        return True
+
+    async def broken():
+        raise ConnectionError
+
+    assert request(run, create_app(None, None, checks={'db': ok}), 'GET', '/ready')[0] == 200
+    status, body = request(run, create_app(None, None, checks={'db': ok, 'http': broken}), 'GET', '/ready')
+    assert status == 503 and '"http": false' in body
+
+
+def test_ready_check_timeout(run, monkeypatch):
+    monkeypatch.setattr(web_server, 'READY_CHECK_TIMEOUT', 0.05)
+
+    async def hanging():
+        await asyncio.sleep(60)
+
+    assert request(run, create_app(None, None, checks={'slow': hanging}), 'GET', '/ready')[0] == 503
+
+
+def test_metrics_endpoint(run):
+    status, body = request(run, create_app(None, None), 'GET', '/metrics')
+    assert status == 200
+    assert '# TYPE bot_uptime_seconds gauge' in body
+
+
+def test_sharded_webhook_checks_secret_and_routes_by_chat(run):
+    router = FakeRouter()
+    app = create_app(None, None, router=router, webhook=True)
+    update = {'update_id': 5, 'message': {'message_id': 1, 'date': 0, 'text': 'hi',
+                                          'chat': {'id': 77, 'type': 'private'}}}
+    path = web_server.WEBHOOK_PATH
+
+    secret = {SECRET_HEADER: web_server.WEBHOOK_SECRET}
+    statuses = [status for status, _ in requests(run, app, [
+        ('POST', path, {'json': update}),
+        ('POST', path, {'json': update, 'headers': {SECRET_HEADER: 'wrong'}}),
+        ('POST', path, {'data': 'junk', 'headers': secret}),
+        ('POST', path, {'json': update, 'headers': secret}),
+    ])]
+    assert statuses == [401, 401, 400, 200]
+    assert router.fed == [(5, 77)]
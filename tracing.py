@@ -0,0 +1,199 @@
+import os
+import time
+import random
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+# Отдельный лог медленных обновлений (можно направить в файл через TRACE_SLOW_LOG)
+slow_logger = logging.getLogger("slow_updates")
+
+# Доля обновлений, для которых записываются спаны (0..1)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+# Обновление дольше этого (секунды) попадает в лог медленных
+TRACE_SLOW_THRESHOLD = float(os.getenv("TRACE_SLOW_THRESHOLD", "3.0"))
+TRACE_SLOW_LOG = os.getenv("TRACE_SLOW_LOG")
+# Сколько спанов хранить на одно обновление (остальные только считаются)
+TRACE_MAX_SPANS = 200
+
+if TRACE_SLOW_LOG:
+    _handler = logging.FileHandler(TRACE_SLOW_LOG, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    slow_logger.addHandler(_handler)
+
+slow_updates = registry.counter(
+    'bot_slow_updates_total', 'Обновления дольше TRACE_SLOW_THRESHOLD', ('sampled',))
+
+
+class Trace:
+    """Трассировка одного обновления: id и (если попало в выборку) спаны"""
+
+    __slots__ = ('trace_id', 'sampled', 'started', 'spans', 'dropped', 'finished')
+
+    def __init__(self, sampled: bool):
+        self.trace_id = f"{random.getrandbits(64):016x}"
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.spans: List['Span'] = []
+        self.dropped = 0
+        self.finished = False
+
+    def timeline(self) -> List[str]:
+        """Строки таймлайна: начало от старта обновления, длительность, вложенность"""
+        lines = []
+        for span in self.spans:
+            offset = (span.started - self.started) * 1000
+            if span.ended is None:
+                duration = "     ..."
+            else:
+                duration = f"{(span.ended - span.started) * 1000:8.1f}"
+            attrs = " ".join(f"{key}={value}" for key, value in span.attrs.items())
+            lines.append(f"{offset:8.1f} ms {duration} ms  {'  ' * span.depth}{span.name}  {attrs}".rstrip())
+        if self.dropped:
+            lines.append(f"... еще {self.dropped} спанов не записано")
+        return lines
+
+
+class Span:
+    """Участок работы внутри обновления; вложенность - через contextvars"""
+
+    __slots__ = ('trace', 'name', 'attrs', 'depth', 'started', 'ended', '_token')
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.depth = 0
+        self.started = 0.0
+        self.ended: Optional[float] = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> 'Span':
+        parent = _current_span.get()
+        self.depth = parent.depth + 1 if parent is not None and parent.trace is self.trace else 0
+        self._token = _current_span.set(self)
+        self.started = time.perf_counter()
+        if len(self.trace.spans) < TRACE_MAX_SPANS:
+            self.trace.spans.append(self)
+        else:
+            self.trace.dropped += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.ended = time.perf_counter()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        return False
+
+
+class _NullSpan:
+    """Спан вне выборки: ничего не записывает"""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('trace', default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar('span', default=None)
+
+
+def span(name: str, **attrs):
+    """Спан вокруг блока (обычно вокруг await):
+
+        with span("http", endpoint=...) as s:
+            response = await ...
+            s.set(status=response.status)
+
+    Вне трассировки или вне выборки возвращает пустой спан.
+    """
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled or trace.finished:
+        return _NULL_SPAN
+    return Span(trace, name, attrs)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def _describe(update: Update) -> str:
+    return update.event_type or 'update'
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: trace id для каждого обновления,
+    спаны - для доли TRACE_SAMPLE_RATE, таймлайн медленных - в slow_updates.
+
+    Длительность меряется у всех обновлений, поэтому медленное обновление
+    вне выборки тоже попадает в лог, но одной строкой без таймлайна.
+    Встроенные outer-middleware диспетчера (в т.ч. чтение FSM-состояния)
+    выполняются раньше и в замер не входят.
+    """
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE,
+                 slow_threshold: float = TRACE_SLOW_THRESHOLD):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        trace = Trace(sampled=random.random() < self.sample_rate)
+        data['trace_id'] = trace.trace_id
+        token = _current_trace.set(trace)
+        try:
+            with span(f"update:{_describe(event)}", update_id=event.update_id):
+                return await handler(event, data)
+        finally:
+            trace.finished = True
+            _current_trace.reset(token)
+            elapsed = time.perf_counter() - trace.started
+            if elapsed >= self.slow_threshold:
+                self._report(trace, event, elapsed)
+
+    @staticmethod
+    def _report(trace: Trace, update: Update, elapsed: float):
+        slow_updates.inc(sampled='yes' if trace.sampled else 'no')
+        header = (f"🐢 Медленное обновление {update.update_id} ({_describe(update)}), "
+                  f"trace {trace.trace_id}: {elapsed:.2f} с")
+        if not trace.sampled:
+            slow_logger.warning(f"{header} (не попало в выборку, таймлайна нет)")
+            return
+        slow_logger.warning("\n".join([header] + trace.timeline()))
+
+
+class HandlerSpanMiddleware(BaseMiddleware):
+    """Inner-middleware: спан с именем найденного хендлера (profile_cmd и т.п.)"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        with span(f"handler:{name}"):
+            return await handler(event, data)
+
+
+class TelegramSpanMiddleware(BaseRequestMiddleware):
+    """Спан на каждый вызов Bot API (bot.session.middleware(...))"""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot,
+                       method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        with span(f"telegram:{method.__api_method__}"):
+            return await make_request(bot, method)
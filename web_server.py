@@ -0,0 +1,212 @@
+import os
+import asyncio
+import secrets
+import time
+from typing import Awaitable, Callable, Dict, Optional
+import logging
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from sharding import ShardRouter, shard_key
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Публичный адрес бота (https://...); если задан - обновления приходят вебхуком
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Секрет для заголовка X-Telegram-Bot-Api-Secret-Token (по умолчанию - новый при каждом запуске)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+PORT = int(os.getenv("PORT", "10000"))
+# Задержка event loop, после которой /health отвечает 503 (секунды)
+HEALTH_MAX_LAG = float(os.getenv("HEALTH_MAX_LAG", "1.0"))
+LAG_CHECK_INTERVAL = 0.5
+READY_CHECK_TIMEOUT = 2
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Проверки для /ready: имя -> корутина, возвращающая True, если все в порядке
+READY_CHECKS = web.AppKey("ready_checks", dict)
+
+
+class LoopLagMonitor:
+    """Задержка event loop: насколько позже положенного просыпается sleep.
+
+    Если замер сам застрял (loop занят), текущей задержкой считается
+    время с момента, когда замер должен был завершиться.
+    """
+
+    def __init__(self, interval: float = LAG_CHECK_INTERVAL):
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(loop.time() - started - self.interval, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            self._checked_at = time.monotonic()
+
+    def current(self) -> float:
+        if self._checked_at is None:
+            return 0.0
+        overdue = time.monotonic() - self._checked_at - self.interval
+        return max(self.lag, overdue)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+loop_lag = LoopLagMonitor()
+started_at = time.time()
+
+webhook_updates = registry.counter('bot_webhook_updates_total', 'Принятые обновления вебхука')
+webhook_rejected = registry.counter('bot_webhook_rejected_total', 'Отклоненные запросы к вебхуку')
+registry.gauge('bot_uptime_seconds', 'Время работы процесса', function=lambda: time.time() - started_at)
+registry.gauge('bot_event_loop_lag_seconds', 'Текущая задержка event loop', function=loop_lag.current)
+registry.gauge('bot_event_loop_lag_max_seconds', 'Максимальная задержка event loop',
+               function=lambda: loop_lag.max_lag)
+
+
+class ShardedRequestHandler:
+    """Вебхук входного процесса: проверить секрет и отдать обновление в шард"""
+
+    def __init__(self, router: ShardRouter, secret_token: str):
+        self.router = router
+        self.secret_token = secret_token
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret_token):
+            webhook_rejected.inc()
+            return web.Response(status=401, text="Unauthorized")
+
+        try:
+            data = await request.json()
+            key = shard_key(Update.model_validate(data))
+        except ValueError as e:
+            logger.error(f"❌ Некорректное обновление от Telegram: {e}")
+            return web.Response(status=400)
+
+        webhook_updates.inc()
+        await self.router.feed(data, key)
+        return web.Response()
+
+
+class CountingRequestHandler(SimpleRequestHandler):
+    """Вебхук в диспетчер этого процесса (с подсчетом для /metrics)"""
+
+    async def handle(self, request: web.Request) -> web.Response:
+        response = await super().handle(request)
+        if response.status == 401:
+            webhook_rejected.inc()
+        else:
+            webhook_updates.inc()
+        return response
+
+
+async def home(request: web.Request) -> web.Response:
+    return web.Response(text="🤖 Dota2 Bot is running")
+
+
+async def health(request: web.Request) -> web.Response:
+    """Жив ли event loop: 503, если он заметно отстает"""
+    lag = loop_lag.current()
+    healthy = lag < HEALTH_MAX_LAG
+    return web.json_response(
+        {"status": "healthy" if healthy else "lagging", "loop_lag_ms": round(lag * 1000, 1)},
+        status=200 if healthy else 503
+    )
+
+
+async def _check(check: Callable[[], Awaitable[bool]]) -> bool:
+    try:
+        return bool(await asyncio.wait_for(check(), READY_CHECK_TIMEOUT))
+    except Exception:
+        return False
+
+
+async def ready(request: web.Request) -> web.Response:
+    """Готов ли бот обслуживать: все проверки из create_app(checks=...) прошли"""
+    checks: Dict[str, Callable[[], Awaitable[bool]]] = request.app[READY_CHECKS]
+    names = list(checks)
+    results = dict(zip(names, await asyncio.gather(*(_check(checks[name]) for name in names))))
+    ok = all(results.values())
+    return web.json_response({"status": "ready" if ok else "not ready", "checks": results},
+                             status=200 if ok else 503)
+
+
+async def ping(request: web.Request) -> web.Response:
+    return web.Response(text="pong")
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Метрики процесса в текстовом формате Prometheus"""
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+
+async def _start_monitor(app: web.Application):
+    loop_lag.start()
+
+
+async def _stop_monitor(app: web.Application):
+    loop_lag.stop()
+
+
+def create_app(bot: Bot, dp: Dispatcher, router: Optional[ShardRouter] = None,
+               webhook: bool = False,
+               checks: Optional[Dict[str, Callable[[], Awaitable[bool]]]] = None) -> web.Application:
+    """aiohttp-приложение: служебные маршруты и (если webhook) прием обновлений.
+
+    С router обновления раздаются процессам-обработчикам, иначе
+    обрабатываются диспетчером в этом же event loop. checks - проверки
+    для /ready (имя -> корутина, возвращающая True, если все в порядке).
+    """
+    app = web.Application()
+    app[READY_CHECKS] = checks or {}
+    app.router.add_get("/", home)
+    app.router.add_get("/health", health)
+    app.router.add_get("/ready", ready)
+    app.router.add_get("/ping", ping)
+    app.router.add_get("/metrics", metrics)
+    app.on_startup.append(_start_monitor)
+    app.on_cleanup.append(_stop_monitor)
+
+    if webhook:
+        if router is not None:
+            app.router.add_post(WEBHOOK_PATH, ShardedRequestHandler(router, WEBHOOK_SECRET).handle)
+        else:
+            CountingRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET).register(app, path=WEBHOOK_PATH)
+            setup_application(app, dp, bot=bot)
+    return app
+
+
+async def start_server(app: web.Application) -> web.AppRunner:
+    """Запустить приложение на PORT в текущем event loop"""
+    # Без access-лога: иначе строка на каждое обновление от Telegram
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", PORT).start()
+    logger.info(f"✅ Веб-сервер запущен на порту {PORT}")
+    return runner
+
+
+async def set_webhook(bot: Bot, dp: Dispatcher):
+    """Зарегистрировать вебхук в Telegram"""
+    await bot.set_webhook(
+        f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=True
+    )
+    logger.info(f"✅ Вебхук установлен: {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")